@@ -0,0 +1,234 @@
+"""Bus invalidasi cache antar worker.
+
+Penulisan yang mengubah data ter-cache memanggil ``publish(db, tabel, key)``
+di dalam transaksinya. Setelah commit, handler yang terdaftar lewat
+``subscribe`` dijalankan di worker penulis dan di seluruh worker lain:
+
+* PostgreSQL: event dikirim dengan ``pg_notify`` (ikut transaksi, sehingga
+  hanya terkirim bila commit) dan diterima thread listener ``LISTEN`` di
+  setiap worker.
+* Database lain (SQLite untuk pengujian): versi per tabel dinaikkan di tabel
+  ``cache_versions`` dan thread listener memeriksanya secara berkala.
+
+Handler menerima ``key`` yang berubah, atau ``None`` bila yang diketahui hanya
+"sesuatu di tabel ini berubah" (polling, atau koneksi LISTEN baru tersambung
+ulang sehingga notifikasi selama terputus mungkin hilang).
+
+Event yang berasal dari proses ini sendiri sudah dijalankan setelah commit,
+sehingga gemanya dari LISTEN (ditandai ``ORIGIN``) maupun dari polling
+(kenaikan versi milik sendiri) tidak dijalankan lagi.
+"""
+
+import os
+import select
+import threading
+import uuid
+from collections import Counter, defaultdict
+from typing import Callable, Optional
+
+from sqlalchemy import event, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal, engine
+
+CHANNEL = "cache_invalidation"
+CACHE_BUS_POLL_SECONDS = float(os.getenv("CACHE_BUS_POLL_SECONDS", "1"))
+RECONNECT_DELAY_SECONDS = 5
+# Penanda proses pengirim di payload NOTIFY
+ORIGIN = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+_handlers: dict[str, list[Callable[[Optional[str]], None]]] = defaultdict(list)
+_listener: Optional[threading.Thread] = None
+_stop_event = threading.Event()
+# Kenaikan versi cache_versions oleh proses ini yang belum terlihat poller
+_own_bumps: Counter = Counter()
+_own_bumps_lock = threading.Lock()
+
+
+def _uses_notify() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def subscribe(table: str, handler: Callable[[Optional[str]], None]):
+    """Mendaftarkan handler yang dipanggil setiap ada event untuk ``table``."""
+    _handlers[table].append(handler)
+
+
+def _dispatch(table: str, key: Optional[str]):
+    for handler in list(_handlers.get(table, ())):
+        try:
+            handler(key)
+        except Exception as exc:
+            print(f"Cache bus: handler {table} gagal: {exc}")
+
+
+def _dispatch_all():
+    for table in list(_handlers):
+        _dispatch(table, None)
+
+
+def _bump_version(db: Session, table: str):
+    """Menaikkan versi tabel di ``cache_versions`` dalam transaksi pemanggil."""
+    updated = db.execute(
+        update(models.CacheVersion)
+        .where(models.CacheVersion.name == table)
+        .values(version=models.CacheVersion.version + 1)
+    ).rowcount
+    if updated:
+        return
+    try:
+        with db.begin_nested():
+            db.add(models.CacheVersion(name=table, version=1))
+    except IntegrityError:
+        db.execute(
+            update(models.CacheVersion)
+            .where(models.CacheVersion.name == table)
+            .values(version=models.CacheVersion.version + 1)
+        )
+
+
+def publish(db: Session, table: str, key: Optional[str] = None):
+    """Mencatat event ``table:key`` di transaksi ``db``; diterapkan setelah commit."""
+    events = db.info.setdefault("cache_bus_events", set())
+    if (table, key) in events:
+        return
+    events.add((table, key))
+    if _uses_notify():
+        payload = f"{table}:{key}" if key is not None else table
+        db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": CHANNEL, "payload": f"{ORIGIN}|{payload}"},
+        )
+    else:
+        _bump_version(db, table)
+        bumps = db.info.setdefault("cache_bus_bumps", Counter())
+        bumps[table] += 1
+
+
+@event.listens_for(Session, "before_commit")
+def _count_own_bumps(session: Session):
+    if session.in_nested_transaction():
+        return
+    # Dicatat sebelum commit terlihat agar poller tidak sempat mengira kenaikan
+    # versi ini berasal dari worker lain
+    bumps = session.info.get("cache_bus_bumps")
+    if bumps and not session.info.get("cache_bus_bumps_counted"):
+        with _own_bumps_lock:
+            _own_bumps.update(bumps)
+        session.info["cache_bus_bumps_counted"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_after_commit(session: Session):
+    # Savepoint (begin_nested) juga memicu event ini; tunggu commit transaksi luar
+    if session.in_nested_transaction():
+        return
+    # Worker penulis langsung menerapkan event-nya sendiri tanpa menunggu listener
+    session.info.pop("cache_bus_bumps", None)
+    session.info.pop("cache_bus_bumps_counted", None)
+    for table, key in session.info.pop("cache_bus_events", ()):
+        _dispatch(table, key)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session):
+    # Rollback savepoint tidak membatalkan event transaksi luar
+    if session.in_nested_transaction():
+        return
+    session.info.pop("cache_bus_events", None)
+    bumps = session.info.pop("cache_bus_bumps", None)
+    if bumps and session.info.pop("cache_bus_bumps_counted", None):
+        # Commit gagal: kenaikan versi tidak pernah terjadi
+        with _own_bumps_lock:
+            _own_bumps.subtract(bumps)
+            for table in [table for table, count in _own_bumps.items() if count <= 0]:
+                del _own_bumps[table]
+
+
+def _listen_notify():
+    """Loop LISTEN PostgreSQL di koneksi khusus di luar pool."""
+    while not _stop_event.is_set():
+        connection = None
+        try:
+            pooled = engine.raw_connection()
+            # driver_connection bernilai None setelah detach; ambil lebih dulu
+            connection = pooled.driver_connection
+            pooled.detach()
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            # Notifikasi selama belum/terputus tidak terlihat; anggap semuanya basi
+            _dispatch_all()
+            while not _stop_event.is_set():
+                if select.select([connection], [], [], 1.0) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    origin, separator, payload = notify.payload.partition("|")
+                    if not separator:
+                        # Payload tanpa penanda asal (dikirim worker versi lama)
+                        payload = notify.payload
+                    elif origin == ORIGIN:
+                        continue
+                    table, _, key = payload.partition(":")
+                    _dispatch(table, key or None)
+        except Exception as exc:
+            print(f"Cache bus: koneksi LISTEN terputus: {exc}")
+            _stop_event.wait(RECONNECT_DELAY_SECONDS)
+        finally:
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+
+def _read_versions() -> dict[str, int]:
+    with SessionLocal() as db:
+        return dict(db.query(models.CacheVersion.name, models.CacheVersion.version).all())
+
+
+def _poll_versions():
+    """Fallback tanpa LISTEN/NOTIFY: membandingkan versi per tabel secara berkala."""
+    known = None
+    while not _stop_event.is_set():
+        try:
+            versions = _read_versions()
+        except Exception as exc:
+            print(f"Cache bus: gagal membaca cache_versions: {exc}")
+        else:
+            if known is not None:
+                for table, version in versions.items():
+                    changes = version - known.get(table, 0)
+                    if changes <= 0:
+                        continue
+                    with _own_bumps_lock:
+                        own = min(_own_bumps[table], changes)
+                        _own_bumps[table] -= own
+                    if changes > own:
+                        _dispatch(table, None)
+            else:
+                # Kenaikan sebelum pembacaan pertama sudah tercakup di versi awal
+                with _own_bumps_lock:
+                    _own_bumps.clear()
+            known = versions
+        _stop_event.wait(CACHE_BUS_POLL_SECONDS)
+
+
+def start_listener():
+    """Menjalankan thread listener sekali per proses worker."""
+    global _listener
+    if _listener is not None and _listener.is_alive():
+        return
+    _stop_event.clear()
+    target = _listen_notify if _uses_notify() else _poll_versions
+    _listener = threading.Thread(target=target, name="cache-bus", daemon=True)
+    _listener.start()
+
+
+def stop_listener():
+    """Menghentikan thread listener saat aplikasi berhenti."""
+    _stop_event.set()
@@ -0,0 +1,151 @@
+"""Cache konfigurasi sistem (tabel ``system_config``) bertipe di memori proses.
+
+Seluruh baris dimuat sekali saat startup lalu dibaca dari memori. Penulisan
+lewat ``set_values`` langsung memperbarui database dan cache (write-through)
+serta mengumumkan event ``system_config:<key>`` ke ``cache_bus`` sehingga
+worker lain memuat ulang pada pembacaan berikutnya; worker penulis sendiri
+tidak ikut memuat ulang. Sebagai jaring pengaman,
+tabel juga dimuat ulang paling lama setiap ``CONFIG_RELOAD_SECONDS``; tabel
+ini hanya berisi beberapa baris sehingga satu query muat ulang sangat murah.
+
+Nilai disimpan di database sebagai teks; ``DEFINITIONS`` menentukan cara
+membaca/menulisnya (bool, JSON, teks) beserta nilai bawaannya.
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from . import cache_bus, models
+
+CONFIG_RELOAD_SECONDS = int(os.getenv("CONFIG_RELOAD_SECONDS", "300"))
+
+
+class ConfigKey(NamedTuple):
+    parse: Callable[[str], Any]
+    dump: Callable[[Any], str]
+    default: Any = None
+
+
+def _parse_bool(raw: str) -> bool:
+    return raw == "true"
+
+
+def _dump_bool(value: bool) -> str:
+    return "true" if value else "false"
+
+
+def _parse_json_list(raw: str) -> list:
+    try:
+        value = json.loads(raw) if raw else []
+    except ValueError:
+        return []
+    return value if isinstance(value, list) else []
+
+
+def _parse_json_dict(raw: str) -> Optional[dict]:
+    try:
+        value = json.loads(raw) if raw else None
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def _parse_optional_str(raw: str) -> Optional[str]:
+    return raw or None
+
+
+_TEXT = ConfigKey(str, str)
+
+DEFINITIONS: dict[str, ConfigKey] = {
+    "perwalian_period_active": ConfigKey(_parse_bool, _dump_bool, False),
+    "hero_title": ConfigKey(str, str, "Selamat Datang di Sistem Pembinaan Siswa"),
+    "hero_subtitle": ConfigKey(str, str, "Membangun Generasi Berkarakter dan Berprestasi"),
+    "hero_image_url": ConfigKey(str, str, "/images/hero-default.jpg"),
+    "hero_image_variants": ConfigKey(_parse_json_list, json.dumps, []),
+    "hero_image_placeholder": ConfigKey(_parse_optional_str, lambda value: value or "", None),
+    "public_stats_snapshot": ConfigKey(_parse_json_dict, json.dumps, None),
+}
+
+
+def _definition(key: str) -> ConfigKey:
+    return DEFINITIONS.get(key, _TEXT)
+
+
+class ConfigStore:
+    """Peta ``key -> nilai bertipe`` yang disinkronkan dengan ``system_config``."""
+
+    def __init__(self):
+        self._values: dict[str, Any] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        # Key yang sedang di-commit set_values di thread ini
+        self._writing = threading.local()
+
+    def load(self, db: Session):
+        """Memuat ulang seluruh baris konfigurasi dari database."""
+        rows = db.query(models.SystemConfig.key, models.SystemConfig.value).all()
+        values = {key: _definition(key).parse(value) for key, value in rows}
+        with self._lock:
+            self._values = values
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self, key: Optional[str] = None):
+        """Memaksa muat ulang pada pembacaan berikutnya (dipanggil cache_bus)."""
+        # Event after-commit dari set_values sendiri: nilainya langsung diperbarui di sana
+        if key is not None and key in getattr(self._writing, "keys", ()):
+            return
+        self._loaded_at = None
+
+    def _ensure_fresh(self, db: Session):
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < CONFIG_RELOAD_SECONDS:
+            return
+        self.load(db)
+
+    def get(self, db: Session, key: str) -> Any:
+        """Nilai bertipe sebuah key; nilai bawaan definisinya bila belum pernah diisi."""
+        self._ensure_fresh(db)
+        if key in self._values:
+            value = self._values[key]
+        else:
+            value = _definition(key).default
+        # Nilai list/dict dikembalikan sebagai salinan agar cache tidak ikut berubah
+        return copy.deepcopy(value) if isinstance(value, (list, dict)) else value
+
+    def set_values(self, db: Session, values: dict[str, Any]):
+        """Menyimpan beberapa key bertipe dalam satu transaksi lalu memperbarui cache."""
+        encoded = {key: _definition(key).dump(value) for key, value in values.items()}
+        existing = {
+            row.key: row
+            for row in db.query(models.SystemConfig).filter(models.SystemConfig.key.in_(list(encoded)))
+        }
+        for key, text in encoded.items():
+            if key in existing:
+                existing[key].value = text
+            else:
+                db.add(models.SystemConfig(key=key, value=text))
+            cache_bus.publish(db, "system_config", key)
+        self._writing.keys = set(encoded)
+        try:
+            db.commit()
+        finally:
+            self._writing.keys = ()
+        with self._lock:
+            updated = dict(self._values)
+            for key, text in encoded.items():
+                updated[key] = _definition(key).parse(text)
+            self._values = updated
+
+    def set(self, db: Session, key: str, value: Any):
+        """Menyimpan satu key (write-through)."""
+        self.set_values(db, {key: value})
+
+
+store = ConfigStore()
+cache_bus.subscribe("system_config", store.invalidate)
@@ -1,11 +1,15 @@
 """Kumpulan fungsi CRUD dan agregasi statistik untuk modul backend."""
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, select, literal
+from sqlalchemy import func, case, select, literal, delete
 from sqlalchemy.engine import Row
 from datetime import datetime, timedelta, timezone
-from typing import Optional, List
+from pathlib import Path
+from typing import Callable, Optional, List
 import calendar
+import os
+import threading
+import time
 
 
 def _kelas_list(value) -> List[str]:
@@ -23,16 +27,16 @@ def _kelas_list(value) -> List[str]:
 
 
 def _set_user_kelas(user, kelas: List[str]):
-    """Mengganti daftar kelas binaan pada objek user."""
+    """Mengganti daftar kelas binaan pada objek user (dibakukan oleh validator model)."""
     user.kelas_binaan = kelas if kelas else []
 
 
 def _add_kelas_to_user(user, kelas_name: str):
     """Menambahkan nama kelas ke atribut kelas binaan user bila belum ada."""
-    kelas_name = (kelas_name or "").strip()
+    kelas_name = models.normalize_nama_kelas(kelas_name)
     if not kelas_name:
         return
-    kelas_list = _kelas_list(user.kelas_binaan)
+    kelas_list = list(_kelas_list(user.kelas_binaan))
     if kelas_name not in kelas_list:
         kelas_list.append(kelas_name)
     _set_user_kelas(user, kelas_list)
@@ -40,10 +44,13 @@ def _add_kelas_to_user(user, kelas_name: str):
 
 def _remove_kelas_from_user(user, kelas_name: str):
     """Menghapus nama kelas tertentu dari daftar kelas binaan user."""
-    kelas_list = [name for name in _kelas_list(user.kelas_binaan) if name != kelas_name]
+    kelas_name = models.normalize_nama_kelas(kelas_name)
+    kelas_list = [
+        name for name in _kelas_list(user.kelas_binaan) if models.normalize_nama_kelas(name) != kelas_name
+    ]
     _set_user_kelas(user, kelas_list)
 
-from . import models, schemas
+from . import cache_bus, config_store, models, schemas, storage
 from .hashing import Hasher
 
 def get_user_by_nip(db: Session, nip: str):
@@ -59,17 +66,12 @@ def get_users(db: Session, skip: int = 0, limit: int = 100):
     """Mengambil daftar pengguna dengan dukungan pagination sederhana."""
     return db.query(models.User).offset(skip).limit(limit).all()
 
-def create_user(db: Session, user: schemas.UserCreate):
+def create_user(db: Session, user: schemas.UserCreate, *, commit: bool = True):
     """Membuat pengguna baru sekaligus mengatur kelas atau angkatan binaan."""
     hashed_password = Hasher.get_password_hash(user.password)
     kelas_binaan: List[str] = []
     if user.role == schemas.UserRole.WALI_KELAS:
-        seen: set[str] = set()
-        for name in _kelas_list(user.kelas_binaan):
-            trimmed = (name or "").strip()
-            if trimmed and trimmed not in seen:
-                kelas_binaan.append(trimmed)
-                seen.add(trimmed)
+        kelas_binaan = models.normalize_kelas_list(_kelas_list(user.kelas_binaan))
     db_user = models.User(
         nip=user.nip,
         email=user.email,
@@ -81,19 +83,34 @@ def create_user(db: Session, user: schemas.UserCreate):
         angkatan_binaan=(user.angkatan_binaan or "").strip() or None
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    if commit:
+        db.commit()
+        db.refresh(db_user)
+    else:
+        db.flush()
     return db_user
 
 def get_user_by_id(db: Session, user_id: str):
     """Mengambil pengguna berdasarkan ID internal."""
     return db.query(models.User).filter(models.User.id == user_id).first()
 
-def update_user(db: Session, user_id: str, user_update: schemas.UserUpdate):
+def _wali_kelas_fields(db_user: models.User) -> tuple:
+    """Atribut pengguna yang ikut menentukan isi peta wali kelas."""
+    return (
+        db_user.nip,
+        db_user.role,
+        db_user.full_name,
+        db_user.email,
+        tuple(_kelas_list(db_user.kelas_binaan)),
+        db_user.is_active,
+    )
+
+def update_user(db: Session, user_id: str, user_update: schemas.UserUpdate, *, commit: bool = True):
     """Memperbarui atribut pengguna termasuk pemetaan kelas/angkatan sesuai peran."""
     db_user = get_user_by_id(db, user_id)
     if not db_user:
         return None
+    wali_kelas_before = _wali_kelas_fields(db_user)
     previous_role = db_user.role
     if user_update.nip is not None and user_update.nip != db_user.nip:
         existing = get_user_by_nip(db, user_update.nip)
@@ -113,11 +130,7 @@ def update_user(db: Session, user_id: str, user_update: schemas.UserUpdate):
     if user_update.full_name is not None:
         db_user.full_name = user_update.full_name
         for kelas_name in _kelas_list(db_user.kelas_binaan):
-            kelas = (
-                db.query(models.Kelas)
-                .filter(models.Kelas.nama_kelas == kelas_name)
-                .first()
-            )
+            kelas = get_kelas_by_name(db, kelas_name)
             if kelas and kelas.wali_kelas_nip == db_user.nip:
                 kelas.wali_kelas_name = db_user.full_name
     current_role = db_user.role
@@ -128,11 +141,7 @@ def update_user(db: Session, user_id: str, user_update: schemas.UserUpdate):
             and new_role != schemas.UserRole.WALI_KELAS.value
         ):
             for kelas_name in _kelas_list(db_user.kelas_binaan):
-                kelas = (
-                    db.query(models.Kelas)
-                    .filter(models.Kelas.nama_kelas == kelas_name)
-                    .first()
-                )
+                kelas = get_kelas_by_name(db, kelas_name)
                 if kelas and kelas.wali_kelas_nip == db_user.nip:
                     kelas.wali_kelas_nip = None
                     kelas.wali_kelas_name = None
@@ -149,11 +158,7 @@ def update_user(db: Session, user_id: str, user_update: schemas.UserUpdate):
         db_user.is_active = user_update.is_active
         if not user_update.is_active:
             for kelas_name in _kelas_list(db_user.kelas_binaan):
-                kelas = (
-                    db.query(models.Kelas)
-                    .filter(models.Kelas.nama_kelas == kelas_name)
-                    .first()
-                )
+                kelas = get_kelas_by_name(db, kelas_name)
                 if kelas and kelas.wali_kelas_nip == db_user.nip:
                     kelas.wali_kelas_nip = None
                     kelas.wali_kelas_name = None
@@ -162,16 +167,12 @@ def update_user(db: Session, user_id: str, user_update: schemas.UserUpdate):
         user_update.kelas_binaan is not None
         and current_role == schemas.UserRole.WALI_KELAS.value
     ):
-        desired = [name.strip() for name in user_update.kelas_binaan if name and name.strip()]
+        desired = models.normalize_kelas_list(user_update.kelas_binaan)
         desired_set = set(desired)
         current_set = set(_kelas_list(db_user.kelas_binaan))
 
         for kelas_name in current_set - desired_set:
-            kelas = (
-                db.query(models.Kelas)
-                .filter(models.Kelas.nama_kelas == kelas_name)
-                .first()
-            )
+            kelas = get_kelas_by_name(db, kelas_name)
             if kelas and kelas.wali_kelas_nip == db_user.nip:
                 kelas.wali_kelas_nip = None
                 kelas.wali_kelas_name = None
@@ -180,11 +181,7 @@ def update_user(db: Session, user_id: str, user_update: schemas.UserUpdate):
         for kelas_name in desired:
             if kelas_name in current_set:
                 continue
-            kelas = (
-                db.query(models.Kelas)
-                .filter(models.Kelas.nama_kelas == kelas_name)
-                .first()
-            )
+            kelas = get_kelas_by_name(db, kelas_name)
             if not kelas:
                 raise ValueError(f"Kelas '{kelas_name}' tidak ditemukan")
             _assign_wali_kelas(db, kelas, db_user.nip)
@@ -195,8 +192,15 @@ def update_user(db: Session, user_id: str, user_update: schemas.UserUpdate):
         db_user.angkatan_binaan = trimmed if trimmed else None
     if user_update.password:
         db_user.hashed_password = Hasher.get_password_hash(user_update.password)
-    db.commit()
-    db.refresh(db_user)
+    # Ganti password atau angkatan binaan tidak mengubah peta wali kelas, jadi
+    # cache (dan event cache_versions/NOTIFY ke worker lain) tidak perlu diusik
+    if _wali_kelas_fields(db_user) != wali_kelas_before:
+        invalidate_wali_kelas_cache(db)
+    if commit:
+        db.commit()
+        db.refresh(db_user)
+    else:
+        db.flush()
     return db_user
 
 def delete_user(db: Session, user_id: str) -> bool:
@@ -229,6 +233,7 @@ def delete_user(db: Session, user_id: str) -> bool:
     # Efficiency: Query classes directly instead of iterating user.kelas_binaan (which might be stale)
     
     # Clear Wali Kelas
+    invalidate_wali_kelas_cache(db)
     db.query(models.Kelas).filter(models.Kelas.wali_kelas_nip == db_user.nip).update(
         {"wali_kelas_nip": None, "wali_kelas_name": None}, synchronize_session=False
     )
@@ -244,8 +249,8 @@ def delete_user(db: Session, user_id: str) -> bool:
     return True
 
 def get_siswa_by_nis(db: Session, nis: str):
-    """Mengambil siswa tunggal berdasarkan NIS."""
-    return db.query(models.Siswa).filter(models.Siswa.nis == nis).first()
+    """Mengambil siswa tunggal berdasarkan NIS (memakai identity map sesi bila sudah dimuat)."""
+    return db.get(models.Siswa, nis)
 
 def get_all_siswa(db: Session, skip: int = 0, limit: int = 1000):
     """Mengambil daftar siswa dengan batas bawaan 1000 data."""
@@ -294,6 +299,15 @@ def search_siswa(db: Session, term: str):
         .all()
     )
 
+# Status keluar yang menjadwalkan penghapusan permanen data siswa
+EXIT_STATUSES = {
+    schemas.SiswaStatus.LULUS.value,
+    schemas.SiswaStatus.PINDAH.value,
+    schemas.SiswaStatus.DIKELUARKAN.value,
+}
+SCHEDULED_DELETION_DELAY = timedelta(days=60)
+
+
 def update_siswa(db: Session, nis: str, siswa_update: schemas.SiswaUpdate, *, commit: bool = True):
     """Memperbarui data siswa dan sinkronisasi kelas jika ada perubahan."""
     db_siswa = get_siswa_by_nis(db, nis)
@@ -311,12 +325,8 @@ def update_siswa(db: Session, nis: str, siswa_update: schemas.SiswaUpdate, *, co
             status_str = db_siswa.status_siswa or schemas.SiswaStatus.AKTIF.value
         
         # Check for active violations before allowing exit statuses
-        exit_statuses = {
-            schemas.SiswaStatus.LULUS.value, 
-            schemas.SiswaStatus.PINDAH.value, 
-            schemas.SiswaStatus.DIKELUARKAN.value
-        }
-        
+        exit_statuses = EXIT_STATUSES
+
         if status_str in exit_statuses and db_siswa.status_siswa not in exit_statuses:
             # Check for unresolved violations
             has_unresolved = (
@@ -336,7 +346,7 @@ def update_siswa(db: Session, nis: str, siswa_update: schemas.SiswaUpdate, *, co
         # Set or clear scheduled deletion based on status
         if status_str in exit_statuses:
              # Set scheduled deletion to 60 days from now
-             db_siswa.scheduled_deletion_at = datetime.now(timezone.utc) + timedelta(days=60)
+             db_siswa.scheduled_deletion_at = datetime.now(timezone.utc) + SCHEDULED_DELETION_DELAY
         elif status_str == schemas.SiswaStatus.AKTIF.value:
              db_siswa.scheduled_deletion_at = None
         data.pop("status_siswa", None)
@@ -374,7 +384,7 @@ def upsert_riwayat_kelas(
 ):
     """Menyimpan atau memperbarui riwayat kelas siswa pada tahun ajaran tertentu."""
     tahun = (tahun_ajaran or "").strip()
-    kelas_name = (kelas or "").strip()
+    kelas_name = models.normalize_nama_kelas(kelas)
     if not tahun or not kelas_name:
         return None
 
@@ -462,6 +472,71 @@ def get_all_kelas(db: Session):
         
     return kelas_list
 
+def get_kelas_by_name(db: Session, nama_kelas: str) -> Optional[models.Kelas]:
+    """Mencari kelas berdasarkan nama lewat kolom ternormalisasi yang terindeks."""
+    return (
+        db.query(models.Kelas)
+        .filter(models.Kelas.nama_kelas_norm == models.normalize_nama_kelas(nama_kelas))
+        .first()
+    )
+
+
+# Peta kelas -> (email, nama) wali kelas untuk notifikasi pelanggaran.
+# Dikosongkan di semua worker (lewat cache_bus) setiap kali penugasan wali atau
+# data user berubah; TTL menjadi jaring pengaman bila ada event yang terlewat.
+WALI_KELAS_CACHE_TTL_SECONDS = int(os.getenv("WALI_KELAS_CACHE_TTL_SECONDS", "300"))
+_wali_kelas_cache: Optional[dict[str, tuple[str, str]]] = None
+_wali_kelas_cache_loaded_at = 0.0
+_wali_kelas_cache_generation = 0
+_wali_kelas_cache_lock = threading.Lock()
+
+
+def invalidate_wali_kelas_cache(db: Optional[Session] = None):
+    """Mengosongkan peta wali kelas.
+
+    Bila ``db`` diberikan, event ``wali_kelas`` diumumkan di transaksinya
+    sehingga peta dikosongkan lagi setelah commit (agar request lain tidak
+    sempat mengisinya dengan data sebelum commit) dan di worker lain.
+    """
+    global _wali_kelas_cache, _wali_kelas_cache_generation
+    with _wali_kelas_cache_lock:
+        _wali_kelas_cache = None
+        _wali_kelas_cache_generation += 1
+    if db is not None:
+        cache_bus.publish(db, "wali_kelas")
+
+
+cache_bus.subscribe("wali_kelas", lambda _key: invalidate_wali_kelas_cache())
+
+
+def _load_wali_kelas_map(db: Session) -> dict[str, tuple[str, str]]:
+    """Memuat seluruh pasangan kelas -> wali kelas yang punya email dalam satu query."""
+    rows = (
+        db.query(models.Kelas.nama_kelas_norm, models.User.email, models.User.full_name)
+        .join(models.User, models.User.nip == models.Kelas.wali_kelas_nip)
+        .filter(models.User.email.isnot(None))
+        .all()
+    )
+    return {nama_kelas_norm: (email, full_name) for nama_kelas_norm, email, full_name in rows if email}
+
+
+def get_wali_kelas_contact(db: Session, nama_kelas: str) -> Optional[tuple[str, str]]:
+    """Mengambil (email, nama) wali kelas dari peta di memori; dimuat ulang bila kosong atau kedaluwarsa."""
+    global _wali_kelas_cache, _wali_kelas_cache_loaded_at
+    with _wali_kelas_cache_lock:
+        cache = _wali_kelas_cache
+        if cache is not None and time.monotonic() - _wali_kelas_cache_loaded_at > WALI_KELAS_CACHE_TTL_SECONDS:
+            cache = None
+        generation = _wali_kelas_cache_generation
+    if cache is None:
+        cache = _load_wali_kelas_map(db)
+        with _wali_kelas_cache_lock:
+            # Jangan simpan hasil yang sudah basi karena ada invalidasi selama memuat
+            if generation == _wali_kelas_cache_generation:
+                _wali_kelas_cache = cache
+                _wali_kelas_cache_loaded_at = time.monotonic()
+    return cache.get(models.normalize_nama_kelas(nama_kelas))
+
 def _assign_guru_bk(db: Session, kelas: models.Kelas, guru_bk_nip: str | None):
     """Mengatur hubungan guru BK <-> kelas."""
     # 1. Jika ada BK lama, hapus kelas ini dari daftar 'kelas_binaan' user lama
@@ -502,6 +577,7 @@ def _assign_guru_bk(db: Session, kelas: models.Kelas, guru_bk_nip: str | None):
 
 def _assign_wali_kelas(db: Session, kelas: models.Kelas, wali_kelas_nip: str | None):
     """Mengatur hubungan wali kelas <-> kelas dan membersihkan relasi lama."""
+    invalidate_wali_kelas_cache(db)
     # Clear previous wali assignment if changing
     if kelas.wali_kelas_nip and kelas.wali_kelas_nip != wali_kelas_nip:
         old_wali = db.query(models.User).filter(models.User.nip == kelas.wali_kelas_nip).first()
@@ -554,7 +630,7 @@ def create_kelas(db: Session, kelas: schemas.KelasCreate):
     data['tahun_ajaran'] = f"{active_year.tahun} - Semester {active_year.semester}"
     
     # Check for duplicate class name
-    if db.query(models.Kelas).filter(models.Kelas.nama_kelas == data['nama_kelas']).first():
+    if get_kelas_by_name(db, data['nama_kelas']):
          raise ValueError(f"Kelas '{data['nama_kelas']}' sudah ada")
 
     db_kelas = models.Kelas(**data)
@@ -618,6 +694,7 @@ def update_kelas(db: Session, kelas_id: str, kelas_update: schemas.KelasUpdate):
 
     # If class name changes, we must update references in User.kelas_binaan lists
     if "nama_kelas" in data and (db_kelas.wali_kelas_nip or db_kelas.guru_bk_nip):
+        invalidate_wali_kelas_cache(db)
         # Update Wali
         if db_kelas.wali_kelas_nip:
             wali_user = (
@@ -627,7 +704,7 @@ def update_kelas(db: Session, kelas_id: str, kelas_update: schemas.KelasUpdate):
             )
             if wali_user:
                 updated_list = [
-                    db_kelas.nama_kelas if name == old_nama else name
+                    db_kelas.nama_kelas if name == models.normalize_nama_kelas(old_nama) else name
                     for name in _kelas_list(wali_user.kelas_binaan)
                 ]
                 _set_user_kelas(wali_user, updated_list)
@@ -641,7 +718,7 @@ def update_kelas(db: Session, kelas_id: str, kelas_update: schemas.KelasUpdate):
             )
             if bk_user:
                  updated_list_bk = [
-                    db_kelas.nama_kelas if name == old_nama else name
+                    db_kelas.nama_kelas if name == models.normalize_nama_kelas(old_nama) else name
                     for name in _kelas_list(bk_user.kelas_binaan)
                 ]
                  _set_user_kelas(bk_user, updated_list_bk)
@@ -656,6 +733,7 @@ def delete_kelas(db: Session, kelas_id: str) -> bool:
     if not db_kelas:
         return False
     if db_kelas.wali_kelas_nip:
+        invalidate_wali_kelas_cache(db)
         wali_user = (
             db.query(models.User)
             .filter(models.User.nip == db_kelas.wali_kelas_nip)
@@ -712,22 +790,46 @@ def delete_jenis_pelanggaran(db: Session, jenis_id: str) -> bool:
     db.commit()
     return True
 
-def create_pelanggaran(db: Session, pelanggaran: schemas.PelanggaranCreate, pelapor_id: str):
-    """Membuat catatan pelanggaran baru beserta informasi pelapor."""
-    siswa = get_siswa_by_nis(db, pelanggaran.nis_siswa)
+def validate_pelanggaran_subjects(db: Session, nis_siswa: str, jenis_pelanggaran_id: str):
+    """Memastikan siswa aktif dan jenis pelanggaran ada; mengembalikan (siswa, jenis)."""
+    siswa = get_siswa_by_nis(db, nis_siswa)
     if not siswa:
         raise ValueError("Siswa tidak ditemukan untuk NIS yang diberikan")
     if siswa.status_siswa != schemas.SiswaStatus.AKTIF.value:
         raise ValueError("Pelanggaran hanya bisa dicatat untuk siswa berstatus aktif")
+    jenis = db.get(models.JenisPelanggaran, jenis_pelanggaran_id)
+    if jenis is None:
+        raise ValueError("Jenis pelanggaran tidak ditemukan")
+    return siswa, jenis
+
+def create_pelanggaran(
+    db: Session,
+    pelanggaran: schemas.PelanggaranCreate,
+    pelapor_id: str,
+    *,
+    commit: bool = True,
+):
+    """Membuat catatan pelanggaran baru beserta informasi pelapor."""
+    siswa, _jenis = validate_pelanggaran_subjects(
+        db, pelanggaran.nis_siswa, pelanggaran.jenis_pelanggaran_id
+    )
 
     db_pelanggaran = models.Pelanggaran(
         **pelanggaran.model_dump(),
         pelapor_id=pelapor_id,
         kelas_snapshot=siswa.id_kelas,
     )
+    if db_pelanggaran.bukti_foto:
+        # Dinormalisasi (orientasi, WebP, thumbnail) oleh job evidence_images
+        db_pelanggaran.bukti_foto_original = db_pelanggaran.bukti_foto
+        db_pelanggaran.bukti_foto_status = schemas.EvidenceImageStatus.PENDING.value
+        storage.add_refs(db, [db_pelanggaran.bukti_foto, db_pelanggaran.bukti_foto_original])
     db.add(db_pelanggaran)
-    db.commit()
-    db.refresh(db_pelanggaran)
+    if commit:
+        db.commit()
+        db.refresh(db_pelanggaran)
+    else:
+        db.flush()
     return db_pelanggaran
 
 def get_pelanggaran_by_id(db: Session, pelanggaran_id: str):
@@ -758,8 +860,13 @@ def delete_pelanggaran(db: Session, pelanggaran_id: str) -> bool:
     pelanggaran = get_pelanggaran_by_id(db, pelanggaran_id)
     if not pelanggaran:
         return False
+    removable = storage.release_refs(
+        db,
+        [pelanggaran.bukti_foto, pelanggaran.bukti_foto_original, pelanggaran.bukti_foto_thumbnail],
+    )
     db.delete(pelanggaran)
     db.commit()
+    storage.delete_files(db, removable)
     return True
 
 def _get_allowed_nis_subquery(db: Session, user: schemas.User):
@@ -776,12 +883,9 @@ def _get_allowed_nis_subquery(db: Session, user: schemas.User):
         
         # Filter by angkatan (cohort) if set
         if user.angkatan_binaan:
-            tingkat = (user.angkatan_binaan or "").strip()
-            if tingkat:
-                tingkat_normalized = tingkat.lower()
-                conditions.append(
-                    func.lower(func.trim(models.Kelas.tingkat)) == tingkat_normalized
-                )
+            tingkat_normalized = models.normalize_tingkat(user.angkatan_binaan)
+            if tingkat_normalized:
+                conditions.append(models.Kelas.tingkat_norm == tingkat_normalized)
         
         # Filter by specific assigned classes if set
         kelas_list = _kelas_list(user.kelas_binaan)
@@ -803,7 +907,7 @@ def _get_allowed_nis_subquery(db: Session, user: schemas.User):
                 select(models.Siswa.nis)
                 .join(
                     models.Kelas,
-                    models.Kelas.nama_kelas == models.Siswa.id_kelas,
+                    models.Kelas.nama_kelas_norm == models.Siswa.id_kelas,
                 )
                 .where(or_(*conditions))
             )
@@ -830,19 +934,30 @@ def _apply_prestasi_scope_filters(query, db: Session, user: schemas.User):
     return query
 
 
-def create_prestasi(db: Session, prestasi: schemas.PrestasiCreate, pencatat_id: str):
-    """Membuat catatan prestasi baru dengan status awal submitted."""
-    siswa = get_siswa_by_nis(db, prestasi.nis_siswa)
+def validate_prestasi_siswa(db: Session, nis_siswa: str) -> models.Siswa:
+    """Memastikan siswa penerima prestasi ada dan berstatus aktif."""
+    siswa = get_siswa_by_nis(db, nis_siswa)
     if not siswa:
         raise ValueError("Siswa tidak ditemukan untuk NIS yang diberikan")
     if siswa.status_siswa != schemas.SiswaStatus.AKTIF.value:
         raise ValueError("Prestasi hanya dapat dicatat untuk siswa berstatus aktif")
+    return siswa
+
+
+def create_prestasi(db: Session, prestasi: schemas.PrestasiCreate, pencatat_id: str):
+    """Membuat catatan prestasi baru dengan status awal submitted."""
+    siswa = validate_prestasi_siswa(db, prestasi.nis_siswa)
 
     db_prestasi = models.Prestasi(
         **prestasi.model_dump(),
         pencatat_id=pencatat_id,
         kelas_snapshot=siswa.id_kelas,
     )
+    if db_prestasi.bukti:
+        # Dinormalisasi (orientasi, WebP, thumbnail) oleh job evidence_images
+        db_prestasi.bukti_original = db_prestasi.bukti
+        db_prestasi.bukti_status = schemas.EvidenceImageStatus.PENDING.value
+        storage.add_refs(db, [db_prestasi.bukti, db_prestasi.bukti_original])
     db.add(db_prestasi)
     db.commit()
     db.refresh(db_prestasi)
@@ -874,11 +989,27 @@ def update_prestasi(
         if not siswa:
             raise ValueError("Siswa tidak ditemukan untuk NIS yang diberikan")
         db_prestasi.kelas_snapshot = siswa.id_kelas
+    removable = []
+    if "bukti" in update_data and update_data["bukti"] != db_prestasi.bukti:
+        # Key kiriman klien harus merujuk file hasil unggahan yang memang ada
+        if update_data["bukti"] and not storage.is_stored(db, update_data["bukti"]):
+            raise ValueError("File bukti tidak ditemukan")
+        # Bukti diganti manual: rujukan lama dilepas, versi olahan lama tidak berlaku lagi
+        removable = storage.release_refs(
+            db, [db_prestasi.bukti, db_prestasi.bukti_original, db_prestasi.bukti_thumbnail]
+        )
+        db_prestasi.bukti_original = update_data["bukti"]
+        db_prestasi.bukti_thumbnail = None
+        db_prestasi.bukti_status = (
+            schemas.EvidenceImageStatus.PENDING.value if update_data["bukti"] else None
+        )
+        storage.add_refs(db, [update_data["bukti"], update_data["bukti"]])
     for field, value in update_data.items():
         setattr(db_prestasi, field, value)
 
     db.commit()
     db.refresh(db_prestasi)
+    storage.delete_files(db, removable)
     return db_prestasi
 
 
@@ -891,8 +1022,12 @@ def delete_prestasi(db: Session, prestasi_id: str) -> bool:
     if not db_prestasi:
         return False
 
+    removable = storage.release_refs(
+        db, [db_prestasi.bukti, db_prestasi.bukti_original, db_prestasi.bukti_thumbnail]
+    )
     db.delete(db_prestasi)
     db.commit()
+    storage.delete_files(db, removable)
     return True
 
 
@@ -1159,21 +1294,55 @@ def _to_local(dt) -> datetime | None:
     return dt.astimezone(LOCAL_TIMEZONE)
 
 
-def get_config(db: Session, key: str) -> str | None:
-    """Mengambil nilai konfigurasi sistem."""
-    cfg = db.query(models.SystemConfig).filter(models.SystemConfig.key == key).first()
-    return cfg.value if cfg else None
+PUBLIC_STATS_SNAPSHOT_KEY = "public_stats_snapshot"
+
+
+def compute_public_stats(db: Session) -> dict:
+    """Menghitung statistik publik landing page langsung dari database."""
+    total_siswa = db.query(func.count(models.Siswa.nis)).filter(models.Siswa.aktif == True).scalar() or 0
+    total_prestasi = db.query(func.count(models.Prestasi.id)).scalar() or 0
+
+    # Ratio siswa tanpa pelanggaran aktif dibanding total siswa
+    siswa_melanggar = (
+        db.query(func.count(func.distinct(models.Pelanggaran.nis_siswa)))
+        .filter(models.Pelanggaran.status != schemas.PelanggaranStatus.RESOLVED.value)
+        .scalar()
+    ) or 0
+
+    disiplin_percent = 100
+    if total_siswa > 0:
+        ratio = (total_siswa - siswa_melanggar) / total_siswa
+        disiplin_percent = round(ratio * 100, 1)
+
+    return {
+        "total_siswa": total_siswa,
+        "tingkat_disiplin": f"{disiplin_percent}%",
+        "total_prestasi": total_prestasi,
+        "uptime_sistem": "99.9%",
+    }
+
+
+def refresh_public_stats_snapshot(db: Session) -> dict:
+    """Menyimpan snapshot statistik publik ke SystemConfig (dipanggil job terjadwal)."""
+    stats = compute_public_stats(db)
+    payload = {**stats, "computed_at": datetime.now(timezone.utc).isoformat()}
+    config_store.store.set(db, PUBLIC_STATS_SNAPSHOT_KEY, payload)
+    return stats
+
+
+def get_public_stats_snapshot(db: Session, max_age: timedelta) -> Optional[dict]:
+    """Mengambil snapshot statistik publik bila ada dan belum lebih tua dari ``max_age``."""
+    payload = config_store.store.get(db, PUBLIC_STATS_SNAPSHOT_KEY)
+    if not payload:
+        return None
+    try:
+        computed_at = datetime.fromisoformat(payload.pop("computed_at"))
+    except (TypeError, ValueError, KeyError):
+        return None
+    if datetime.now(timezone.utc) - computed_at > max_age:
+        return None
+    return payload
 
-def set_config(db: Session, key: str, value: str):
-    """Mengatur nilai konfigurasi sistem."""
-    cfg = db.query(models.SystemConfig).filter(models.SystemConfig.key == key).first()
-    if cfg:
-        cfg.value = value
-    else:
-        cfg = models.SystemConfig(key=key, value=value)
-        db.add(cfg)
-    db.commit()
-    return cfg
 
 def get_guru_wali_access_list(db: Session):
     """Mengambil daftar ID user yang memiliki akses Guru Wali."""
@@ -1241,8 +1410,7 @@ def add_perwalian_student(db: Session, teacher_id: str, nis: str):
         raise ValueError("Siswa sudah memiliki Guru Wali")
     
     # Check global config period
-    period_active = get_config(db, "perwalian_period_active")
-    if period_active != "true":
+    if not config_store.store.get(db, "perwalian_period_active"):
          raise ValueError("Periode perwalian sedang ditutup")
 
     perwalian = models.Perwalian(teacher_id=teacher_id, nis_siswa=nis)
@@ -1315,14 +1483,13 @@ def _get_user_scope_filter(db: Session, user: schemas.User):
     # 4. Akses Berbasis Angkatan (Guru BK)
     # Jika user memiliki angkatan_binaan (misal "10", "11", "12")
     if user.angkatan_binaan:
-        tingkat = (user.angkatan_binaan or "").strip()
-        if tingkat:
-            tingkat_normalized = tingkat.lower()
+        tingkat_normalized = models.normalize_tingkat(user.angkatan_binaan)
+        if tingkat_normalized:
             criteria.append(
                 models.Pelanggaran.nis_siswa.in_(
-                     select(models.Siswa.nis)
-                    .join(models.Kelas, models.Kelas.nama_kelas == models.Siswa.id_kelas)
-                    .where(func.lower(func.trim(models.Kelas.tingkat)) == tingkat_normalized)
+                    select(models.Siswa.nis)
+                    .join(models.Kelas, models.Kelas.nama_kelas_norm == models.Siswa.id_kelas)
+                    .where(models.Kelas.tingkat_norm == tingkat_normalized)
                 )
             )
 
@@ -2041,12 +2208,8 @@ def _sync_kelas_from_student(db: Session, siswa: schemas.SiswaCreate):
     if not kelas_name:
         return
 
-    kelas_name_upper = kelas_name.upper()
-    kelas = (
-        db.query(models.Kelas)
-        .filter(func.upper(models.Kelas.nama_kelas) == kelas_name_upper)
-        .first()
-    )
+    kelas_name_upper = models.normalize_nama_kelas(kelas_name)
+    kelas = get_kelas_by_name(db, kelas_name_upper)
 
     if not kelas:
         raise ValueError(f"Kelas '{kelas_name_upper}' belum terdaftar di master data")
@@ -2061,27 +2224,68 @@ def _sync_kelas_from_student(db: Session, siswa: schemas.SiswaCreate):
     if updated:
         db.flush()
 
-def delete_expired_students(db: Session):
-    """Hard delete siswa yang scheduled_deletion_at-nya sudah lewat."""
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "500"))
+
+
+def delete_expired_students(
+    db: Session,
+    batch_size: int = PURGE_BATCH_SIZE,
+    should_stop: Optional[Callable[[], bool]] = None,
+):
+    """Hard delete siswa yang scheduled_deletion_at-nya sudah lewat, per batch.
+
+    Setiap batch menghapus rekam jejak anak lalu siswanya dengan satu DELETE per
+    tabel dan di-commit sendiri, sehingga transaksi tetap kecil. File bukti
+    pelanggaran/prestasi dari baris yang terhapus ikut dibersihkan setelah commit.
+    ``should_stop`` dicek di antara batch agar pemanggil bisa menghentikan purge lebih awal.
+    """
     now = datetime.now(timezone.utc)
-    expired_students = (
-        db.query(models.Siswa)
-        .filter(models.Siswa.scheduled_deletion_at <= now)
-        .all()
-    )
     count = 0
-    for siswa in expired_students:
-        # Gunakan hard delete logic yang sama (atau cascade di sini)
-        # Note: Ini akan menghapus permanen sesuai request
-        db.query(models.Pelanggaran).filter(models.Pelanggaran.nis_siswa == siswa.nis).delete(synchronize_session=False)
-        db.query(models.RiwayatKelas).filter(models.RiwayatKelas.nis == siswa.nis).delete(synchronize_session=False)
-        # Hapus prestasi juga karena prompt bilang "dihapus semua rekam jejaknya" untuk expiration case
-        db.query(models.Prestasi).filter(models.Prestasi.nis_siswa == siswa.nis).delete(synchronize_session=False)
-        db.query(models.Perwalian).filter(models.Perwalian.nis_siswa == siswa.nis).delete(synchronize_session=False)
-        
-        db.delete(siswa)
-        count += 1
-    
-    if count > 0:
-        db.commit()
+    while True:
+        # NIS batch diambil sekali agar semua DELETE di batch ini menyasar siswa yang sama
+        batch_nis = db.scalars(
+            select(models.Siswa.nis)
+            .where(models.Siswa.scheduled_deletion_at <= now)
+            .order_by(models.Siswa.nis)
+            .limit(batch_size)
+        ).all()
+        if not batch_nis:
+            break
+
+        try:
+            bukti_rows = db.execute(
+                delete(models.Pelanggaran)
+                .where(models.Pelanggaran.nis_siswa.in_(batch_nis))
+                .returning(
+                    models.Pelanggaran.bukti_foto,
+                    models.Pelanggaran.bukti_foto_original,
+                    models.Pelanggaran.bukti_foto_thumbnail,
+                )
+            ).all()
+            bukti_rows += db.execute(
+                delete(models.Prestasi)
+                .where(models.Prestasi.nis_siswa.in_(batch_nis))
+                .returning(
+                    models.Prestasi.bukti,
+                    models.Prestasi.bukti_original,
+                    models.Prestasi.bukti_thumbnail,
+                )
+            ).all()
+            removable = storage.release_refs(
+                db, [filename for row in bukti_rows for filename in row if filename]
+            )
+            db.execute(delete(models.RiwayatKelas).where(models.RiwayatKelas.nis.in_(batch_nis)))
+            db.execute(delete(models.Perwalian).where(models.Perwalian.nis_siswa.in_(batch_nis)))
+            deleted = db.execute(
+                delete(models.Siswa).where(models.Siswa.nis.in_(batch_nis))
+            ).rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        storage.delete_files(db, set(removable))
+        count += deleted
+        if len(batch_nis) < batch_size or (should_stop and should_stop()):
+            break
     return count
@@ -0,0 +1,93 @@
+"""Engine dan dependency session SQLAlchemy async untuk endpoint baca yang paling sering diakses.
+
+Endpoint sync menempati satu thread threadpool AnyIO selama query berjalan,
+sehingga lonjakan request baca ikut mengantre di threadpool tersebut.
+Endpoint yang memakai ``get_async_db`` menunggu database langsung di event
+loop lewat driver asyncpg (aiosqlite untuk pengujian SQLite) dan hanya
+dibatasi pool koneksinya sendiri.
+
+Query tetap ditulis sekali di ``crud`` dalam bentuk sync; ``run_read``
+menjalankannya di atas koneksi async lewat ``AsyncSession.run_sync``.
+"""
+
+import os
+from typing import Any, Callable, Optional, Type
+
+from pydantic import BaseModel
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from .database import DB_POOL_PRE_PING, DB_POOL_RECYCLE_SECONDS, DB_POOL_TIMEOUT_SECONDS, SQLALCHEMY_DATABASE_URL
+from .db_metrics import InstrumentedAsyncQueuePool
+
+# Driver async pengganti driver sync pada DATABASE_URL
+_ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# Endpoint async tidak dibatasi threadpool; pool ini yang membatasi query bersamaan
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "10"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10"))
+
+
+def _to_async_url(url: str) -> str:
+    """URL ``DATABASE_URL`` dengan driver sync diganti driver async padanannya."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise ValueError(f"Database {backend} belum didukung engine async")
+    parsed = parsed.set(drivername=_ASYNC_DRIVERS[backend])
+    if "sslmode" in parsed.query:
+        # asyncpg menamai opsi ini "ssl" dengan nilai yang sama (require, verify-full, ...)
+        parsed = parsed.difference_update_query(["sslmode"]).update_query_dict(
+            {"ssl": parsed.query["sslmode"]}
+        )
+    return parsed.render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _to_async_url(SQLALCHEMY_DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=InstrumentedAsyncQueuePool,
+    pool_size=ASYNC_DB_POOL_SIZE,
+    max_overflow=ASYNC_DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+    pool_recycle=DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+# Objek hasil query tetap bisa dibaca setelah commit tanpa lazy load tersembunyi
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    """Dependency FastAPI yang menyediakan sesi database async per request."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def run_read(
+    db: AsyncSession,
+    func: Callable[..., Any],
+    *args,
+    schema: Optional[Type[BaseModel]] = None,
+    **kwargs,
+) -> Any:
+    """Menjalankan fungsi baca sync ``func(session, *args, **kwargs)`` di koneksi async ``db``.
+
+    Bila ``schema`` diberikan, hasil ORM (objek tunggal atau list) dikonversi
+    ke schema tersebut di dalam ``run_sync`` juga, sehingga relasi yang dimuat
+    secara lazy saat serialisasi tetap bisa di-query.
+    """
+
+    def _call(session):
+        result = func(session, *args, **kwargs)
+        if schema is None or result is None:
+            return result
+        if isinstance(result, list):
+            return [schema.model_validate(item) for item in result]
+        return schema.model_validate(result)
+
+    return await db.run_sync(_call)
@@ -0,0 +1,158 @@
+"""Metrik pool koneksi database: lama menunggu checkout dan jumlah checkout per route.
+
+``InstrumentedQueuePool`` (engine sync) dan ``InstrumentedAsyncQueuePool``
+(engine async) mengukur waktu yang dihabiskan request untuk mendapatkan
+koneksi dari pool (termasuk membuka koneksi overflow baru) dan mencatat
+timeout, masing-masing ke ``metrics`` dan ``async_metrics``. Route asal
+checkout diketahui dari scope ASGI request yang sedang berjalan, disimpan
+``RouteContextMiddleware`` di context variable; checkout dari thread latar
+belakang dicatat sebagai ``background``.
+"""
+
+import bisect
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Batas atas bucket histogram waktu tunggu checkout (milidetik)
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+BACKGROUND_ROUTE = "background"
+
+_current_scope: ContextVar[Optional[dict]] = ContextVar("db_metrics_scope", default=None)
+# Penanda checkout yang sedang diukur; context variable (bukan thread-local)
+# karena checkout engine async berjalan di greenlet, bukan di thread terpisah
+_timing: ContextVar[bool] = ContextVar("db_metrics_timing", default=False)
+
+
+def _route_label() -> str:
+    scope = _current_scope.get()
+    if scope is None:
+        return BACKGROUND_ROUTE
+    route = scope.get("route")
+    # Template path (misal /api/siswa/{nis}) agar label tidak meledak per nilai parameter
+    path = getattr(route, "path", None) or "unmatched"
+    return f"{scope.get('method', '')} {path}"
+
+
+class PoolMetrics:
+    """Penghitung kumulatif sejak proses dimulai."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.checkouts_by_route: Counter = Counter()
+        self.timeouts_by_route: Counter = Counter()
+        self.peak_checked_out = 0
+
+    def record_checkout(self, wait_ms: float, route: str, checked_out: int):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+            self.checkouts_by_route[route] += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def record_timeout(self, route: str):
+        with self._lock:
+            self.timeouts += 1
+            self.timeouts_by_route[route] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            bounds = [str(bound) for bound in WAIT_BUCKETS_MS] + ["+Inf"]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "peak_checked_out": self.peak_checked_out,
+                "wait_avg_ms": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else None,
+                "wait_max_ms": round(self.wait_max_ms, 3),
+                "wait_histogram_ms": [
+                    {"le": bound, "count": count} for bound, count in zip(bounds, self.wait_buckets)
+                ],
+                "checkouts_by_route": dict(self.checkouts_by_route.most_common()),
+                "timeouts_by_route": dict(self.timeouts_by_route.most_common()),
+            }
+
+
+metrics = PoolMetrics()
+async_metrics = PoolMetrics()
+
+
+class _TimedCheckout:
+    """Mixin pool antrean yang mencatat waktu tunggu setiap checkout ke ``pool_metrics``."""
+
+    pool_metrics: PoolMetrics
+
+    def _do_get(self):
+        # QueuePool._do_get memanggil dirinya sendiri saat mencoba ulang; ukur sekali saja
+        if _timing.get():
+            return super()._do_get()
+        token = _timing.set(True)
+        started = time.perf_counter()
+        try:
+            entry = super()._do_get()
+        except exc.TimeoutError:
+            self.pool_metrics.record_timeout(_route_label())
+            raise
+        finally:
+            _timing.reset(token)
+        self.pool_metrics.record_checkout(
+            (time.perf_counter() - started) * 1000, _route_label(), self.checkedout()
+        )
+        return entry
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    """``QueuePool`` engine sync yang mencatat checkout ke ``metrics``."""
+
+    pool_metrics = metrics
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    """``AsyncAdaptedQueuePool`` engine async yang mencatat checkout ke ``async_metrics``."""
+
+    pool_metrics = async_metrics
+
+
+class RouteContextMiddleware:
+    """Menyimpan scope request berjalan agar checkout koneksi tahu route asalnya."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # Router mengisi scope["route"] di dict yang sama setelah routing
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_scope.reset(token)
+
+
+def pool_status(pool) -> dict:
+    """Keadaan pool saat ini beserta konfigurasinya."""
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            # overflow() bernilai negatif selama koneksi inti belum semuanya dibuka
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout(),
+        })
+    return status
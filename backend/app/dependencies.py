@@ -2,17 +2,16 @@
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from . import crud, schemas, auth_utils
 from .database import get_db
+from .database_async import get_async_db
 
 security = HTTPBearer()
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security), 
-    db: Session = Depends(get_db)
-) -> schemas.User:
-    """Memvalidasi token Bearer dan mengembalikan pengguna terautentikasi."""
+def _token_nip(credentials: HTTPAuthorizationCredentials) -> str:
+    """NIP pemilik token Bearer; 401 bila token tidak valid."""
     token_data = auth_utils.decode_token(credentials.credentials)
     if not token_data or not token_data.nip:
         raise HTTPException(
@@ -20,7 +19,9 @@ def get_current_user(
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = crud.get_user_by_nip(db, nip=token_data.nip)
+    return token_data.nip
+
+def _ensure_user(user):
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -29,6 +30,26 @@ def get_current_user(
         )
     return user
 
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security), 
+    db: Session = Depends(get_db)
+) -> schemas.User:
+    """Memvalidasi token Bearer dan mengembalikan pengguna terautentikasi."""
+    nip = _token_nip(credentials)
+    return _ensure_user(crud.get_user_by_nip(db, nip=nip))
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db),
+) -> schemas.User:
+    """Versi async ``get_current_user`` untuk endpoint yang memakai ``get_async_db``.
+
+    Objek pengguna terikat ke sesi async request yang sama, sehingga bisa
+    diteruskan ke fungsi crud yang dijalankan lewat ``run_read``.
+    """
+    nip = _token_nip(credentials)
+    return _ensure_user(await db.run_sync(crud.get_user_by_nip, nip))
+
 def get_admin_user(current_user: schemas.User = Depends(get_current_user)) -> schemas.User:
     """Memvalidasi bahwa pengguna memiliki peran admin."""
     if current_user.role != schemas.UserRole.ADMIN:
@@ -0,0 +1,349 @@
+"""Outbox email yang tahan restart beserta worker pengirimnya.
+
+Router menulis baris ``email_outbox`` lewat ``enqueue`` di transaksi yang sama
+dengan perubahan datanya, sehingga email hanya terkirim bila perubahan benar
+tersimpan dan tidak hilang bila proses mati. Worker latar belakang mengklaim
+baris per batch, mengirimnya lewat pool SMTP, menjadwalkan ulang kegagalan
+dengan backoff eksponensial, dan memindahkan yang gagal terus ke dead letter.
+"""
+
+import json
+import logging
+import os
+import random
+import smtplib
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from . import email_service, models, schemas
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "20"))
+POLL_INTERVAL_SECONDS = int(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL", "5"))
+MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE_SECONDS = int(os.getenv("EMAIL_OUTBOX_BACKOFF_BASE_SECONDS", "30"))
+BACKOFF_MAX_SECONDS = int(os.getenv("EMAIL_OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+# Baris "sending" tanpa kabar selama ini dianggap ditinggal worker yang mati
+STALE_AFTER = timedelta(minutes=5)
+# Mode digest: notifikasi pelanggaran ke penerima yang sama dalam jendela ini digabung jadi satu email.
+# 0 = mati (setiap pelanggaran dikirim sendiri-sendiri)
+VIOLATION_DIGEST_WINDOW = timedelta(minutes=int(os.getenv("VIOLATION_DIGEST_WINDOW_MINUTES", "0")))
+# Jenis email yang bisa digabung -> jenis email digest-nya
+DIGEST_KINDS = {"violation": "violation_digest"}
+# Field payload berisi kredensial; dihapus saat email masuk dead letter
+SENSITIVE_PAYLOAD_FIELDS = frozenset({"raw_password"})
+
+_wake_event = threading.Event()
+_worker_lock = threading.Lock()
+_worker_thread: Optional[threading.Thread] = None
+
+
+def enqueue(db: Session, kind: str, **payload) -> models.EmailOutbox:
+    """Menambahkan email ke outbox tanpa commit; ikut tersimpan bersama transaksi pemanggil."""
+    if kind not in email_service.MESSAGE_BUILDERS:
+        raise ValueError(f"Jenis email tidak dikenal: {kind}")
+    recipient = payload.get("recipient_email") or payload.get("old_email")
+    if not recipient:
+        raise ValueError("Penerima email wajib diisi")
+    now = datetime.now(timezone.utc)
+    item = models.EmailOutbox(
+        kind=kind,
+        recipient=recipient,
+        payload=json.dumps(payload),
+        status=schemas.EmailOutboxStatus.PENDING.value,
+        attempts=0,
+        next_attempt_at=now,
+    )
+    if kind in DIGEST_KINDS and VIOLATION_DIGEST_WINDOW:
+        item.digest_key = f"{kind}:{recipient.strip().lower()}"
+        item.next_attempt_at = _digest_due_at(db, item.digest_key, now)
+    db.add(item)
+    return item
+
+
+def _digest_due_at(db: Session, digest_key: str, now: datetime) -> datetime:
+    """Ikut jadwal digest yang sedang terbuka untuk penerima ini, atau buka jendela baru."""
+    open_due_at = (
+        db.query(func.min(models.EmailOutbox.next_attempt_at))
+        .filter(
+            models.EmailOutbox.digest_key == digest_key,
+            models.EmailOutbox.status == schemas.EmailOutboxStatus.PENDING.value,
+            models.EmailOutbox.attempts == 0,
+        )
+        .scalar()
+    )
+    if open_due_at is not None:
+        return open_due_at
+    return now + VIOLATION_DIGEST_WINDOW
+
+
+def backoff_delay(attempts: int) -> timedelta:
+    """Jeda sebelum percobaan berikutnya: eksponensial dengan jitter, dibatasi maksimum."""
+    delay = min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _claimable_filter(now: datetime):
+    """Baris yang boleh diklaim: pending yang sudah jatuh tempo atau sending yang basi."""
+    return or_(
+        and_(
+            models.EmailOutbox.status == schemas.EmailOutboxStatus.PENDING.value,
+            models.EmailOutbox.next_attempt_at <= now,
+        ),
+        and_(
+            models.EmailOutbox.status == schemas.EmailOutboxStatus.SENDING.value,
+            models.EmailOutbox.locked_at < now - STALE_AFTER,
+        ),
+    )
+
+
+def claim_batch(db: Session, worker_id: str, limit: int = BATCH_SIZE) -> list[models.EmailOutbox]:
+    """Mengklaim satu batch secara atomik dengan token unik agar tidak dikirim dua worker."""
+    now = datetime.now(timezone.utc)
+    candidate_ids = [
+        item_id
+        for (item_id,) in db.query(models.EmailOutbox.id)
+        .filter(_claimable_filter(now))
+        .order_by(models.EmailOutbox.next_attempt_at.asc())
+        .limit(limit)
+    ]
+    if not candidate_ids:
+        return []
+    token = f"{worker_id}:{uuid.uuid4()}"
+    db.query(models.EmailOutbox).filter(
+        models.EmailOutbox.id.in_(candidate_ids),
+        _claimable_filter(now),
+    ).update(
+        {
+            models.EmailOutbox.status: schemas.EmailOutboxStatus.SENDING.value,
+            models.EmailOutbox.locked_by: token,
+            models.EmailOutbox.locked_at: now,
+        },
+        synchronize_session=False,
+    )
+    claimed = db.query(models.EmailOutbox).filter(models.EmailOutbox.locked_by == token).all()
+
+    # Anggota digest yang sama ikut diklaim walau jadwalnya belum tiba
+    digest_keys = {item.digest_key for item in claimed if item.digest_key}
+    if digest_keys:
+        db.query(models.EmailOutbox).filter(
+            models.EmailOutbox.digest_key.in_(digest_keys),
+            models.EmailOutbox.status == schemas.EmailOutboxStatus.PENDING.value,
+        ).update(
+            {
+                models.EmailOutbox.status: schemas.EmailOutboxStatus.SENDING.value,
+                models.EmailOutbox.locked_by: token,
+                models.EmailOutbox.locked_at: now,
+            },
+            synchronize_session=False,
+        )
+        claimed = db.query(models.EmailOutbox).filter(models.EmailOutbox.locked_by == token).all()
+    db.commit()
+    return claimed
+
+
+def _is_permanent_failure(exc: Exception) -> bool:
+    """Kegagalan yang tidak akan berhasil bila diulang (payload rusak, alamat ditolak, 5xx)."""
+    if isinstance(exc, (ValueError, TypeError, KeyError, smtplib.SMTPRecipientsRefused)):
+        return True
+    return isinstance(exc, smtplib.SMTPResponseException) and 500 <= exc.smtp_code < 600
+
+
+def _build_group_message(items: list[models.EmailOutbox]):
+    """Satu baris -> email biasa; beberapa baris satu digest -> email ringkasan."""
+    first = items[0]
+    if len(items) == 1:
+        return email_service.build_message(first.kind, json.loads(first.payload or "{}"))
+    entries = [json.loads(item.payload or "{}") for item in items]
+    return email_service.build_message(
+        DIGEST_KINDS[first.kind],
+        {"recipient_email": entries[0]["recipient_email"], "entries": entries},
+    )
+
+
+def redact_payload(payload: Optional[str]) -> Optional[str]:
+    """Payload JSON tanpa field kredensial; None bila payload tidak bisa dibaca."""
+    try:
+        data = json.loads(payload or "{}")
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    if not SENSITIVE_PAYLOAD_FIELDS.intersection(data):
+        return payload
+    return json.dumps({key: value for key, value in data.items() if key not in SENSITIVE_PAYLOAD_FIELDS})
+
+
+def _is_redacted(item: models.EmailOutbox) -> bool:
+    """True bila payload kehilangan field kredensial yang dibutuhkan penyusun emailnya."""
+    if item.kind != "account":
+        return False
+    try:
+        payload = json.loads(item.payload or "{}")
+    except ValueError:
+        return True
+    return not isinstance(payload, dict) or not SENSITIVE_PAYLOAD_FIELDS.issubset(payload)
+
+
+def _send_group(items: list[models.EmailOutbox], now: datetime):
+    """Mengirim satu email untuk sekelompok baris lalu memperbarui status semuanya."""
+    for item in items:
+        item.attempts = (item.attempts or 0) + 1
+        item.locked_by = None
+        item.locked_at = None
+    first = items[0]
+    try:
+        email_service.deliver(_build_group_message(items))
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"[:1000]
+        dead = _is_permanent_failure(exc) or max(item.attempts for item in items) >= MAX_ATTEMPTS
+        retry_at = now + backoff_delay(max(item.attempts for item in items))
+        for item in items:
+            item.last_error = error
+            if dead:
+                item.status = schemas.EmailOutboxStatus.DEAD.value
+                # Baris dead tidak dikirim otomatis lagi; kredensialnya tidak perlu disimpan
+                item.payload = redact_payload(item.payload)
+            else:
+                item.status = schemas.EmailOutboxStatus.PENDING.value
+                item.next_attempt_at = retry_at
+        if dead:
+            logger.error("Email %s ke %s dipindah ke dead letter: %s", first.kind, first.recipient, exc)
+        return
+    sent_at = datetime.now(timezone.utc)
+    for item in items:
+        item.status = schemas.EmailOutboxStatus.SENT.value
+        item.sent_at = sent_at
+        item.last_error = None
+        item.payload = None
+    logger.info("Email %s (%s pesan) berhasil dikirim ke %s", first.kind, len(items), first.recipient)
+
+
+def process_batch(db: Session, worker_id: str) -> int:
+    """Mengklaim dan mengirim satu batch; mengembalikan jumlah baris yang diproses."""
+    items = claim_batch(db, worker_id)
+    if not items:
+        return 0
+    now = datetime.now(timezone.utc)
+    if not email_service.is_configured():
+        for item in items:
+            item.status = schemas.EmailOutboxStatus.SKIPPED.value
+            item.locked_by = None
+            item.locked_at = None
+            item.payload = None
+            item.last_error = "SMTP_PASSWORD tidak terisi; email dilewati"
+        db.commit()
+        logger.warning("SMTP_PASSWORD tidak terisi; %s email dilewati", len(items))
+        return len(items)
+    groups: dict[str, list[models.EmailOutbox]] = {}
+    for item in sorted(items, key=lambda row: row.created_at or now):
+        groups.setdefault(item.digest_key or item.id, []).append(item)
+    for group in groups.values():
+        _send_group(group, now)
+        # Commit per email agar email yang sudah terkirim tidak dikirim ulang bila worker mati
+        db.commit()
+    return len(items)
+
+
+def get_status(db: Session, dead_limit: int = 20) -> dict:
+    """Ringkasan outbox: jumlah per status, umur antrean tertua, dan dead letter terbaru."""
+    counts = {status.value: 0 for status in schemas.EmailOutboxStatus}
+    for status_value, total in (
+        db.query(models.EmailOutbox.status, func.count(models.EmailOutbox.id))
+        .group_by(models.EmailOutbox.status)
+    ):
+        counts[status_value] = total
+    oldest_pending = (
+        db.query(func.min(models.EmailOutbox.created_at))
+        .filter(models.EmailOutbox.status == schemas.EmailOutboxStatus.PENDING.value)
+        .scalar()
+    )
+    # Dikonversi di sini agar payload tidak ikut keluar dari modul ini
+    dead_letters = [
+        schemas.EmailOutboxItem.model_validate(item)
+        for item in (
+            db.query(models.EmailOutbox)
+            .filter(models.EmailOutbox.status == schemas.EmailOutboxStatus.DEAD.value)
+            .order_by(models.EmailOutbox.created_at.desc())
+            .limit(dead_limit)
+        )
+    ]
+    return {
+        "counts": counts,
+        "oldest_pending_at": oldest_pending,
+        "dead_letters": dead_letters,
+    }
+
+
+def retry_dead_letter(db: Session, item_id: str) -> Optional[models.EmailOutbox]:
+    """Mengembalikan satu dead letter ke antrean untuk dicoba lagi dari awal.
+
+    Melempar ``ValueError`` bila kredensial di payload-nya sudah dihapus,
+    karena email tersebut tidak bisa disusun ulang.
+    """
+    item = (
+        db.query(models.EmailOutbox)
+        .filter(
+            models.EmailOutbox.id == item_id,
+            models.EmailOutbox.status == schemas.EmailOutboxStatus.DEAD.value,
+        )
+        .first()
+    )
+    if item is None:
+        return None
+    if _is_redacted(item):
+        raise ValueError("Password awal di email ini sudah dihapus; reset password pengguna untuk mengirim ulang")
+    item.status = schemas.EmailOutboxStatus.PENDING.value
+    item.attempts = 0
+    item.next_attempt_at = datetime.now(timezone.utc)
+    db.commit()
+    db.refresh(item)
+    notify_worker()
+    return item
+
+
+def notify_worker():
+    """Membangunkan worker lokal agar segera mengirim email yang baru diantrikan."""
+    _wake_event.set()
+
+
+def _worker_loop(worker_id: str):
+    """Loop worker: kirim batch selama masih ada, lalu tunggu dibangunkan atau poll berikutnya."""
+    while True:
+        processed = 0
+        db = SessionLocal()
+        try:
+            processed = process_batch(db, worker_id)
+        except Exception as exc:
+            db.rollback()
+            print(f"Email outbox worker error: {exc}")
+        finally:
+            db.close()
+        if processed:
+            continue
+        _wake_event.wait(POLL_INTERVAL_SECONDS)
+        _wake_event.clear()
+
+
+def start_worker():
+    """Menyalakan worker outbox satu kali per proses."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        _worker_thread = threading.Thread(
+            target=_worker_loop,
+            args=(worker_id,),
+            name="email-outbox",
+            daemon=True,
+        )
+        _worker_thread.start()
@@ -1,8 +1,11 @@
-"""Layanan pengiriman email sederhana untuk pemberitahuan akun."""
+"""Penyusunan dan pengiriman email notifikasi (dikirim oleh worker ``email_outbox``)."""
 
+import html
 import logging
 import os
 import smtplib
+import threading
+import time
 from datetime import datetime
 from email.message import EmailMessage
 from typing import Optional
@@ -23,20 +26,140 @@ APP_LOGIN_URL = os.getenv("APP_LOGIN_URL", "https://dispo.sman1ketapang.sch.id/l
 
 print(f"DEBUG: Email Config Loaded - Host: {SMTP_HOST}, Port: {SMTP_PORT}, User: {SMTP_USERNAME}, SENDER: {EMAIL_SENDER} (Password Set: {'Yes' if SMTP_PASSWORD else 'No'})")
 
-
-def send_account_email(
+# Pool koneksi SMTP: sesi yang sudah TLS + login dipakai ulang selama belum idle terlalu lama
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_MAX_IDLE_SECONDS = int(os.getenv("SMTP_MAX_IDLE_SECONDS", "60"))
+# Koneksi yang menganggur lebih lama dari ini dicek dengan NOOP sebelum dipakai
+SMTP_KEEPALIVE_CHECK_SECONDS = int(os.getenv("SMTP_KEEPALIVE_CHECK_SECONDS", "15"))
+SMTP_TIMEOUT_SECONDS = int(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+# Matikan STARTTLS hanya untuk server SMTP lokal (misal saat pengujian)
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").strip().lower() not in {"0", "false", "no"}
+
+
+class SMTPConnectionPool:
+    """Pool koneksi SMTP terautentikasi dengan keep-alive, reconnect, dan batas idle."""
+
+    def __init__(self, size: int, max_idle_seconds: int):
+        self.size = max(size, 1)
+        self.max_idle_seconds = max_idle_seconds
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._idle: list[tuple[smtplib.SMTP, float]] = []
+        self._reaper: Optional[threading.Thread] = None
+
+    def _connect(self) -> smtplib.SMTP:
+        """Membuka koneksi baru lengkap dengan STARTTLS/SSL dan login."""
+        if SMTP_PORT == 465:
+            server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+        else:
+            server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+            if SMTP_STARTTLS:
+                server.starttls()
+        if SMTP_USERNAME and SMTP_PASSWORD:
+            server.login(SMTP_USERNAME, SMTP_PASSWORD)
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP):
+        """Menutup koneksi tanpa mempedulikan kegagalan QUIT."""
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self) -> smtplib.SMTP:
+        """Mengambil koneksi idle yang masih hidup, atau membuka yang baru."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, released_at = self._idle.pop()
+            idle_for = time.monotonic() - released_at
+            if idle_for > self.max_idle_seconds:
+                self._close(server)
+                continue
+            if idle_for > SMTP_KEEPALIVE_CHECK_SECONDS and not self._is_alive(server):
+                self._close(server)
+                continue
+            return server
+        return self._connect()
+
+    def _checkin(self, server: smtplib.SMTP):
+        with self._lock:
+            self._idle.append((server, time.monotonic()))
+        self._ensure_reaper()
+
+    @staticmethod
+    def _is_connection_error(exc: Exception) -> bool:
+        """Kegagalan akibat koneksi putus/ditutup server, layak dicoba ulang dengan koneksi baru."""
+        if isinstance(exc, smtplib.SMTPResponseException):
+            return exc.smtp_code == 421
+        if isinstance(exc, smtplib.SMTPException):
+            return isinstance(exc, smtplib.SMTPServerDisconnected)
+        return isinstance(exc, (ConnectionError, TimeoutError))
+
+    def send(self, message: EmailMessage):
+        """Mengirim pesan; bila koneksi lama terputus, dicoba sekali lagi dengan koneksi baru."""
+        with self._slots:
+            server = self._checkout()
+            try:
+                server.send_message(message)
+            except Exception as exc:
+                self._close(server)
+                if not self._is_connection_error(exc):
+                    raise
+                server = self._connect()
+                try:
+                    server.send_message(message)
+                except Exception:
+                    self._close(server)
+                    raise
+            self._checkin(server)
+
+    def close_idle(self, older_than: float = 0):
+        """Menutup koneksi yang menganggur lebih lama dari ``older_than`` detik."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [item for item in self._idle if now - item[1] >= older_than]
+            self._idle = [item for item in self._idle if now - item[1] < older_than]
+        for server, _ in expired:
+            self._close(server)
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(max(self.max_idle_seconds / 2, 1))
+            self.close_idle(self.max_idle_seconds)
+
+    def _ensure_reaper(self):
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name="smtp-pool-reaper", daemon=True)
+            self._reaper.start()
+
+
+smtp_pool = SMTPConnectionPool(SMTP_POOL_SIZE, SMTP_MAX_IDLE_SECONDS)
+
+
+def build_account_email(
     *,
     recipient_email: str, 
     nip: str,
     login_email: str,
     raw_password: str,
     full_name: Optional[str] = None,
-) -> None:
-    """Mengirim email kredensial akun baru kepada pengguna."""
-    if not SMTP_PASSWORD:
-        logger.warning("SMTP_PASSWORD tidak terisi; email ke %s dilewati", recipient_email)
-        return
-
+) -> EmailMessage:
+    """Menyusun email kredensial akun baru kepada pengguna."""
     greeting = f"Halo {full_name}," if full_name else "Halo,"
 
     text_body = (
@@ -72,21 +195,10 @@ def send_account_email(
     message.set_content(text_body)
     message.add_alternative(html_body, subtype="html")
 
-    try:
-        if SMTP_PORT == 465:
-            with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as server:
-                server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                server.send_message(message)
-        else:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-                server.starttls()
-                server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                server.send_message(message)
-    except Exception:
-        logger.exception("Gagal mengirim email kredensial ke %s", recipient_email)
+    return message
 
 
-def send_violation_notification(
+def build_violation_notification(
     *,
     recipient_email: str,
     student_name: str,
@@ -95,12 +207,8 @@ def send_violation_notification(
     incident_date: str,
     reporter_name: str,
     detail: str
-) -> None:
-    """Mengirim notifikasi email ke wali kelas saat siswa melakukan pelanggaran."""
-    if not SMTP_PASSWORD:
-        logger.warning("SMTP_PASSWORD tidak terisi; notifikasi ke %s dilewati", recipient_email)
-        return
-
+) -> EmailMessage:
+    """Menyusun notifikasi email ke wali kelas saat siswa melakukan pelanggaran."""
     subject = f"Laporan Pelanggaran Siswa - {student_name} ({student_class})"
     
     text_body = f"""
@@ -176,32 +284,16 @@ def send_violation_notification(
     message["From"] = EMAIL_SENDER
     message["To"] = recipient_email
 
-    try:
-        if SMTP_PORT == 465:
-            with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as server:
-                server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                server.send_message(message)
-        else:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-                server.starttls()
-                server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                server.send_message(message)
-        logger.info("Email notifikasi pelanggaran (%s) berhasil dikirim ke %s", student_name, recipient_email)
-    except Exception:
-        logger.exception("Gagal mengirim email notifikasi pelanggaran ke %s", recipient_email)
+    return message
 
 
-def send_account_update_notification(
+def build_account_update_notification(
     *,
     recipient_email: str,
     full_name: str,
     changes: list[str]
-) -> None:
-    """Mengirim email notifikasi saat ada perubahan pada akun (email/password)."""
-    if not SMTP_PASSWORD:
-        logger.warning("SMTP_PASSWORD tidak terisi; notifikasi akun ke %s dilewati", recipient_email)
-        return
-
+) -> EmailMessage:
+    """Menyusun email notifikasi saat ada perubahan pada akun (email/password)."""
     change_list = "\n".join([f"- {c}" for c in changes])
     change_list_html = "".join([f"<li>{c}</li>" for c in changes])
 
@@ -256,30 +348,16 @@ def send_account_update_notification(
     message["From"] = EMAIL_SENDER
     message["To"] = recipient_email
 
-    try:
-        if SMTP_PORT == 465:
-            with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as server:
-                server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                server.send_message(message)
-        else:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-                server.starttls()
-                server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                server.send_message(message)
-        logger.info("Email notifikasi perubahan akun dikirim ke %s", recipient_email)
-    except Exception:
-        logger.exception("Gagal mengirim email notifikasi perubahan akun ke %s", recipient_email)
+    return message
+
 
-def send_email_change_old_notification(
+def build_email_change_old_notification(
     *,
     old_email: str,
     new_email: str,
     full_name: str
-) -> None:
-    """Mengirim notifikasi ke email LAMA bahwa alamat email telah diubah."""
-    if not SMTP_PASSWORD:
-        return
-
+) -> EmailMessage:
+    """Menyusun notifikasi ke email LAMA bahwa alamat email telah diubah."""
     subject = "Pemberitahuan Perubahan Alamat Email - Sistem Pembinaan Siswa"
     
     import datetime
@@ -330,37 +408,16 @@ def send_email_change_old_notification(
     message["From"] = EMAIL_SENDER
     message["To"] = old_email
 
-    try:
-        print(f"DEBUG: Connecting to SMTP {SMTP_HOST}:{SMTP_PORT} for OLD email notification...")
-        if SMTP_PORT == 465:
-            with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as server:
-                server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                server.send_message(message)
-        else:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-                server.starttls()
-                server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                server.send_message(message)
-        logger.info("Email notifikasi perubahan email (ke lama) dikirim ke %s", old_email)
-        print(f"DEBUG: Email SENT successfully to OLD email {old_email}")
-    except smtplib.SMTPException as e:
-        logger.error(f"SMTP Error sending old email notification: {e}")
-        print(f"DEBUG: SMTP Error (Old Email): {e}")
-    except Exception as e:
-        logger.exception("Gagal mengirim email notifikasi ke email lama %s", old_email)
-        print(f"DEBUG: General Error (Old Email): {e}")
+    return message
 
 
-def send_email_change_new_notification(
+def build_email_change_new_notification(
     *,
     recipient_email: str,
     nip: str,
     full_name: str
-) -> None:
-    """Mengirim notifikasi ke email BARU dengan detail kredensial lengkap."""
-    if not SMTP_PASSWORD:
-        return
-
+) -> EmailMessage:
+    """Menyusun notifikasi ke email BARU dengan detail kredensial lengkap."""
     subject = "Konfirmasi Perubahan Email - Sistem Pembinaan Siswa"
     APP_BASE_URL = os.getenv("APP_LOGIN_URL", "https://dispo.sman1ketapang.sch.id")
 
@@ -412,22 +469,109 @@ def send_email_change_new_notification(
     message["From"] = EMAIL_SENDER
     message["To"] = recipient_email
 
-    try:
-        print(f"DEBUG: Connecting to SMTP {SMTP_HOST}:{SMTP_PORT} for NEW email notification...")
-        if SMTP_PORT == 465:
-            with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as server:
-                server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                server.send_message(message)
-        else:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-                server.starttls()
-                server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                server.send_message(message)
-        logger.info("Email notifikasi perubahan email (ke baru) dikirim ke %s", recipient_email)
-        print(f"DEBUG: Email SENT successfully to {recipient_email}")
-    except smtplib.SMTPException as e:
-        logger.error(f"SMTP Error sending new email notification: {e}")
-        print(f"DEBUG: SMTP Error: {e}")
-    except Exception as e:
-        logger.exception("Gagal mengirim email notifikasi ke email baru %s", recipient_email)
-        print(f"DEBUG: General Error: {e}")
+    return message
+
+
+def build_violation_digest(*, recipient_email: str, entries: list[dict]) -> EmailMessage:
+    """Menyusun satu email ringkasan berisi beberapa laporan pelanggaran untuk wali kelas yang sama.
+
+    Setiap item ``entries`` berisi parameter yang sama dengan ``build_violation_notification``.
+    """
+    subject = f"Ringkasan {len(entries)} Laporan Pelanggaran Siswa"
+
+    text_rows = "\n".join(
+        f"    {index}. {entry['student_name']} ({entry['student_class']}) - {entry['violation_name']}, "
+        f"{entry['incident_date']}, pelapor: {entry['reporter_name']}\n       {entry['detail']}"
+        for index, entry in enumerate(entries, start=1)
+    )
+    text_body = f"""
+    Halo Bapak/Ibu Guru,
+
+    Berikut ringkasan {len(entries)} laporan pelanggaran kedisiplinan untuk siswa di bawah perwalian Anda:
+
+{text_rows}
+
+    Silakan login ke aplikasi Sistem Pembinaan Siswa untuk menindaklanjuti laporan ini.
+
+    Terima kasih,
+    Admin Sistem Pembinaan Siswa
+    """
+
+    cell = "padding: 8px; border-bottom: 1px solid #eee; vertical-align: top;"
+    html_rows = "".join(
+        f"""
+            <tr>
+              <td style="{cell}">{html.escape(str(entry['student_name']))}</td>
+              <td style="{cell}">{html.escape(str(entry['student_class']))}</td>
+              <td style="{cell} color: #d32f2f; font-weight: bold;">{html.escape(str(entry['violation_name']))}</td>
+              <td style="{cell}">{html.escape(str(entry['incident_date']))}</td>
+              <td style="{cell}">{html.escape(str(entry['reporter_name']))}</td>
+              <td style="{cell}">{html.escape(str(entry['detail']))}</td>
+            </tr>"""
+        for entry in entries
+    )
+    html_body = f"""
+    <html>
+      <body style="font-family: Arial, sans-serif; color: #333;">
+        <div style="max-width: 800px; margin: 0 auto; padding: 20px; border: 1px solid #eee; border-radius: 10px;">
+          <h2 style="color: #d32f2f;">Ringkasan Laporan Pelanggaran Siswa</h2>
+          <p>Halo Bapak/Ibu Wali Kelas,</p>
+          <p>Berikut {len(entries)} laporan pelanggaran kedisiplinan untuk siswa di bawah perwalian Anda:</p>
+
+          <table style="width: 100%; border-collapse: collapse; margin-bottom: 20px; font-size: 14px;">
+            <tr style="background-color: #f9f9f9; text-align: left;">
+              <th style="padding: 8px;">Nama Siswa</th>
+              <th style="padding: 8px;">Kelas</th>
+              <th style="padding: 8px;">Jenis Pelanggaran</th>
+              <th style="padding: 8px;">Waktu Kejadian</th>
+              <th style="padding: 8px;">Pelapor</th>
+              <th style="padding: 8px;">Detail</th>
+            </tr>{html_rows}
+          </table>
+
+          <p>Silakan <a href="{APP_LOGIN_URL}" style="color: #1976d2; text-decoration: none; font-weight: bold;">Login ke Aplikasi</a> untuk melihat bukti foto dan melakukan proses pembinaan atau tindak lanjut.</p>
+
+          <hr style="border: none; border-top: 1px solid #eee; margin: 20px 0;" />
+          <p style="font-size: 12px; color: #888;">Email ini dikirim otomatis oleh Sistem Pembinaan Siswa.</p>
+        </div>
+      </body>
+    </html>
+    """
+
+    message = EmailMessage()
+    message.set_content(text_body)
+    message.add_alternative(html_body, subtype="html")
+    message["Subject"] = subject
+    message["From"] = EMAIL_SENDER
+    message["To"] = recipient_email
+
+    return message
+
+
+# Jenis email yang bisa diantrikan di outbox beserta fungsi penyusunnya
+MESSAGE_BUILDERS = {
+    "account": build_account_email,
+    "violation": build_violation_notification,
+    "violation_digest": build_violation_digest,
+    "account_update": build_account_update_notification,
+    "email_change_old": build_email_change_old_notification,
+    "email_change_new": build_email_change_new_notification,
+}
+
+
+def is_configured() -> bool:
+    """SMTP dianggap aktif bila kredensial terisi (sama seperti pengecekan sebelumnya)."""
+    return bool(SMTP_PASSWORD)
+
+
+def build_message(kind: str, payload: dict) -> EmailMessage:
+    """Menyusun pesan email dari jenis dan parameter yang tersimpan di outbox."""
+    builder = MESSAGE_BUILDERS.get(kind)
+    if builder is None:
+        raise ValueError(f"Jenis email tidak dikenal: {kind}")
+    return builder(**payload)
+
+
+def deliver(message: EmailMessage) -> None:
+    """Mengirim pesan lewat pool SMTP; kegagalan diteruskan ke pemanggil."""
+    smtp_pool.send(message)
@@ -0,0 +1,113 @@
+"""Normalisasi foto bukti pelanggaran/prestasi di latar belakang.
+
+Router menyimpan file asli apa adanya dan menandai barisnya ``pending``. Job
+terjadwal ``normalize_evidence_images`` lalu memperbaiki orientasi, mengompres
+ke WebP, dan membuat thumbnail lewat process pool gambar. Setelah selesai,
+kolom bukti yang ditampilkan menunjuk ke versi teroptimasi; file asli tetap
+disimpan dan dicatat di kolom ``*_original``.
+"""
+
+import os
+from typing import Callable, Optional
+
+from PIL import Image, UnidentifiedImageError
+from sqlalchemy.orm import Session
+
+from . import image_processing, models, schemas, storage
+
+EVIDENCE_MAX_DIMENSION = int(os.getenv("EVIDENCE_MAX_DIMENSION", "1600"))
+EVIDENCE_QUALITY = int(os.getenv("EVIDENCE_QUALITY", "80"))
+EVIDENCE_THUMBNAIL_SIZE = int(os.getenv("EVIDENCE_THUMBNAIL_SIZE", "320"))
+BATCH_SIZE = int(os.getenv("EVIDENCE_BATCH_SIZE", "50"))
+
+# Model beserta nama kolom bukti yang ditampilkan; kolom lain memakai akhiran
+# _original / _thumbnail / _status
+TARGETS = [
+    (models.Pelanggaran, "bukti_foto"),
+    (models.Prestasi, "bukti"),
+]
+
+
+def _normalize(original: str) -> tuple[str, Optional[str], Optional[str]]:
+    """Memproses satu file asli; mengembalikan (status, file_teroptimasi, file_thumbnail)."""
+    source = storage.path_for(original)
+    if not source.exists():
+        print(f"Evidence: file bukti {original} tidak ditemukan")
+        return schemas.EvidenceImageStatus.FAILED.value, None, None
+    try:
+        optimized, thumbnail = image_processing.run(
+            image_processing.normalize_evidence,
+            str(source),
+            (EVIDENCE_MAX_DIMENSION, EVIDENCE_MAX_DIMENSION),
+            EVIDENCE_QUALITY,
+            (EVIDENCE_THUMBNAIL_SIZE, EVIDENCE_THUMBNAIL_SIZE),
+        )
+    except UnidentifiedImageError:
+        # Bukti prestasi boleh berupa dokumen (PDF dsb.), disajikan apa adanya
+        return schemas.EvidenceImageStatus.SKIPPED.value, None, None
+    except image_processing.ImageQueueFull:
+        raise
+    except (
+        OSError,
+        ValueError,
+        Image.DecompressionBombError,
+        image_processing.ImageProcessingTimeout,
+    ) as exc:
+        print(f"Evidence: gagal menormalisasi {original}: {exc}")
+        return schemas.EvidenceImageStatus.FAILED.value, None, None
+
+    optimized_key = storage.save_bytes(optimized, ".webp")
+    thumbnail_key = storage.save_bytes(thumbnail, ".webp")
+    return schemas.EvidenceImageStatus.DONE.value, optimized_key, thumbnail_key
+
+
+def process_pending(db: Session, should_stop: Optional[Callable[[], bool]] = None) -> int:
+    """Menormalisasi bukti berstatus pending per batch; setiap baris di-commit sendiri.
+
+    Berhenti lebih awal bila ``should_stop`` bernilai True atau antrean process
+    pool sedang penuh (sisa baris tetap pending untuk putaran berikutnya).
+    """
+    processed = 0
+    for model, field in TARGETS:
+        served = getattr(model, field)
+        original_column = getattr(model, f"{field}_original")
+        thumbnail_column = getattr(model, f"{field}_thumbnail")
+        status_column = getattr(model, f"{field}_status")
+        pending = schemas.EvidenceImageStatus.PENDING.value
+
+        rows = (
+            db.query(model.id, original_column)
+            .filter(status_column == pending)
+            .order_by(model.created_at.asc())
+            .limit(BATCH_SIZE)
+            .all()
+        )
+        for row_id, original in rows:
+            if should_stop and should_stop():
+                return processed
+            try:
+                status, optimized_name, thumbnail_name = _normalize(original)
+            except image_processing.ImageQueueFull as exc:
+                print(f"Evidence: normalisasi ditunda ({exc})")
+                return processed
+
+            values = {status_column: status}
+            if optimized_name:
+                values[served] = optimized_name
+                values[thumbnail_column] = thumbnail_name
+            # Baris bisa saja dihapus/diganti selama file diproses
+            updated = (
+                db.query(model)
+                .filter(model.id == row_id, status_column == pending, original_column == original)
+                .update(values, synchronize_session=False)
+            )
+            if updated and optimized_name:
+                # Kolom tampilan pindah dari file asli ke versi teroptimasi
+                storage.add_refs(db, [optimized_name, thumbnail_name])
+                if storage.is_content_key(original):
+                    storage.release_refs(db, [original])
+            db.commit()
+            if not updated and optimized_name:
+                storage.delete_files(db, [optimized_name, thumbnail_name])
+            processed += 1
+    return processed
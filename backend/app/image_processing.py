@@ -0,0 +1,179 @@
+"""Pemrosesan gambar unggahan CMS di process pool terpisah.
+
+Resize dan encode WebP memakan CPU dan menahan GIL, sehingga dijalankan di
+proses lain agar thread request lainnya tetap responsif. Jumlah pekerjaan yang
+berjalan + mengantre dibatasi: saat penuh, request menunggu sebentar lalu
+ditolak (``ImageQueueFull``) alih-alih menumpuk gambar mentah di memori.
+"""
+
+import base64
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+# Maksimum gambar yang sedang diproses + mengantre di seluruh request satu proses aplikasi
+IMAGE_MAX_PENDING = int(os.getenv("IMAGE_MAX_PENDING", "8"))
+IMAGE_QUEUE_WAIT_SECONDS = int(os.getenv("IMAGE_QUEUE_WAIT_SECONDS", "5"))
+IMAGE_PROCESS_TIMEOUT_SECONDS = int(os.getenv("IMAGE_PROCESS_TIMEOUT_SECONDS", "30"))
+# Lebar varian responsif (srcset); varian yang lebih lebar dari gambar sumber dilewati
+IMAGE_VARIANT_WIDTHS = [
+    int(width)
+    for width in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,1280,1920").split(",")
+    if width.strip()
+]
+# Placeholder buram berukuran sangat kecil yang disisipkan langsung sebagai data URI
+PLACEHOLDER_SIZE = 24
+
+
+class ImageQueueFull(Exception):
+    """Antrean pemrosesan gambar penuh; klien sebaiknya mencoba lagi nanti."""
+
+
+class ImageProcessingTimeout(Exception):
+    """Pemrosesan gambar melebihi batas waktu."""
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(IMAGE_MAX_PENDING)
+
+
+def _encode(image: Image.Image, quality: int) -> bytes:
+    """Encode gambar ke WebP di memori."""
+    output_buffer = io.BytesIO()
+    image.save(output_buffer, format="WEBP", quality=quality, optimize=True)
+    return output_buffer.getvalue()
+
+
+def encode_responsive(
+    contents: bytes,
+    max_size: tuple[int, int],
+    quality: int,
+    widths: list[int],
+) -> dict:
+    """Membuat varian WebP per lebar ``widths`` plus placeholder kecil dari satu gambar.
+
+    Gambar dibatasi ``max_size`` lebih dulu dan tidak pernah diperbesar; varian
+    terbesar selalu berukuran gambar yang sudah dibatasi tersebut. Dijalankan di
+    proses pool, jadi hanya menerima dan mengembalikan data sederhana:
+    ``{"variants": [(lebar, tinggi, bytes), ...], "placeholder": data_uri}``.
+    """
+    image = Image.open(io.BytesIO(contents))
+    # Foto kamera HP sering disimpan miring dengan tag EXIF orientasi
+    image = ImageOps.exif_transpose(image)
+
+    # Palette (P) / CMYK tidak didukung langsung oleh encoder WebP
+    if image.mode in ("P", "CMYK"):
+        image = image.convert("RGB")
+
+    # Resize if too large (thumbnail preserves aspect ratio)
+    if image.width > max_size[0] or image.height > max_size[1]:
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+    targets = sorted({width for width in widths if width < image.width} | {image.width})
+    variants = []
+    for width in targets:
+        if width == image.width:
+            resized = image
+        else:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        variants.append((resized.width, resized.height, _encode(resized, quality)))
+
+    tiny = image.copy()
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.LANCZOS)
+    placeholder = "data:image/webp;base64," + base64.b64encode(_encode(tiny, 30)).decode("ascii")
+
+    return {"variants": variants, "placeholder": placeholder}
+
+
+def normalize_evidence(
+    path: str,
+    max_size: tuple[int, int],
+    quality: int,
+    thumbnail_size: tuple[int, int],
+) -> tuple[bytes, bytes]:
+    """Membaca foto bukti dari disk, memperbaiki orientasi, dan membuat WebP + thumbnail.
+
+    File dibaca di proses pool agar foto berukuran beberapa MB tidak perlu
+    dikirim antar proses. Metadata EXIF (termasuk lokasi GPS) tidak ikut disimpan.
+    Mengembalikan ``(bytes_teroptimasi, bytes_thumbnail)``.
+    """
+    with Image.open(path) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+        if image.width > max_size[0] or image.height > max_size[1]:
+            image.thumbnail(max_size, Image.Resampling.LANCZOS)
+        optimized = _encode(image, quality)
+
+        thumbnail = image.copy()
+        thumbnail.thumbnail(thumbnail_size, Image.Resampling.LANCZOS)
+        return optimized, _encode(thumbnail, 70)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Membuat pool saat pertama dipakai; memakai spawn karena proses induk punya banyak thread."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_executor(broken: ProcessPoolExecutor):
+    """Membuang pool yang rusak (misal proses anak mati kehabisan memori)."""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def run(func, *args):
+    """Menjalankan ``func`` di process pool dengan batas antrean dan batas waktu."""
+    if not _slots.acquire(timeout=IMAGE_QUEUE_WAIT_SECONDS):
+        raise ImageQueueFull("Antrean pemrosesan gambar sedang penuh")
+    executor = _get_executor()
+    try:
+        future = executor.submit(func, *args)
+    except BrokenProcessPool:
+        _slots.release()
+        _reset_executor(executor)
+        raise
+    except Exception:
+        _slots.release()
+        raise
+    # Slot baru dilepas saat proses anak benar-benar selesai, termasuk setelah timeout,
+    # agar batas antrean mencerminkan beban CPU yang sebenarnya
+    future.add_done_callback(lambda _future: _slots.release())
+    try:
+        return future.result(timeout=IMAGE_PROCESS_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        future.cancel()
+        raise ImageProcessingTimeout(
+            f"Pemrosesan gambar melebihi {IMAGE_PROCESS_TIMEOUT_SECONDS} detik"
+        )
+    except BrokenProcessPool:
+        _reset_executor(executor)
+        raise
+
+
+def shutdown():
+    """Menghentikan pool saat aplikasi berhenti."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
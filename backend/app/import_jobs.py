@@ -0,0 +1,364 @@
+"""Antrian job impor siswa berbasis tabel beserta worker latar belakangnya.
+
+Upload hanya menyimpan file dan membuat baris ``import_jobs``; dispatcher
+mengklaim job, memproses roster per batch, dan menyimpan progres di transaksi
+yang sama dengan data siswa sehingga job aman dilanjutkan setelah restart.
+
+Tahap parsing dan penulisan berjalan di executor khusus (bukan di event loop
+maupun threadpool request). Keduanya terhubung lewat antrian berbatas sehingga
+parser menunggu bila penulisan ke database tertinggal, dan dispatcher hanya
+mengklaim job baru ketika ada slot executor yang kosong.
+"""
+
+import os
+import queue
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from . import models, schemas, siswa_import
+from .database import SessionLocal
+
+# Roster impor berisi data pribadi siswa, jadi disimpan di luar folder storage
+# yang disajikan publik lewat /storage
+IMPORT_DIR = Path(os.getenv("IMPORT_DIR", "imports"))
+# Lokasi lama; file sisa di sana ikut dibersihkan sweep_orphan_files
+LEGACY_IMPORT_DIR = Path("storage/imports")
+BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "200"))
+POLL_INTERVAL_SECONDS = int(os.getenv("IMPORT_POLL_INTERVAL", "5"))
+# Job "running" tanpa heartbeat selama ini dianggap ditinggal worker yang mati
+STALE_AFTER = timedelta(minutes=5)
+MAX_ATTEMPTS = 3
+MAX_STORED_ERRORS = 1000
+MAX_CONCURRENT_JOBS = int(os.getenv("IMPORT_MAX_CONCURRENT_JOBS", "1"))
+MAX_QUEUED_JOBS = int(os.getenv("IMPORT_MAX_QUEUED_JOBS", "10"))
+# Jumlah batch hasil parsing yang boleh menunggu tahap penulisan
+MAX_PENDING_BATCHES = int(os.getenv("IMPORT_MAX_PENDING_BATCHES", "4"))
+
+_parse_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="import-parse")
+_write_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="import-write")
+_job_slots = threading.BoundedSemaphore(MAX_CONCURRENT_JOBS)
+_wake_event = threading.Event()
+_worker_lock = threading.Lock()
+_worker_thread: Optional[threading.Thread] = None
+
+
+def create_job(
+    db: Session,
+    *,
+    filename: str,
+    file_path: Path,
+    created_by: Optional[str],
+    mark_missing_inactive: bool,
+    tahun_ajaran: Optional[str],
+) -> models.ImportJob:
+    """Mendaftarkan job impor baru berstatus queued."""
+    job = models.ImportJob(
+        filename=filename,
+        file_path=str(file_path),
+        status=schemas.ImportJobStatus.QUEUED.value,
+        created_by=created_by,
+        mark_missing_inactive=mark_missing_inactive,
+        tahun_ajaran=(tahun_ajaran or "").strip() or None,
+        errors=[],
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: str) -> Optional[models.ImportJob]:
+    """Mengambil job impor berdasarkan ID."""
+    return db.query(models.ImportJob).filter(models.ImportJob.id == job_id).first()
+
+
+def queue_is_full(db: Session) -> bool:
+    """Memeriksa apakah antrian job impor sudah mencapai batas penerimaan."""
+    queued = (
+        db.query(func.count(models.ImportJob.id))
+        .filter(models.ImportJob.status == schemas.ImportJobStatus.QUEUED.value)
+        .scalar()
+    )
+    return (queued or 0) >= MAX_QUEUED_JOBS
+
+
+def _claimable_filter(now: datetime):
+    """Kondisi job yang boleh diklaim: masih antre atau heartbeat-nya basi."""
+    return or_(
+        models.ImportJob.status == schemas.ImportJobStatus.QUEUED.value,
+        and_(
+            models.ImportJob.status == schemas.ImportJobStatus.RUNNING.value,
+            or_(
+                models.ImportJob.heartbeat_at.is_(None),
+                models.ImportJob.heartbeat_at < now - STALE_AFTER,
+            ),
+        ),
+    )
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[str]:
+    """Mengklaim satu job secara atomik agar tidak diproses dua worker sekaligus."""
+    now = datetime.now(timezone.utc)
+    candidates = (
+        db.query(models.ImportJob.id)
+        .filter(_claimable_filter(now))
+        .order_by(models.ImportJob.created_at.asc())
+        .limit(5)
+        .all()
+    )
+    for (job_id,) in candidates:
+        claimed = (
+            db.query(models.ImportJob)
+            .filter(models.ImportJob.id == job_id, _claimable_filter(now))
+            .update(
+                {
+                    models.ImportJob.status: schemas.ImportJobStatus.RUNNING.value,
+                    models.ImportJob.worker_id: worker_id,
+                    models.ImportJob.heartbeat_at: now,
+                    models.ImportJob.attempts: func.coalesce(models.ImportJob.attempts, 0) + 1,
+                    models.ImportJob.started_at: func.coalesce(models.ImportJob.started_at, now),
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if claimed:
+            return job_id
+    return None
+
+
+def _finish(db: Session, job: models.ImportJob, status: schemas.ImportJobStatus, message: str):
+    """Menutup job dengan status akhir lalu membersihkan file unggahan."""
+    now = datetime.now(timezone.utc)
+    job.status = status.value
+    job.message = message
+    job.finished_at = now
+    job.heartbeat_at = now
+    siswa_import.clear_staged_nis(db, job.id)
+    db.commit()
+    Path(job.file_path).unlink(missing_ok=True)
+
+
+def sweep_orphan_files(db: Session) -> int:
+    """Menghapus file di IMPORT_DIR (dan lokasi lamanya) yang tidak dirujuk job aktif dan sudah basi."""
+    active_paths = {
+        Path(file_path).name
+        for (file_path,) in db.query(models.ImportJob.file_path).filter(
+            models.ImportJob.status.in_([
+                schemas.ImportJobStatus.QUEUED.value,
+                schemas.ImportJobStatus.RUNNING.value,
+            ])
+        )
+    }
+    cutoff = (datetime.now(timezone.utc) - STALE_AFTER).timestamp()
+    removed = 0
+    for directory in (IMPORT_DIR, LEGACY_IMPORT_DIR):
+        if not directory.exists():
+            continue
+        for entry in os.scandir(directory):
+            if not entry.is_file() or entry.name in active_paths:
+                continue
+            # File yang baru ditulis mungkin belum sempat didaftarkan sebagai job
+            if entry.stat().st_mtime > cutoff:
+                continue
+            Path(entry.path).unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def _parse_stage(path: Path, batches: queue.Queue, cancelled: threading.Event):
+    """Tahap parsing: membaca roster dan mengirim batch baris ke antrian berbatas."""
+    def put(item) -> bool:
+        while not cancelled.is_set():
+            try:
+                batches.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        if not put(("total", siswa_import.estimate_row_count(path))):
+            return
+        batch = []
+        for item in siswa_import.iter_roster(path):
+            batch.append(item)
+            if len(batch) >= BATCH_SIZE:
+                if not put(("rows", batch)):
+                    return
+                batch = []
+        if batch and not put(("rows", batch)):
+            return
+        put(("end", None))
+    except Exception as exc:
+        put(("error", exc))
+
+
+def _iter_parsed(path: Path):
+    """Menjalankan tahap parsing di executor dan menghasilkan pesannya berurutan."""
+    batches: queue.Queue = queue.Queue(maxsize=MAX_PENDING_BATCHES)
+    cancelled = threading.Event()
+    future = _parse_executor.submit(_parse_stage, path, batches, cancelled)
+    try:
+        while True:
+            try:
+                kind, payload = batches.get(timeout=1)
+            except queue.Empty:
+                if future.done() and batches.empty():
+                    raise RuntimeError("Tahap parsing berhenti tanpa hasil")
+                continue
+            if kind == "end":
+                return
+            if kind == "error":
+                raise payload
+            yield kind, payload
+    finally:
+        cancelled.set()
+
+
+def process_job(db: Session, job: models.ImportJob):
+    """Memproses roster per batch, melewati baris yang sudah di-commit sebelumnya."""
+    if (job.attempts or 0) > MAX_ATTEMPTS:
+        _finish(db, job, schemas.ImportJobStatus.FAILED, "Job gagal berulang kali dan dihentikan")
+        return
+
+    path = Path(job.file_path)
+    if not path.exists():
+        _finish(db, job, schemas.ImportJobStatus.FAILED, "File impor tidak ditemukan")
+        return
+
+    default_tahun_label = siswa_import.resolve_default_tahun_label(db, job.tahun_ajaran)
+    already_done = job.processed_rows or 0
+    errors = list(job.errors or [])
+    position = 0
+
+    try:
+        for kind, payload in _iter_parsed(path):
+            if kind == "total":
+                if payload is not None:
+                    job.total_rows = payload
+                    db.commit()
+                continue
+
+            batch_nis: set[str] = set()
+            for row_number, row in payload:
+                position += 1
+                if position <= already_done:
+                    # Baris ini (beserta staging NIS-nya) sudah tersimpan pada percobaan sebelumnya
+                    continue
+                if siswa_import.is_blank_row(row):
+                    continue
+                nis_value = siswa_import.safe_str(row.get('nis'))
+                if nis_value:
+                    batch_nis.add(nis_value)
+
+                try:
+                    with db.begin_nested():
+                        outcome = siswa_import.import_row(db, row, default_tahun_label)
+                    if outcome == "created":
+                        job.created_count = (job.created_count or 0) + 1
+                    else:
+                        job.updated_count = (job.updated_count or 0) + 1
+                except Exception as exc:
+                    job.error_count = (job.error_count or 0) + 1
+                    if len(errors) < MAX_STORED_ERRORS:
+                        errors.append(f"Row {row_number}: {str(exc)}")
+
+            if position > already_done:
+                siswa_import.stage_imported_nis(db, job.id, batch_nis)
+                job.processed_rows = position
+                job.errors = list(errors)
+                job.heartbeat_at = datetime.now(timezone.utc)
+                db.commit()
+    except Exception as exc:
+        db.rollback()
+        _finish(db, job, schemas.ImportJobStatus.FAILED, f"Error processing file: {exc}")
+        return
+
+    job.processed_rows = max(position, already_done)
+    job.total_rows = job.processed_rows
+    job.errors = list(errors)
+    if job.mark_missing_inactive:
+        result = siswa_import.mark_missing_inactive(db, job.id)
+        job.deactivated_count = result["deactivated_count"]
+        job.deactivated_by_kelas = result["by_kelas"]
+        job.deactivation_skipped_count = result["skipped_count"]
+    _finish(db, job, schemas.ImportJobStatus.COMPLETED, "CSV upload completed")
+
+
+def run_job(job_id: str):
+    """Menjalankan satu job yang sudah diklaim dengan sesi database sendiri."""
+    db = SessionLocal()
+    try:
+        job = get_job(db, job_id)
+        if job is None:
+            return
+        try:
+            process_job(db, job)
+        except Exception as exc:
+            db.rollback()
+            print(f"Import job {job_id} error: {exc}")
+            job = get_job(db, job_id)
+            if job is not None:
+                _finish(db, job, schemas.ImportJobStatus.FAILED, f"Error processing file: {exc}")
+    finally:
+        db.close()
+
+
+def notify_worker():
+    """Membangunkan worker lokal agar segera mengecek antrian."""
+    _wake_event.set()
+
+
+def _release_slot(_future):
+    """Mengembalikan slot executor setelah satu job selesai diproses."""
+    _job_slots.release()
+    _wake_event.set()
+
+
+def _worker_loop(worker_id: str):
+    """Loop dispatcher: tunggu slot kosong, klaim job, lalu serahkan ke executor."""
+    while True:
+        _job_slots.acquire()
+        job_id = None
+        db = SessionLocal()
+        try:
+            job_id = claim_next_job(db, worker_id)
+        except Exception as exc:
+            db.rollback()
+            print(f"Import worker error: {exc}")
+        finally:
+            db.close()
+
+        if job_id:
+            future = _write_executor.submit(run_job, job_id)
+            future.add_done_callback(_release_slot)
+            continue
+
+        _job_slots.release()
+        _wake_event.wait(POLL_INTERVAL_SECONDS)
+        _wake_event.clear()
+
+
+def start_worker():
+    """Menyalakan dispatcher impor satu kali per proses."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return
+        IMPORT_DIR.mkdir(parents=True, exist_ok=True)
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        _worker_thread = threading.Thread(
+            target=_worker_loop,
+            args=(worker_id,),
+            name="import-dispatcher",
+            daemon=True,
+        )
+        _worker_thread.start()
@@ -1,15 +1,22 @@
 """Entry point FastAPI yang menggabungkan seluruh router aplikasi."""
 
-from fastapi import FastAPI
+import anyio
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import os
-import asyncio
-from . import crud
-from .database import Base, engine, SessionLocal
+from . import cache_bus, config_store, db_metrics, email_outbox, image_processing, import_jobs, maintenance, maintenance_jobs, migrations, storage
+from .database import THREADPOOL_SIZE, SessionLocal, engine
+from .database_async import async_engine
+from .static_storage import StorageStaticFiles
 from .routers import auth, users, siswa, master_data, pelanggaran, dashboard, prestasi, perwalian, cms
+from .routers import email_outbox as email_outbox_router
+from .routers import maintenance as maintenance_router
 
-# Membuat semua tabel di database
-Base.metadata.create_all(bind=engine)
+# Membuat tabel dan menjalankan migrasi yang belum diterapkan; di produksi
+# dijalankan sekali saat deploy (python -m app.migrations)
+if migrations.RUN_MIGRATIONS_ON_STARTUP:
+    migrations.run_migrations(engine)
 
 app = FastAPI(
     title="Sistem Pembinaan Siswa",
@@ -35,25 +42,78 @@ class NgawurNginxFixerMiddleware:
                 scope["raw_path"] = new_path.encode()
         await self.app(scope, receive, send)
 
+
+class UploadSizeLimitMiddleware:
+    """Menolak body unggahan bukti yang melebihi batas sebelum di-spool ke disk oleh parser form."""
+    # Ruang tambahan untuk field formulir lain dan boundary multipart
+    FORM_OVERHEAD_BYTES = 64 * 1024
+    PATH_PREFIXES = ("/api/pelanggaran", "/api/prestasi")
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes + self.FORM_OVERHEAD_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH") \
+                or not scope.get("path", "").startswith(self.PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": "Ukuran file melebihi batas yang diizinkan"}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        # Body chunked tanpa Content-Length dihitung selama dibaca
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Ukuran file melebihi batas yang diizinkan")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+# Dipasang sebelum NgawurNginxFixerMiddleware agar melihat path yang sudah diperbaiki
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=storage.MAX_UPLOAD_BYTES)
+app.add_middleware(db_metrics.RouteContextMiddleware)
 app.add_middleware(NgawurNginxFixerMiddleware)
 
 
 @app.on_event("startup")
 async def startup_event():
-    async def run_cleanup_task():
-        while True:
-            try:
-                db = SessionLocal()
-                count = crud.delete_expired_students(db)
-                if count > 0:
-                    print(f"Cleanup: Deleted {count} expired student records.")
-                db.close()
-            except Exception as e:
-                print(f"Cleanup error: {e}")
-            # Check every hour
-            await asyncio.sleep(3600)
-
-    asyncio.create_task(run_cleanup_task())
+    # Jumlah thread endpoint sync disamakan dengan ukuran pool koneksi database
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    # Konfigurasi sistem dibaca dari memori; dimuat penuh sekali di awal
+    with SessionLocal() as db:
+        config_store.store.load(db)
+    # Listener event invalidasi cache dari worker lain (LISTEN/NOTIFY atau polling)
+    cache_bus.start_listener()
+    # Job periodik (pembersihan, snapshot statistik, dll.) berjalan di thread executor
+    maintenance_jobs.register_default_jobs()
+    maintenance.start_scheduler()
+    # Worker impor siswa berjalan di thread terpisah agar tidak memblokir event loop
+    import_jobs.start_worker()
+    # Worker outbox mengirim email yang tersimpan di tabel email_outbox
+    email_outbox.start_worker()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    cache_bus.stop_listener()
+    # Hentikan proses anak pemroses gambar CMS
+    image_processing.shutdown()
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    # Koneksi asyncpg harus ditutup dari event loop yang membukanya
+    await async_engine.dispose()
 
 # Setup CORS
 raw_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000")
@@ -78,18 +138,18 @@ app.include_router(dashboard.router, prefix=api_prefix)
 app.include_router(prestasi.router, prefix=api_prefix)
 app.include_router(cms.router, prefix=api_prefix)
 app.include_router(perwalian.router, prefix=api_prefix)
+app.include_router(maintenance_router.router, prefix=api_prefix)
+app.include_router(email_outbox_router.router, prefix=api_prefix)
 
 @app.get("/")
 def read_root():
     """Endpoint kesehatan sederhana untuk memastikan API hidup."""
     return {"message": "Selamat datang di API Sistem Pembinaan Siswa"}
 
-from fastapi.staticfiles import StaticFiles
-
 # Memastikan folder storage ada beserta subfoldernya
 for path in ["storage", "storage/uploads", "storage/templates", "storage/site_content"]:
     if not os.path.exists(path):
         os.makedirs(path)
 
-# Mount satu endpoint /storage untuk akses ke semua file statis
-app.mount("/storage", StaticFiles(directory="storage"), name="storage")
+# Mount satu endpoint /storage untuk akses ke semua file statis (ETag + Cache-Control per jenis file)
+app.mount("/storage", StorageStaticFiles(directory="storage"), name="storage")
@@ -0,0 +1,465 @@
+"""Penjadwal job periodik yang aman dijalankan di banyak worker uvicorn.
+
+Job didaftarkan dengan jadwal gaya cron lewat ``register`` (lihat
+``maintenance_jobs``). Setiap worker menyalakan satu thread penjadwal; saat
+sebuah slot jadwal jatuh tempo (ditambah jitter), eksekusinya dikirim ke
+executor khusus dan dilindungi kunci lintas proses: advisory lock Postgres,
+atau lock file untuk database lain (SQLite saat pengembangan). Pemegang kunci
+mengecek ulang ``maintenance_runs`` sehingga tiap slot hanya dijalankan oleh
+satu worker, lalu mencatat status, durasi, dan jumlah baris yang terdampak.
+"""
+
+import calendar
+import os
+import socket
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+from sqlalchemy import case, func, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from . import models
+from .crud import LOCAL_TIMEZONE
+from .database import SessionLocal, engine
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+TICK_SECONDS = int(os.getenv("MAINTENANCE_TICK_SECONDS", "30"))
+MAX_PARALLEL_JOBS = int(os.getenv("MAINTENANCE_MAX_PARALLEL_JOBS", "2"))
+LOCK_DIR = Path(os.getenv("MAINTENANCE_LOCK_DIR", "storage/locks"))
+# Slot yang terlewat (misal server mati) tidak dikejar satu per satu; hanya slot terakhir yang dijalankan
+MAX_SLOT_SKIPS = 100_000
+
+RUN_RUNNING = "running"
+RUN_COMPLETED = "completed"
+RUN_FAILED = "failed"
+RUN_TIMEOUT = "timeout"
+# SQLSTATE query_canceled: statement dibatalkan oleh statement_timeout job
+QUERY_CANCELED_SQLSTATE = "57014"
+
+_executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_JOBS, thread_name_prefix="maintenance")
+_local_locks: dict[str, threading.Lock] = {}
+_scheduler_lock = threading.Lock()
+_scheduler_thread: Optional[threading.Thread] = None
+_running: set[str] = set()
+_jobs: dict[str, "ScheduledJob"] = {}
+
+
+class CronSchedule:
+    """Jadwal gaya cron lima kolom (menit jam tanggal bulan hari, 0 = Minggu) dalam WIB."""
+
+    ALIASES = {
+        "@hourly": "0 * * * *",
+        "@daily": "0 0 * * *",
+        "@nightly": "0 2 * * *",
+        "@weekly": "0 0 * * 0",
+    }
+    FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = self.ALIASES.get(self.expression, self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Jadwal cron tidak valid: '{expression}'")
+        parsed = [self._parse_field(field, lo, hi) for field, (lo, hi) in zip(fields, self.FIELD_RANGES)]
+        self.minutes, self.hours, self.days, self.months, self.weekdays = parsed
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse_field(field: str, lo: int, hi: int) -> set[int]:
+        """Mengurai satu kolom cron: ``*``, angka, rentang ``a-b``, daftar, dan langkah ``/n``."""
+        values: set[int] = set()
+        for part in field.split(","):
+            base, _, step_text = part.partition("/")
+            step = int(step_text) if step_text else 1
+            if base == "*":
+                start, end = lo, hi
+            elif "-" in base:
+                start_text, end_text = base.split("-", 1)
+                start, end = int(start_text), int(end_text)
+            else:
+                start = int(base)
+                end = hi if step_text else start
+            if step < 1 or start < lo or end > hi or start > end:
+                raise ValueError(f"Kolom cron tidak valid: '{field}'")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        """Aturan cron: bila tanggal dan hari sama-sama dibatasi, cukup salah satu yang cocok."""
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day:
+            return weekday_ok
+        if self._any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Waktu slot berikutnya setelah ``moment`` (hasil dalam UTC)."""
+        local = moment.astimezone(LOCAL_TIMEZONE).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = local + timedelta(days=366 * 5)
+        while local <= limit:
+            if local.month not in self.months:
+                days_left = calendar.monthrange(local.year, local.month)[1] - local.day + 1
+                local = (local + timedelta(days=days_left)).replace(hour=0, minute=0)
+            elif not self._day_matches(local):
+                local = (local + timedelta(days=1)).replace(hour=0, minute=0)
+            elif local.hour not in self.hours:
+                local = (local + timedelta(hours=1)).replace(minute=0)
+            elif local.minute not in self.minutes:
+                local += timedelta(minutes=1)
+            else:
+                return local.astimezone(timezone.utc)
+        raise ValueError(f"Jadwal cron '{self.expression}' tidak pernah jatuh tempo")
+
+
+class JobTimeout(Exception):
+    """Dilempar job yang melewati batas waktu eksekusinya."""
+
+
+class JobContext:
+    """Konteks eksekusi yang diterima fungsi job: sesi database dan tenggat waktu."""
+
+    def __init__(self, db: Session, max_runtime_seconds: Optional[int]):
+        self.db = db
+        self.deadline = time.monotonic() + max_runtime_seconds if max_runtime_seconds else None
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def check(self):
+        """Dipanggil job di antara batch agar berhenti bila tenggat sudah lewat."""
+        if self.expired:
+            raise JobTimeout("Melebihi batas waktu eksekusi")
+
+
+class ScheduledJob:
+    """Job periodik terdaftar beserta jadwal, jitter, dan batas waktunya."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[JobContext], Optional[int]],
+        schedule: str,
+        *,
+        description: str = "",
+        jitter_seconds: int = 0,
+        max_runtime_seconds: Optional[int] = None,
+    ):
+        self.name = name
+        self.func = func
+        self.schedule = CronSchedule(schedule)
+        self.description = description
+        self.jitter_seconds = max(jitter_seconds, 0)
+        self.max_runtime_seconds = max_runtime_seconds
+        self.registered_at = datetime.now(timezone.utc)
+
+    def jitter_for(self, slot: datetime) -> timedelta:
+        """Jitter deterministik per slot agar semua worker sepakat kapan job jatuh tempo."""
+        if not self.jitter_seconds:
+            return timedelta(0)
+        seed = zlib.crc32(f"{self.name}:{slot.isoformat()}".encode())
+        return timedelta(seconds=seed % (self.jitter_seconds + 1))
+
+
+def register(
+    name: str,
+    func: Callable[[JobContext], Optional[int]],
+    schedule: str,
+    *,
+    description: str = "",
+    jitter_seconds: int = 0,
+    max_runtime_seconds: Optional[int] = None,
+) -> ScheduledJob:
+    """Mendaftarkan job periodik. Fungsi job menerima ``JobContext`` dan boleh mengembalikan jumlah baris."""
+    job = ScheduledJob(
+        name,
+        func,
+        schedule,
+        description=description,
+        jitter_seconds=jitter_seconds,
+        max_runtime_seconds=max_runtime_seconds,
+    )
+    _jobs[name] = job
+    return job
+
+
+def registered_jobs() -> list[ScheduledJob]:
+    """Daftar job yang terdaftar, urut nama."""
+    return [_jobs[name] for name in sorted(_jobs)]
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """SQLite mengembalikan datetime naive; nilainya selalu disimpan dalam UTC."""
+    if value is None:
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _lock_key(name: str) -> int:
+    """Kunci advisory 32-bit yang stabil untuk nama job."""
+    return zlib.crc32(f"maintenance:{name}".encode())
+
+
+@contextmanager
+def job_lock(name: str):
+    """Mencoba mengambil kunci lintas worker; menghasilkan True bila berhasil."""
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            key = _lock_key(name)
+            acquired = bool(conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar())
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+        return
+
+    if fcntl is None:
+        lock = _local_locks.setdefault(name, threading.Lock())
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+        return
+
+    LOCK_DIR.mkdir(parents=True, exist_ok=True)
+    with open(LOCK_DIR / f"{name}.lock", "w") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def last_run(db: Session, name: str) -> Optional[models.MaintenanceRun]:
+    """Eksekusi terakhir sebuah job, apa pun statusnya."""
+    return (
+        db.query(models.MaintenanceRun)
+        .filter(models.MaintenanceRun.job_name == name)
+        .order_by(models.MaintenanceRun.started_at.desc())
+        .first()
+    )
+
+
+def next_slot(db: Session, job: ScheduledJob, now: datetime) -> datetime:
+    """Slot jadwal berikutnya yang belum dijalankan; slot lama yang terlewat digabung jadi satu."""
+    previous = last_run(db, job.name)
+    anchor = job.registered_at
+    if previous is not None:
+        anchor = _as_utc(previous.scheduled_for) or _as_utc(previous.started_at)
+    slot = job.schedule.next_after(anchor)
+    for _ in range(MAX_SLOT_SKIPS):
+        following = job.schedule.next_after(slot)
+        if following > now:
+            break
+        slot = following
+    return slot
+
+
+def _due_slot(db: Session, job: ScheduledJob, now: datetime) -> Optional[datetime]:
+    """Slot yang sudah jatuh tempo (termasuk jitter), atau None."""
+    slot = next_slot(db, job, now)
+    return slot if now >= slot + job.jitter_for(slot) else None
+
+
+def _set_statement_timeout(db: Session, seconds: int):
+    """Di Postgres, batas waktu job juga dipaksakan per statement.
+
+    ``SET`` berlaku untuk koneksinya sampai di-``RESET``, sehingga sesi job
+    terikat ke satu koneksi khusus (lihat ``_release_job_connection``).
+    Perintahnya langsung di-commit agar tidak ikut batal bila batch pertama
+    job di-rollback.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    db.execute(text(f"SET statement_timeout = {int(seconds) * 1000}"))
+    db.commit()
+
+
+def _is_statement_timeout(exc: Exception) -> bool:
+    """True bila ``exc`` berasal dari query yang dibatalkan statement_timeout Postgres."""
+    orig = getattr(exc, "orig", exc)
+    return getattr(orig, "pgcode", None) == QUERY_CANCELED_SQLSTATE
+
+
+def _release_job_connection(connection: Connection):
+    """Mengembalikan koneksi job ke pool tanpa membawa statement_timeout job."""
+    try:
+        if engine.dialect.name == "postgresql":
+            connection.rollback()
+            connection.exec_driver_sql("RESET statement_timeout")
+            connection.commit()
+    except Exception as exc:
+        # RESET gagal: koneksi dibuang daripada dipakai request lain dengan timeout job
+        print(f"Maintenance: gagal mereset statement_timeout: {exc}")
+        connection.invalidate()
+    finally:
+        connection.close()
+
+
+def run_job(job: ScheduledJob, worker_id: str):
+    """Menjalankan satu job bila slotnya jatuh tempo dan kunci berhasil diambil."""
+    with job_lock(job.name) as acquired:
+        if not acquired:
+            return
+        connection = engine.connect()
+        db = SessionLocal(bind=connection)
+        try:
+            now = datetime.now(timezone.utc)
+            # Dicek ulang di dalam kunci: worker lain mungkin baru saja menjalankan slot ini
+            slot = _due_slot(db, job, now)
+            if slot is None:
+                return
+            run = models.MaintenanceRun(
+                job_name=job.name,
+                worker_id=worker_id,
+                status=RUN_RUNNING,
+                scheduled_for=slot,
+                started_at=now,
+            )
+            db.add(run)
+            db.commit()
+
+            context = JobContext(db, job.max_runtime_seconds)
+            started = time.perf_counter()
+            try:
+                if job.max_runtime_seconds:
+                    _set_statement_timeout(db, job.max_runtime_seconds)
+                run.rows_affected = job.func(context)
+                run.status = RUN_TIMEOUT if context.expired else RUN_COMPLETED
+            except JobTimeout as exc:
+                db.rollback()
+                run.status = RUN_TIMEOUT
+                run.message = str(exc)
+            except Exception as exc:
+                db.rollback()
+                if job.max_runtime_seconds and _is_statement_timeout(exc):
+                    run.status = RUN_TIMEOUT
+                    run.message = f"Query dibatalkan statement_timeout ({job.max_runtime_seconds} detik)"
+                else:
+                    run.status = RUN_FAILED
+                    run.message = str(exc)[:1000]
+                    print(f"Maintenance job {job.name} error: {exc}")
+            run.duration_ms = int((time.perf_counter() - started) * 1000)
+            run.finished_at = datetime.now(timezone.utc)
+            db.commit()
+        finally:
+            db.close()
+            _release_job_connection(connection)
+
+
+def get_job_metrics(db: Session, history_limit: int = 10) -> list[dict]:
+    """Ringkasan per job: jadwal, slot berikutnya, statistik eksekusi, dan riwayat terakhir."""
+    now = datetime.now(timezone.utc)
+    stats = {
+        row.job_name: row
+        for row in db.query(
+            models.MaintenanceRun.job_name,
+            func.count(models.MaintenanceRun.id).label("total_runs"),
+            func.sum(case((models.MaintenanceRun.status == RUN_FAILED, 1), else_=0)).label("failed_runs"),
+            func.sum(case((models.MaintenanceRun.status == RUN_TIMEOUT, 1), else_=0)).label("timeout_runs"),
+            func.avg(models.MaintenanceRun.duration_ms).label("avg_duration_ms"),
+            func.max(models.MaintenanceRun.duration_ms).label("max_duration_ms"),
+            func.sum(models.MaintenanceRun.rows_affected).label("total_rows_affected"),
+        ).group_by(models.MaintenanceRun.job_name)
+    }
+    result = []
+    for job in registered_jobs():
+        row = stats.get(job.name)
+        history = get_run_history(db, job_name=job.name, limit=history_limit)
+        result.append({
+            "name": job.name,
+            "description": job.description,
+            "schedule": job.schedule.expression,
+            "jitter_seconds": job.jitter_seconds,
+            "max_runtime_seconds": job.max_runtime_seconds,
+            "next_run_at": next_slot(db, job, now),
+            "running": job.name in _running,
+            "total_runs": row.total_runs if row else 0,
+            "failed_runs": int(row.failed_runs or 0) if row else 0,
+            "timeout_runs": int(row.timeout_runs or 0) if row else 0,
+            "avg_duration_ms": round(float(row.avg_duration_ms), 1) if row and row.avg_duration_ms is not None else None,
+            "max_duration_ms": row.max_duration_ms if row else None,
+            "total_rows_affected": int(row.total_rows_affected or 0) if row else 0,
+            "last_run": history[0] if history else None,
+            "history": history,
+        })
+    return result
+
+
+def get_run_history(db: Session, job_name: Optional[str] = None, limit: int = 50) -> list[models.MaintenanceRun]:
+    """Riwayat eksekusi terbaru, opsional untuk satu job."""
+    query = db.query(models.MaintenanceRun)
+    if job_name:
+        query = query.filter(models.MaintenanceRun.job_name == job_name)
+    return query.order_by(models.MaintenanceRun.started_at.desc()).limit(limit).all()
+
+
+def _submit(job: ScheduledJob, worker_id: str):
+    """Mengirim job ke executor kecuali eksekusi sebelumnya di proses ini belum selesai."""
+    with _scheduler_lock:
+        if job.name in _running:
+            return
+        _running.add(job.name)
+
+    def done(_future):
+        with _scheduler_lock:
+            _running.discard(job.name)
+
+    _executor.submit(run_job, job, worker_id).add_done_callback(done)
+
+
+def _scheduler_loop(worker_id: str):
+    """Loop penjadwal: tiap tick cek job yang jatuh tempo lalu jalankan di executor."""
+    while True:
+        now = datetime.now(timezone.utc)
+        for job in registered_jobs():
+            if job.name in _running:
+                continue
+            db = SessionLocal()
+            try:
+                due = _due_slot(db, job, now) is not None
+            except Exception as exc:
+                print(f"Maintenance scheduler error ({job.name}): {exc}")
+                due = False
+            finally:
+                db.close()
+            if due:
+                _submit(job, worker_id)
+        time.sleep(TICK_SECONDS)
+
+
+def start_scheduler():
+    """Menyalakan thread penjadwal satu kali per proses."""
+    global _scheduler_thread
+    with _scheduler_lock:
+        if _scheduler_thread is not None and _scheduler_thread.is_alive():
+            return
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        _scheduler_thread = threading.Thread(
+            target=_scheduler_loop,
+            args=(worker_id,),
+            name="maintenance-scheduler",
+            daemon=True,
+        )
+        _scheduler_thread.start()
@@ -0,0 +1,83 @@
+"""Pendaftaran job periodik aplikasi ke penjadwal ``maintenance``.
+
+Jadwal memakai format cron lima kolom dalam WIB dan bisa diubah lewat env.
+"""
+
+import os
+
+from . import crud, evidence_images, import_jobs, maintenance, storage_gc
+
+
+def _cleanup_expired_students(ctx: maintenance.JobContext) -> int:
+    """Menghapus permanen siswa yang jadwal penghapusannya sudah lewat."""
+    return crud.delete_expired_students(ctx.db, should_stop=lambda: ctx.expired)
+
+
+def _sweep_import_files(ctx: maintenance.JobContext) -> int:
+    """Membersihkan file roster impor yatim."""
+    return import_jobs.sweep_orphan_files(ctx.db)
+
+
+def _refresh_public_stats(ctx: maintenance.JobContext) -> int:
+    """Menghitung ulang snapshot statistik landing page di luar jalur request."""
+    crud.refresh_public_stats_snapshot(ctx.db)
+    return 1
+
+
+def _normalize_evidence_images(ctx: maintenance.JobContext) -> int:
+    """Mengompres foto bukti baru ke WebP beserta thumbnail-nya."""
+    return evidence_images.process_pending(ctx.db, should_stop=lambda: ctx.expired)
+
+
+def _collect_storage_garbage(ctx: maintenance.JobContext) -> int:
+    """Mengkarantina file unggahan yatim dan menghapus karantina yang sudah lewat masanya."""
+    report = storage_gc.collect_garbage(ctx.db, should_stop=lambda: ctx.expired)
+    print(
+        "Storage GC: {quarantined_files} file dikarantina, {deleted_files} file dihapus, "
+        "{reclaimed_bytes} byte dibebaskan".format(**report)
+    )
+    return report["quarantined_files"] + report["deleted_files"] + report["temp_files_deleted"]
+
+
+def register_default_jobs():
+    """Mendaftarkan seluruh job bawaan aplikasi."""
+    maintenance.register(
+        "cleanup_expired_students",
+        _cleanup_expired_students,
+        os.getenv("CLEANUP_SCHEDULE", "@hourly"),
+        description="Hapus permanen siswa yang scheduled_deletion_at-nya sudah lewat",
+        jitter_seconds=120,
+        max_runtime_seconds=900,
+    )
+    maintenance.register(
+        "sweep_import_files",
+        _sweep_import_files,
+        os.getenv("IMPORT_SWEEP_SCHEDULE", "30 2 * * *"),
+        description="Hapus file unggahan roster yang tidak dirujuk job impor aktif",
+        jitter_seconds=300,
+        max_runtime_seconds=300,
+    )
+    maintenance.register(
+        "public_stats_snapshot",
+        _refresh_public_stats,
+        os.getenv("PUBLIC_STATS_SCHEDULE", "*/10 * * * *"),
+        description="Snapshot statistik publik landing page",
+        jitter_seconds=30,
+        max_runtime_seconds=60,
+    )
+    maintenance.register(
+        "normalize_evidence_images",
+        _normalize_evidence_images,
+        os.getenv("EVIDENCE_NORMALIZE_SCHEDULE", "*/5 * * * *"),
+        description="Perbaiki orientasi, kompres ke WebP, dan buat thumbnail foto bukti",
+        jitter_seconds=10,
+        max_runtime_seconds=300,
+    )
+    maintenance.register(
+        "storage_gc",
+        _collect_storage_garbage,
+        os.getenv("STORAGE_GC_SCHEDULE", "45 2 * * *"),
+        description="Karantina file unggahan/CMS yang tidak dirujuk database, hapus setelah masa tunggu",
+        jitter_seconds=300,
+        max_runtime_seconds=1800,
+    )
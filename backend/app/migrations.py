@@ -0,0 +1,182 @@
+"""Migrasi skema dan data ringan setelah ``create_all``.
+
+``Base.metadata.create_all`` hanya membuat tabel baru, sehingga kolom dan indeks
+yang ditambahkan ke tabel lama dipasang di sini. Setiap langkah dijalankan
+sekali per database lalu dicatat namanya di ``schema_migrations`` (nama fungsi
+langkah karenanya tidak boleh diganti). Di Postgres seluruh proses dilindungi
+advisory lock sehingga beberapa proses yang start bersamaan tidak saling balap.
+
+Saat deploy migrasi dijalankan sekali sebelum worker dinyalakan::
+
+    python -m app.migrations
+
+lalu worker dijalankan dengan ``RUN_MIGRATIONS_ON_STARTUP=false``. Nilai
+bawaannya ``true`` agar pengembangan lokal tetap cukup menjalankan uvicorn.
+"""
+
+import json
+import os
+import zlib
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import email_outbox, models, schemas
+from .database import Base, engine
+
+RUN_MIGRATIONS_ON_STARTUP = (
+    os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").strip().lower() not in {"0", "false", "no"}
+)
+# Kunci advisory Postgres yang menyerialkan migrasi antar proses
+MIGRATION_LOCK_KEY = zlib.crc32(b"schema_migrations")
+
+
+def _add_missing_columns(conn: Connection, table, column_names):
+    """Menambahkan kolom model yang belum ada di tabel database."""
+    existing = {col["name"] for col in inspect(conn).get_columns(table.name)}
+    for name in column_names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}"))
+
+
+def _create_missing_indexes(conn: Connection, table):
+    """Membuat indeks yang dideklarasikan di model namun belum ada di database."""
+    for index in table.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+
+def _normalized_kelas_keys(conn: Connection):
+    """Kolom ``nama_kelas_norm``/``tingkat_norm`` pada kelas dan indeks ``siswa.id_kelas``."""
+    kelas = models.Kelas.__table__
+    _add_missing_columns(conn, kelas, ["nama_kelas_norm", "tingkat_norm"])
+    # Backfill baris lama; baris baru diisi oleh validator di model Kelas
+    conn.execute(
+        text(
+            "UPDATE kelas SET nama_kelas_norm = UPPER(TRIM(nama_kelas)), "
+            "tingkat_norm = LOWER(TRIM(tingkat)) "
+            "WHERE nama_kelas_norm IS NULL OR tingkat_norm IS NULL"
+        )
+    )
+    _create_missing_indexes(conn, kelas)
+    _create_missing_indexes(conn, models.Siswa.__table__)
+
+
+def _normalize_kelas_references(conn: Connection):
+    """Nama kelas yang dirujuk siswa, snapshot, riwayat, dan kelas binaan dibakukan.
+
+    Semuanya dibandingkan dengan ``Kelas.nama_kelas_norm`` atau dengan
+    ``Siswa.id_kelas``; baris baru sudah dibakukan oleh validator model.
+    """
+    for table, column in (
+        ("siswa", "id_kelas"),
+        ("pelanggaran", "kelas_snapshot"),
+        ("prestasi", "kelas_snapshot"),
+        ("riwayat_kelas", "kelas"),
+    ):
+        conn.execute(
+            text(
+                f"UPDATE {table} SET {column} = UPPER(TRIM({column})) "
+                f"WHERE {column} <> UPPER(TRIM({column}))"
+            )
+        )
+    users = conn.execute(
+        text("SELECT id, kelas_binaan FROM users WHERE kelas_binaan IS NOT NULL AND kelas_binaan <> ''")
+    ).all()
+    for user_id, raw in users:
+        try:
+            kelas_list = json.loads(raw)
+        except ValueError:
+            kelas_list = [raw]
+        normalized = json.dumps(models.normalize_kelas_list(kelas_list))
+        if normalized != raw:
+            conn.execute(
+                text("UPDATE users SET kelas_binaan = :value WHERE id = :id"),
+                {"value": normalized, "id": user_id},
+            )
+
+
+def _maintenance_run_slots(conn: Connection):
+    """Kolom ``scheduled_for`` pada riwayat job pemeliharaan."""
+    runs = models.MaintenanceRun.__table__
+    _add_missing_columns(conn, runs, ["scheduled_for"])
+    _create_missing_indexes(conn, runs)
+
+
+def _email_outbox_digest(conn: Connection):
+    """Kolom ``digest_key`` untuk mode ringkasan notifikasi pelanggaran."""
+    outbox = models.EmailOutbox.__table__
+    _add_missing_columns(conn, outbox, ["digest_key"])
+    _create_missing_indexes(conn, outbox)
+
+
+def _cms_image_variants(conn: Connection):
+    """Kolom varian responsif dan placeholder pada galeri dan carousel dashboard."""
+    _add_missing_columns(conn, models.SiteGallery.__table__, ["variants", "placeholder"])
+    _add_missing_columns(conn, models.DashboardCarousel.__table__, ["variants", "placeholder"])
+
+
+def _evidence_image_columns(conn: Connection):
+    """Kolom original/thumbnail/status bukti; bukti lama diantrekan untuk dinormalisasi."""
+    for table, field in (
+        (models.Pelanggaran.__table__, "bukti_foto"),
+        (models.Prestasi.__table__, "bukti"),
+    ):
+        _add_missing_columns(
+            conn, table, [f"{field}_original", f"{field}_thumbnail", f"{field}_status"]
+        )
+        conn.execute(
+            text(
+                f"UPDATE {table.name} SET {field}_original = {field}, {field}_status = 'pending' "
+                f"WHERE {field} IS NOT NULL AND {field}_status IS NULL"
+            )
+        )
+        _create_missing_indexes(conn, table)
+
+
+def _redact_dead_letter_credentials(conn: Connection):
+    """Menghapus kredensial dari payload dead letter yang tercatat sebelum redaksi otomatis."""
+    rows = conn.execute(
+        text("SELECT id, payload FROM email_outbox WHERE status = :status AND payload IS NOT NULL"),
+        {"status": schemas.EmailOutboxStatus.DEAD.value},
+    ).all()
+    for row_id, payload in rows:
+        redacted = email_outbox.redact_payload(payload)
+        if redacted != payload:
+            conn.execute(
+                text("UPDATE email_outbox SET payload = :payload WHERE id = :id"),
+                {"payload": redacted, "id": row_id},
+            )
+
+
+MIGRATIONS = [
+    _normalized_kelas_keys,
+    _normalize_kelas_references,
+    _maintenance_run_slots,
+    _email_outbox_digest,
+    _cms_image_variants,
+    _evidence_image_columns,
+    _redact_dead_letter_credentials,
+]
+
+
+def run_migrations(engine: Engine):
+    """Membuat tabel baru lalu menjalankan langkah yang belum tercatat, dalam satu transaksi."""
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Proses lain menunggu di sini lalu melihat langkah yang sudah dicatat
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        Base.metadata.create_all(bind=conn)
+        applied = set(conn.execute(select(models.SchemaMigration.name)).scalars())
+        for migration in MIGRATIONS:
+            if migration.__name__ in applied:
+                continue
+            migration(conn)
+            conn.execute(models.SchemaMigration.__table__.insert().values(name=migration.__name__))
+            print(f"Migrasi {migration.__name__} diterapkan")
+
+
+if __name__ == "__main__":
+    run_migrations(engine)
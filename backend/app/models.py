@@ -11,6 +11,7 @@ from sqlalchemy import (
     Date,
     UniqueConstraint,
 )
+from sqlalchemy.orm import validates
 from sqlalchemy.sql import func
 from sqlalchemy.types import TypeDecorator
 import uuid
@@ -47,6 +48,28 @@ class JSONList(TypeDecorator):
         except (TypeError, ValueError, json.JSONDecodeError):
             return [value]
 
+def normalize_nama_kelas(value) -> str:
+    """Bentuk baku nama kelas (kapital tanpa spasi tepi), sama seperti ``Siswa.id_kelas``."""
+    return (value or "").strip().upper()
+
+
+def normalize_kelas_list(values) -> list[str]:
+    """Daftar nama kelas baku tanpa entri kosong atau ganda, urutan dipertahankan."""
+    if isinstance(values, str):
+        values = [values]
+    normalized: list[str] = []
+    for value in values or []:
+        name = normalize_nama_kelas(value)
+        if name and name not in normalized:
+            normalized.append(name)
+    return normalized
+
+
+def normalize_tingkat(value) -> str:
+    """Bentuk baku tingkat kelas (huruf kecil tanpa spasi tepi)."""
+    return (value or "").strip().lower()
+
+
 class User(Base):
     """Representasi akun pengguna aplikasi beserta peran dan kelas binaan."""
     __tablename__ = "users"
@@ -61,12 +84,17 @@ class User(Base):
     angkatan_binaan = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    @validates("kelas_binaan")
+    def _normalize_kelas_binaan(self, key, value):
+        # Dibandingkan langsung dengan Siswa.id_kelas saat membatasi cakupan akses
+        return normalize_kelas_list(value)
+
 class Siswa(Base):
     """Data pokok siswa termasuk kelas dan status keaktifan."""
     __tablename__ = "siswa"
     nis = Column(String, primary_key=True, index=True)
     nama = Column(String, nullable=False)
-    id_kelas = Column(String, nullable=False)
+    id_kelas = Column(String, nullable=False, index=True)
     angkatan = Column(String, nullable=False)
     jenis_kelamin = Column(String, nullable=False)
     aktif = Column(Boolean, default=True)
@@ -74,6 +102,11 @@ class Siswa(Base):
     scheduled_deletion_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    @validates("id_kelas")
+    def _normalize_id_kelas(self, key, value):
+        # Sisi lain join ke Kelas.nama_kelas_norm
+        return normalize_nama_kelas(value)
+
 
 class RiwayatKelas(Base):
     """Riwayat perubahan kelas siswa per tahun ajaran."""
@@ -87,6 +120,10 @@ class RiwayatKelas(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    @validates("kelas")
+    def _normalize_kelas(self, key, value):
+        return normalize_nama_kelas(value)
+
 class Kelas(Base):
     """Master kelas yang menyimpan nama kelas, tingkat, dan wali."""
     __tablename__ = "kelas"
@@ -98,8 +135,21 @@ class Kelas(Base):
     guru_bk_nip = Column(String, ForeignKey("users.nip"), nullable=True) # BK Teacher assignment
     guru_bk_name = Column(String, nullable=True)
     tahun_ajaran = Column(String, nullable=False)
+    # Kunci ternormalisasi agar pencarian & join kelas bisa memakai indeks
+    nama_kelas_norm = Column(String, nullable=True, index=True)
+    tingkat_norm = Column(String, nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    @validates("nama_kelas")
+    def _sync_nama_kelas_norm(self, key, value):
+        self.nama_kelas_norm = normalize_nama_kelas(value)
+        return value
+
+    @validates("tingkat")
+    def _sync_tingkat_norm(self, key, value):
+        self.tingkat_norm = normalize_tingkat(value)
+        return value
+
 class JenisPelanggaran(Base):
     """Referensi jenis pelanggaran beserta kategori dan poin pelanggaran."""
     __tablename__ = "jenis_pelanggaran"
@@ -122,7 +172,11 @@ class Pelanggaran(Base):
     waktu_kejadian = Column(DateTime, nullable=False)
     tempat = Column(String, nullable=False)
     detail_kejadian = Column(Text, nullable=False)
+    # Versi yang ditampilkan: file asli sampai worker selesai, lalu WebP teroptimasi
     bukti_foto = Column(String, nullable=True)
+    bukti_foto_original = Column(String, nullable=True)
+    bukti_foto_thumbnail = Column(String, nullable=True)
+    bukti_foto_status = Column(String, nullable=True, index=True)
     status = Column(String, default="reported")
     # catatan_pembinaan removed
     # tindak_lanjut removed
@@ -142,7 +196,11 @@ class Prestasi(Base):
     # deskripsi has been removed
     poin = Column(Integer, default=0)
     tanggal_prestasi = Column(Date, nullable=False)
+    # Versi yang ditampilkan: file asli sampai worker selesai, lalu WebP teroptimasi
     bukti = Column(String, nullable=True)
+    bukti_original = Column(String, nullable=True)
+    bukti_thumbnail = Column(String, nullable=True)
+    bukti_status = Column(String, nullable=True, index=True)
     pemberi_penghargaan = Column(String, nullable=True)
     # status removed
     # verifikator columns removed
@@ -185,6 +243,9 @@ class SiteGallery(Base):
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     title = Column(String, nullable=True)
     image_url = Column(String, nullable=False)
+    # Varian responsif [{"url", "width", "height"}, ...] dan placeholder (data URI)
+    variants = Column(JSONList, nullable=True)
+    placeholder = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class DashboardCarousel(Base):
@@ -193,4 +254,103 @@ class DashboardCarousel(Base):
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     url = Column(String, nullable=False)
     alt_text = Column(String, nullable=True)
+    # Varian responsif [{"url", "width", "height"}, ...] dan placeholder (data URI)
+    variants = Column(JSONList, nullable=True)
+    placeholder = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class StoredFile(Base):
+    """Jumlah rujukan file unggahan berbasis konten di storage/uploads."""
+    __tablename__ = "stored_files"
+    # Path relatif: ab/cd/<sha256><ext>
+    key = Column(String, primary_key=True)
+    sha256 = Column(String(64), nullable=False, index=True)
+    size = Column(Integer, nullable=True)
+    refcount = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CacheVersion(Base):
+    """Versi data ter-cache per tabel; dipantau worker bila LISTEN/NOTIFY tidak tersedia."""
+    __tablename__ = "cache_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class ImportJob(Base):
+    """Job impor roster siswa yang diproses worker latar belakang."""
+    __tablename__ = "import_jobs"
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    filename = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued", index=True)
+    created_by = Column(String(36), ForeignKey("users.id"), nullable=True)
+    mark_missing_inactive = Column(Boolean, default=True)
+    tahun_ajaran = Column(String, nullable=True)
+    worker_id = Column(String, nullable=True)
+    attempts = Column(Integer, default=0)
+    total_rows = Column(Integer, nullable=True)
+    processed_rows = Column(Integer, default=0)
+    created_count = Column(Integer, default=0)
+    updated_count = Column(Integer, default=0)
+    deactivated_count = Column(Integer, default=0)
+    deactivated_by_kelas = Column(JSONList, nullable=True)
+    deactivation_skipped_count = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+    errors = Column(JSONList, nullable=True)
+    message = Column(Text, nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ImportJobNis(Base):
+    """Staging NIS yang muncul di roster sebuah job impor."""
+    __tablename__ = "import_job_nis"
+    job_id = Column(String(36), ForeignKey("import_jobs.id"), primary_key=True)
+    nis = Column(String, primary_key=True)
+
+
+class MaintenanceRun(Base):
+    """Riwayat eksekusi job pemeliharaan terjadwal (misal pembersihan siswa kedaluwarsa)."""
+    __tablename__ = "maintenance_runs"
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    job_name = Column(String, nullable=False, index=True)
+    worker_id = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="running")
+    rows_affected = Column(Integer, nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+    message = Column(Text, nullable=True)
+    scheduled_for = Column(DateTime(timezone=True), nullable=True, index=True)
+    started_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class EmailOutbox(Base):
+    """Antrian email yang ditulis dalam transaksi yang sama dengan perubahan datanya."""
+    __tablename__ = "email_outbox"
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String, nullable=False)
+    recipient = Column(String, nullable=False, index=True)
+    # Parameter penyusun email (JSON); dikosongkan setelah terkirim karena bisa memuat kredensial
+    payload = Column(Text, nullable=True)
+    status = Column(String, nullable=False, default="pending", index=True)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+    last_error = Column(Text, nullable=True)
+    locked_by = Column(String, nullable=True, index=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    # Baris dengan kunci digest yang sama dikirim sebagai satu email ringkasan
+    digest_key = Column(String, nullable=True, index=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class SchemaMigration(Base):
+    """Langkah ``migrations`` yang sudah diterapkan; setiap langkah hanya dijalankan sekali."""
+    __tablename__ = "schema_migrations"
+    name = Column(String, primary_key=True)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,111 @@
+"""Snapshot respons publik di memori untuk endpoint yang diakses setiap pengunjung.
+
+Setiap snapshot menyimpan body JSON yang sudah diserialisasi beserta ETag-nya,
+sehingga request berikutnya dilayani tanpa menyentuh database maupun
+serialisasi ulang. Snapshot dibangun ulang saat di-invalidasi (setelah
+penulisan CMS) atau setelah umurnya melewati TTL. Pembangunan ulang dijaga
+lock asyncio per snapshot agar lonjakan trafik hanya memicu satu query
+tanpa memblokir event loop selama menunggu. Lock asyncio terikat ke event
+loop yang pertama memakainya, sehingga disimpan per event loop (TestClient
+dan aplikasi yang di-reload menjalankan loop baru).
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
+from typing import Callable, Optional
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+# Nama snapshot endpoint publik CMS
+LANDING_PAGE = "cms:landing_page"
+PUBLIC_STATS = "cms:stats"
+
+
+class _Snapshot:
+    __slots__ = ("body", "etag", "built_at", "generation")
+
+    def __init__(self, body: bytes, etag: str, built_at: float, generation: int):
+        self.body = body
+        self.etag = etag
+        self.built_at = built_at
+        self.generation = generation
+
+
+class SnapshotCache:
+    """Kumpulan snapshot bernama dengan invalidasi eksplisit dan TTL."""
+
+    def __init__(self):
+        self._snapshots: dict[str, _Snapshot] = {}
+        self._generations: dict[str, int] = {}
+        self._locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Lock]] = (
+            weakref.WeakKeyDictionary()
+        )
+        # invalidate() juga dipanggil dari thread listener cache_bus
+        self._guard = threading.Lock()
+
+    def _lock_for(self, name: str) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        with self._guard:
+            return self._locks.setdefault(loop, {}).setdefault(name, asyncio.Lock())
+
+    def _fresh(self, name: str, ttl_seconds: Optional[int]) -> Optional[_Snapshot]:
+        snapshot = self._snapshots.get(name)
+        if snapshot is None or snapshot.generation != self._generations.get(name, 0):
+            return None
+        if ttl_seconds is not None and time.monotonic() - snapshot.built_at > ttl_seconds:
+            return None
+        return snapshot
+
+    async def get(
+        self,
+        name: str,
+        db: AsyncSession,
+        builder: Callable[[Session], BaseModel],
+        ttl_seconds: Optional[int] = None,
+    ) -> _Snapshot:
+        """Snapshot ``name`` yang masih berlaku, atau dibangun ulang lewat ``builder``.
+
+        ``builder`` menerima sesi sync dan dijalankan di koneksi ``db`` lewat ``run_sync``.
+        """
+        snapshot = self._fresh(name, ttl_seconds)
+        if snapshot is not None:
+            return snapshot
+        async with self._lock_for(name):
+            # Request lain mungkin sudah membangunnya selama menunggu lock
+            snapshot = self._fresh(name, ttl_seconds)
+            if snapshot is not None:
+                return snapshot
+            generation = self._generations.get(name, 0)
+            body = (await db.run_sync(builder)).model_dump_json().encode("utf-8")
+            snapshot = _Snapshot(
+                body=body,
+                etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+                built_at=time.monotonic(),
+                generation=generation,
+            )
+            self._snapshots[name] = snapshot
+            return snapshot
+
+    def invalidate(self, *names: str):
+        """Menandai snapshot basi; dibangun ulang pada request berikutnya."""
+        with self._guard:
+            for name in names:
+                self._generations[name] = self._generations.get(name, 0) + 1
+
+
+cache = SnapshotCache()
+
+
+def json_response(request: Request, snapshot: _Snapshot, cache_control: str) -> Response:
+    """Respons JSON dari snapshot, atau 304 bila ETag klien masih sama."""
+    headers = {"ETag": snapshot.etag, "Cache-Control": cache_control}
+    if_none_match = request.headers.get("if-none-match", "")
+    if snapshot.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
@@ -1,9 +1,9 @@
 """Endpoint autentikasi untuk login dan manajemen profil pengguna."""
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from .. import crud, schemas, auth_utils, dependencies, email_service
+from .. import crud, schemas, auth_utils, dependencies, email_outbox
 from ..database import get_db
 from ..hashing import Hasher
 
@@ -57,7 +57,6 @@ def read_users_me(
 @router.put("/me/profile", response_model=schemas.User)
 def update_profile(
     profile_update: schemas.UserProfileUpdate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user=Depends(dependencies.get_current_user)
 ):
@@ -78,8 +77,9 @@ def update_profile(
             user_nip = current_user.nip
 
             # Kirim notifikasi KE EMAIL BARU SAJA
-            background_tasks.add_task(
-                email_service.send_email_change_new_notification,
+            email_outbox.enqueue(
+                db,
+                "email_change_new",
                 recipient_email=new_email_val,
                 nip=user_nip,
                 full_name=user_full_name
@@ -93,9 +93,12 @@ def update_profile(
     if not update_data:
         return current_user
 
-    updated = crud.update_user(db, current_user.id, schemas.UserUpdate(**update_data))
+    updated = crud.update_user(db, current_user.id, schemas.UserUpdate(**update_data), commit=False)
     if not updated:
         raise HTTPException(status_code=404, detail="User not found")
+    db.commit()
+    db.refresh(updated)
+    email_outbox.notify_worker()
         
     
     # Notifikasi umum hanya jika BUKAN ganti email (karena ganti email sudah ditangani khusus di atas)
@@ -110,7 +113,6 @@ def update_profile(
 @router.put("/me/password", status_code=status.HTTP_204_NO_CONTENT)
 def update_password(
     password_update: schemas.UserPasswordUpdate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user=Depends(dependencies.get_current_user)
 ):
@@ -118,13 +120,16 @@ def update_password(
     if not Hasher.verify_password(password_update.current_password, current_user.hashed_password):
         raise HTTPException(status_code=400, detail="Password saat ini tidak sesuai")
 
-    crud.update_user(db, current_user.id, schemas.UserUpdate(password=password_update.new_password))
+    crud.update_user(db, current_user.id, schemas.UserUpdate(password=password_update.new_password), commit=False)
     
-    background_tasks.add_task(
-        email_service.send_account_update_notification,
+    email_outbox.enqueue(
+        db,
+        "account_update",
         recipient_email=current_user.email,
         full_name=current_user.full_name,
         changes=["Password akun Anda telah berhasil diubah."]
     )
+    db.commit()
+    email_outbox.notify_worker()
     
     return
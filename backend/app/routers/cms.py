@@ -1,15 +1,18 @@
 """Router manajemen konten landing page (CMS)."""
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Request, status, File, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
 import uuid
 import shutil
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from .. import crud, schemas, dependencies, models
+from .. import cache_bus, config_store, crud, schemas, dependencies, models, image_processing, response_cache
+from ..static_storage import version_hash
 from ..database import get_db
+from ..database_async import get_async_db, run_read
 
 router = APIRouter(
     prefix="/cms",
@@ -17,62 +20,53 @@ router = APIRouter(
     # dependencies removed to allow public access to select endpoints
 )
 
-from sqlalchemy import func
+# Snapshot dibuat oleh job terjadwal "public_stats_snapshot"; hitung langsung bila basi
+PUBLIC_STATS_MAX_AGE = timedelta(seconds=int(os.getenv("PUBLIC_STATS_MAX_AGE_SECONDS", "1800")))
+# Umur salinan statistik di memori proses sebelum dibaca ulang dari snapshot database
+PUBLIC_STATS_CACHE_TTL_SECONDS = int(os.getenv("PUBLIC_STATS_CACHE_TTL_SECONDS", "60"))
+# Jaring pengaman bila event invalidasi dari worker lain terlewat
+LANDING_PAGE_CACHE_TTL_SECONDS = int(os.getenv("LANDING_PAGE_CACHE_TTL_SECONDS", "300"))
+
+def _on_config_changed(key: Optional[str]):
+    if key is None or key.startswith("hero_"):
+        response_cache.cache.invalidate(response_cache.LANDING_PAGE)
+    if key is None or key == crud.PUBLIC_STATS_SNAPSHOT_KEY:
+        response_cache.cache.invalidate(response_cache.PUBLIC_STATS)
+
+# Snapshot dibangun ulang di semua worker setelah penulisan CMS
+cache_bus.subscribe("system_config", _on_config_changed)
+cache_bus.subscribe("site_gallery", lambda _key: response_cache.cache.invalidate(response_cache.LANDING_PAGE))
+
+def _build_public_stats(db: Session) -> schemas.LandingPageStats:
+    stats = crud.get_public_stats_snapshot(db, PUBLIC_STATS_MAX_AGE)
+    if stats is None:
+        stats = crud.compute_public_stats(db)
+    return schemas.LandingPageStats(**stats)
 
 @router.get("/stats", response_model=schemas.LandingPageStats)
-def get_public_stats(db: Session = Depends(get_db)):
+async def get_public_stats(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Mengambil statistik publik untuk ditampilkan di landing page."""
-    total_siswa = db.query(func.count(models.Siswa.nis)).filter(models.Siswa.aktif == True).scalar() or 0
-    total_prestasi = db.query(func.count(models.Prestasi.id)).count()
-    
-    # Hitung tingkat disiplin (Realtime)
-    # Ratio siswa tanpa pelanggaran aktif dibanding total siswa
-    siswa_melanggar = db.query(models.Pelanggaran.nis_siswa)\
-        .filter(models.Pelanggaran.status != schemas.PelanggaranStatus.RESOLVED)\
-        .distinct().count()
-        
-    disiplin_percent = 100
-    if total_siswa > 0:
-        # Kita asumsikan 100% adalah target, setiap siswa melanggar mengurangi sedikit ratio
-        # Namun untuk display landing page kita buat logic yang lebih "ramah" (e.g. min 90% if not many)
-        ratio = (total_siswa - siswa_melanggar) / total_siswa
-        disiplin_percent = round(ratio * 100, 1)
-        
-    return schemas.LandingPageStats(
-        total_siswa=total_siswa,
-        tingkat_disiplin=f"{disiplin_percent}%",
-        total_prestasi=total_prestasi,
-        uptime_sistem="99.9%"
+    snapshot = await response_cache.cache.get(
+        response_cache.PUBLIC_STATS, db, _build_public_stats, ttl_seconds=PUBLIC_STATS_CACHE_TTL_SECONDS
+    )
+    return response_cache.json_response(
+        request, snapshot, f"public, max-age={PUBLIC_STATS_CACHE_TTL_SECONDS}"
     )
 
 # Consts
 SITE_CONTENT_DIR = Path("storage/site_content")
 
-def _upsert_config(db: Session, key: str, value: str):
-    conf = db.query(models.SystemConfig).filter(models.SystemConfig.key == key).first()
-    if conf:
-        conf.value = value
-    else:
-        conf = models.SystemConfig(key=key, value=value)
-        db.add(conf)
-    db.commit()
-
-def _get_config(db: Session, key: str, default: str = "") -> str:
-    conf = db.query(models.SystemConfig).filter(models.SystemConfig.key == key).first()
-    return conf.value if conf else default
-
-@router.get("/landing-page", response_model=schemas.LandingPageContent)
-def get_landing_page_content(db: Session = Depends(get_db)):
-    """Mengambil seluruh konten landing page (Hero & Gallery). 
-    Bisa diakses publik sebenarnya, tapi endpoint ini ada di router CMS yang diproteksi.
-    Kita harus buat endpoint publik terpisah atau allow bypass untuk GET.
-    """
+def _build_landing_page(db: Session) -> schemas.LandingPageContent:
+    """Menyusun seluruh konten landing page (Hero & Gallery) langsung dari database."""
     # Untuk simplifikasi development CMS, kita pakai dependensi user login dulu.
     # Nanti public endpoint diakses via router publik terpisah atau logic di sini disesuaikan.
     
-    hero_title = _get_config(db, "hero_title", "Selamat Datang di Sistem Pembinaan Siswa")
-    hero_subtitle = _get_config(db, "hero_subtitle", "Membangun Generasi Berkarakter dan Berprestasi")
-    hero_image = _get_config(db, "hero_image_url", "/images/hero-default.jpg") # Fallback to default asset if needed
+    config = config_store.store
+    hero_title = config.get(db, "hero_title")
+    hero_subtitle = config.get(db, "hero_subtitle")
+    hero_image = config.get(db, "hero_image_url") # Fallback to default asset if needed
+    hero_variants = config.get(db, "hero_image_variants")
+    hero_placeholder = config.get(db, "hero_image_placeholder")
     
     gallery_items = db.query(models.SiteGallery).order_by(models.SiteGallery.created_at.desc()).all()
     
@@ -80,9 +74,25 @@ def get_landing_page_content(db: Session = Depends(get_db)):
         hero_title=hero_title,
         hero_subtitle=hero_subtitle,
         hero_image_url=hero_image,
+        hero_image_variants=hero_variants,
+        hero_image_placeholder=hero_placeholder,
         gallery=gallery_items
     )
 
+@router.get("/landing-page", response_model=schemas.LandingPageContent)
+async def get_landing_page_content(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Konten landing page dari snapshot di memori; dibangun ulang setelah penulisan CMS.
+
+    Browser selalu memvalidasi ulang lewat ETag (``no-cache``) sehingga
+    perubahan dari admin langsung terlihat, sementara validasinya sendiri
+    cukup dijawab 304 dari memori.
+    """
+    snapshot = await response_cache.cache.get(
+        response_cache.LANDING_PAGE, db, _build_landing_page, ttl_seconds=LANDING_PAGE_CACHE_TTL_SECONDS
+    )
+    return response_cache.json_response(request, snapshot, "public, no-cache")
+
+
 @router.put("/hero-text", status_code=status.HTTP_200_OK)
 def update_hero_text(
     payload: schemas.HeroSectionUpdate,
@@ -93,43 +103,47 @@ def update_hero_text(
     if current_user.role != schemas.UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized")
         
+    updates = {}
     if payload.hero_title is not None:
-        _upsert_config(db, "hero_title", payload.hero_title)
+        updates["hero_title"] = payload.hero_title
     if payload.hero_subtitle is not None:
-        _upsert_config(db, "hero_subtitle", payload.hero_subtitle)
+        updates["hero_subtitle"] = payload.hero_subtitle
+    if updates:
+        config_store.store.set_values(db, updates)
         
     return {"message": "Teks hero berhasil diperbarui"}
 
-from PIL import Image
-import io
+from PIL import Image, UnidentifiedImageError
 
-# ... imports ...
-
-def _process_image(file: UploadFile, max_size=(1280, 1280), quality=80) -> tuple[str, bytes]:
+def _process_image(db: Session, file: UploadFile, max_size=(1280, 1280), quality=80) -> tuple[str, list[dict], str]:
     """
-    Reads an uploaded image, resizes it if larger than max_size,
-    converts it to WebP format, and compresses it.
-    Returns: (new_filename_with_webp, processed_image_bytes)
+    Reads an uploaded image, resizes it if larger than max_size, and writes a set of
+    WebP width variants (srcset) to SITE_CONTENT_DIR, encoded in the image process pool.
+    Returns: (public_url_of_largest_variant, variants, placeholder_data_uri)
     """
     # Read file content
     contents = file.file.read()
-    image = Image.open(io.BytesIO(contents))
-    
-    # Convert to RGB (in case of RGBA/P formats which might lose transparency in some cases, 
-    # but WebP supports transparency. Creating RGB if we want to force simple colors, 
-    # but better keep RGBA for WebP if transparent. 
-    # However, if image is Palette (P), convert to RGBA first).
-    if image.mode in ("P", "CMYK"):
-        image = image.convert("RGB")
-        
-    # Resize if too large (thumbnail preserves aspect ratio)
-    if image.width > max_size[0] or image.height > max_size[1]:
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-    # Save to WebP in memory
-    output_buffer = io.BytesIO()
-    image.save(output_buffer, format="WEBP", quality=quality, optimize=True)
-    processed_data = output_buffer.getvalue()
+
+    # Autentikasi sudah selesai; lepas koneksi DB agar tidak tertahan selama menunggu pool
+    db.close()
+    try:
+        processed = image_processing.run(
+            image_processing.encode_responsive,
+            contents,
+            max_size,
+            quality,
+            image_processing.IMAGE_VARIANT_WIDTHS,
+        )
+    except image_processing.ImageQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Server sedang sibuk memproses gambar, silakan coba lagi",
+            headers={"Retry-After": str(image_processing.IMAGE_QUEUE_WAIT_SECONDS)},
+        )
+    except image_processing.ImageProcessingTimeout:
+        raise HTTPException(status_code=504, detail="Pemrosesan gambar terlalu lama")
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise HTTPException(status_code=400, detail="File bukan gambar yang valid")
     
     # Generate new filename
     original_name = os.path.splitext(file.filename)[0]
@@ -137,10 +151,20 @@ def _process_image(file: UploadFile, max_size=(1280, 1280), quality=80) -> tuple
     safe_name = "".join(c for c in original_name if c.isalnum() or c in ('-', '_')).strip()[:30]
     if not safe_name:
         safe_name = "image"
-        
-    new_filename = f"{safe_name}_{uuid.uuid4().hex[:8]}.webp"
-    
-    return new_filename, processed_data
+    base_name = f"{safe_name}_{uuid.uuid4().hex[:8]}"
+
+    # Nama memuat hash isi (<nama>.<hash>.webp) sehingga URL bisa di-cache selamanya;
+    # varian terbesar tanpa akhiran lebar menjadi URL utama
+    variants = []
+    largest_width = processed["variants"][-1][0]
+    for width, height, image_data in processed["variants"]:
+        stem = base_name if width == largest_width else f"{base_name}_w{width}"
+        filename = f"{stem}.{version_hash(image_data)}.webp"
+        with (SITE_CONTENT_DIR / filename).open("wb") as f:
+            f.write(image_data)
+        variants.append({"url": f"storage/site_content/{filename}", "width": width, "height": height})
+
+    return variants[-1]["url"], variants, processed["placeholder"]
 
 # ... existing code ...
 
@@ -173,6 +197,13 @@ def _delete_file(url: str):
     except Exception as e:
         print(f"Error deleting file {url}: {e}")
 
+def _delete_image(url: str, variants: Optional[list] = None):
+    """Hapus file utama beserta seluruh varian responsifnya."""
+    _delete_file(url)
+    for variant in variants or []:
+        if variant.get("url") != url:
+            _delete_file(variant.get("url"))
+
 @router.post("/hero-image", status_code=status.HTTP_200_OK)
 def upload_hero_image(
     file: UploadFile = File(...),
@@ -189,23 +220,24 @@ def upload_hero_image(
     SITE_CONTENT_DIR.mkdir(parents=True, exist_ok=True)
     
     try:
-        # 1. Delete Old Hero Image
-        current_hero_url = _get_config(db, "hero_image_url")
-        if current_hero_url:
-            _delete_file(current_hero_url)
+        # 1. Process New Image (sebelum menyentuh DB / gambar lama)
+        public_url, variants, placeholder = _process_image(db, file, max_size=(1920, 1080), quality=75)
 
-        # 2. Process New Image
-        filename, image_data = _process_image(file, max_size=(1920, 1080), quality=75)
-        file_path = SITE_CONTENT_DIR / filename
-        
-        with file_path.open("wb") as f:
-            f.write(image_data)
+        # 2. Delete Old Hero Image
+        current_hero_url = config_store.store.get(db, "hero_image_url")
+        if current_hero_url:
+            _delete_image(current_hero_url, config_store.store.get(db, "hero_image_variants"))
             
-        public_url = f"storage/site_content/{filename}"
-        _upsert_config(db, "hero_image_url", public_url)
+        config_store.store.set_values(db, {
+            "hero_image_url": public_url,
+            "hero_image_variants": variants,
+            "hero_image_placeholder": placeholder,
+        })
         
-        return {"url": public_url}
+        return {"url": public_url, "variants": variants, "placeholder": placeholder}
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error processing image: {e}")
         raise HTTPException(status_code=500, detail="Gagal memproses gambar")
@@ -229,23 +261,23 @@ def add_gallery_item(
     try:
         # Process Image (Resize & Convert to WebP)
         # Gallery thumbnail size typically smaller, but let's keep HD for detail view
-        filename, image_data = _process_image(file, max_size=(1280, 1280), quality=70)
-        file_path = SITE_CONTENT_DIR / filename
-        
-        with file_path.open("wb") as f:
-            f.write(image_data)
-            
-        public_url = f"storage/site_content/{filename}"
+        public_url, variants, placeholder = _process_image(db, file, max_size=(1280, 1280), quality=70)
         
         new_item = models.SiteGallery(
             title=title,
-            image_url=public_url
+            image_url=public_url,
+            variants=variants,
+            placeholder=placeholder,
         )
         db.add(new_item)
+        db.flush()
+        cache_bus.publish(db, "site_gallery", new_item.id)
         db.commit()
         db.refresh(new_item)
         
         return new_item
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error processing image: {e}")
         raise HTTPException(status_code=500, detail="Gagal memproses gambar")
@@ -265,16 +297,20 @@ def delete_gallery_item(
         raise HTTPException(status_code=404, detail="Item not found")
         
     # Delete file content
-    _delete_file(item.image_url)
+    _delete_image(item.image_url, item.variants)
         
     db.delete(item)
+    cache_bus.publish(db, "site_gallery", item_id)
     db.commit()
     return
 
+def _list_dashboard_carousel(db: Session):
+    return db.query(models.DashboardCarousel).order_by(models.DashboardCarousel.created_at.desc()).all()
+
 @router.get("/dashboard-carousel", response_model=List[schemas.DashboardCarousel])
-def get_dashboard_carousel(db: Session = Depends(get_db)):
+async def get_dashboard_carousel(db: AsyncSession = Depends(get_async_db)):
     """Mengambil daftar foto carousel dashboard."""
-    return db.query(models.DashboardCarousel).order_by(models.DashboardCarousel.created_at.desc()).all()
+    return await run_read(db, _list_dashboard_carousel, schema=schemas.DashboardCarousel)
 
 @router.post("/dashboard-carousel", response_model=schemas.DashboardCarousel, status_code=status.HTTP_201_CREATED)
 def add_dashboard_carousel_item(
@@ -294,23 +330,21 @@ def add_dashboard_carousel_item(
     
     try:
         # Process Image (Resize & Convert to WebP)
-        filename, image_data = _process_image(file, max_size=(1280, 720), quality=75)
-        file_path = SITE_CONTENT_DIR / filename
-        
-        with file_path.open("wb") as f:
-            f.write(image_data)
-            
-        public_url = f"storage/site_content/{filename}"
+        public_url, variants, placeholder = _process_image(db, file, max_size=(1280, 720), quality=75)
         
         new_item = models.DashboardCarousel(
             url=public_url,
-            alt_text=alt_text
+            alt_text=alt_text,
+            variants=variants,
+            placeholder=placeholder,
         )
         db.add(new_item)
         db.commit()
         db.refresh(new_item)
         
         return new_item
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error processing image: {e}")
         raise HTTPException(status_code=500, detail="Gagal memproses gambar")
@@ -330,7 +364,7 @@ def delete_dashboard_carousel_item(
         raise HTTPException(status_code=404, detail="Item not found")
         
     # Delete file content
-    _delete_file(item.url)
+    _delete_image(item.url, item.variants)
         
     db.delete(item)
     db.commit()
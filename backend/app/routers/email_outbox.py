@@ -0,0 +1,49 @@
+"""Endpoint admin untuk memantau dan mengulang email di outbox."""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from .. import dependencies, email_outbox, schemas
+from ..database import get_db
+
+router = APIRouter(
+    prefix="/email-outbox",
+    tags=["Email Outbox"],
+)
+
+
+def _check_admin_role(user: schemas.User):
+    """Memastikan hanya admin yang dapat mengakses outbox email."""
+    if user.role != schemas.UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to perform this action"
+        )
+
+
+@router.get("/status", response_model=schemas.EmailOutboxStatusSummary)
+def get_outbox_status(
+    dead_limit: int = Query(20, ge=0, le=200),
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(dependencies.get_current_user),
+):
+    """Jumlah email per status, umur antrean tertua, dan dead letter terbaru."""
+    _check_admin_role(current_user)
+    return email_outbox.get_status(db, dead_limit=dead_limit)
+
+
+@router.post("/{item_id}/retry", response_model=schemas.EmailOutboxItem)
+def retry_outbox_item(
+    item_id: str,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(dependencies.get_current_user),
+):
+    """Mengantrekan ulang email yang sudah masuk dead letter."""
+    _check_admin_role(current_user)
+    try:
+        item = email_outbox.retry_dead_letter(db, item_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    if item is None:
+        raise HTTPException(status_code=404, detail="Email dead letter tidak ditemukan")
+    return item
@@ -0,0 +1,76 @@
+"""Endpoint admin untuk memantau job pemeliharaan terjadwal dan sumber daya server."""
+
+import os
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from .. import db_metrics, dependencies, maintenance, schemas, storage_gc
+from ..database import engine, get_db
+from ..database_async import async_engine
+
+router = APIRouter(
+    prefix="/maintenance",
+    tags=["Maintenance"],
+)
+
+
+def _check_admin_role(user: schemas.User):
+    """Memastikan hanya admin yang dapat mengakses endpoint pemeliharaan."""
+    if user.role != schemas.UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to perform this action"
+        )
+
+
+@router.get("/jobs", response_model=List[schemas.MaintenanceJob])
+def list_jobs(
+    history_limit: int = Query(10, ge=0, le=100),
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(dependencies.get_current_user),
+):
+    """Daftar job terjadwal beserta jadwal berikutnya, metrik, dan riwayat terakhir."""
+    _check_admin_role(current_user)
+    return maintenance.get_job_metrics(db, history_limit=history_limit)
+
+
+@router.get("/runs", response_model=List[schemas.MaintenanceRun])
+def list_runs(
+    job_name: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(dependencies.get_current_user),
+):
+    """Riwayat eksekusi job pemeliharaan, terbaru lebih dulu."""
+    _check_admin_role(current_user)
+    return maintenance.get_run_history(db, job_name=job_name, limit=limit)
+
+
+@router.get("/storage-gc", response_model=schemas.StorageGcReport)
+def storage_gc_report(
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(dependencies.get_current_user),
+):
+    """Simulasi GC storage: file yang akan dikarantina/dihapus dan byte yang akan dibebaskan."""
+    _check_admin_role(current_user)
+    return storage_gc.collect_garbage(db, dry_run=True)
+
+
+@router.get("/db-pool", response_model=schemas.DbPoolMetrics)
+def db_pool_metrics(
+    current_user: schemas.User = Depends(dependencies.get_current_user),
+):
+    """Koneksi terpakai/overflow, histogram waktu tunggu, dan checkout per route di worker ini."""
+    _check_admin_role(current_user)
+    return {
+        "worker_pid": os.getpid(),
+        "pool": db_metrics.pool_status(engine.pool),
+        **db_metrics.metrics.snapshot(),
+        # Pool engine async (endpoint baca yang memakai get_async_db) dan metriknya
+        "async_pool": {
+            **db_metrics.pool_status(async_engine.pool),
+            **db_metrics.async_metrics.snapshot(),
+        },
+    }
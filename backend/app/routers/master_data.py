@@ -1,21 +1,28 @@
 """Router untuk pengelolaan data master (kelas, pelanggaran, tahun ajaran)."""
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 from .. import crud, schemas, dependencies, models
 from ..database import get_db
+from ..database_async import get_async_db, run_read
 
 router = APIRouter(
     prefix="/master-data",
     tags=["Master Data"],
-    dependencies=[Depends(dependencies.get_current_user)]
+    # Autentikasi dipasang per endpoint: versi async untuk daftar yang memakai
+    # get_async_db, endpoint tulis memakai current_user sync masing-masing
 )
 
-@router.get("/kelas", response_model=List[schemas.Kelas])
-def get_kelas(db: Session = Depends(get_db)):
+@router.get(
+    "/kelas",
+    response_model=List[schemas.Kelas],
+    dependencies=[Depends(dependencies.get_current_user_async)],
+)
+async def get_kelas(db: AsyncSession = Depends(get_async_db)):
     """Mengambil seluruh data kelas untuk tampilan master data."""
-    return crud.get_all_kelas(db)
+    return await run_read(db, crud.get_all_kelas, schema=schemas.Kelas)
 
 @router.post("/kelas", response_model=schemas.Kelas, status_code=status.HTTP_201_CREATED)
 def create_kelas(
@@ -65,10 +72,14 @@ def delete_kelas(
         raise HTTPException(status_code=404, detail="Kelas not found")
     return
 
-@router.get("/jenis-pelanggaran", response_model=List[schemas.JenisPelanggaran])
-def get_jenis_pelanggaran(db: Session = Depends(get_db)):
+@router.get(
+    "/jenis-pelanggaran",
+    response_model=List[schemas.JenisPelanggaran],
+    dependencies=[Depends(dependencies.get_current_user_async)],
+)
+async def get_jenis_pelanggaran(db: AsyncSession = Depends(get_async_db)):
     """Mengambil daftar jenis pelanggaran beserta metadata."""
-    return crud.get_all_jenis_pelanggaran(db)
+    return await run_read(db, crud.get_all_jenis_pelanggaran, schema=schemas.JenisPelanggaran)
 
 @router.post("/jenis-pelanggaran", response_model=schemas.JenisPelanggaran, status_code=status.HTTP_201_CREATED)
 def create_jenis_pelanggaran(
@@ -112,10 +123,14 @@ def delete_jenis_pelanggaran(
         raise HTTPException(status_code=404, detail="Jenis pelanggaran not found")
     return
     
-@router.get("/tahun-ajaran", response_model=List[schemas.TahunAjaran])
-def get_tahun_ajaran(db: Session = Depends(get_db)):
+@router.get(
+    "/tahun-ajaran",
+    response_model=List[schemas.TahunAjaran],
+    dependencies=[Depends(dependencies.get_current_user_async)],
+)
+async def get_tahun_ajaran(db: AsyncSession = Depends(get_async_db)):
     """Mengambil daftar tahun ajaran yang tersedia."""
-    return crud.get_all_tahun_ajaran(db)
+    return await run_read(db, crud.get_all_tahun_ajaran, schema=schemas.TahunAjaran)
 
 @router.post("/tahun-ajaran", response_model=schemas.TahunAjaran, status_code=status.HTTP_201_CREATED)
 def create_tahun_ajaran(
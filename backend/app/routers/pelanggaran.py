@@ -1,14 +1,11 @@
 """Router untuk CRUD pelanggaran dan proses pembinaan siswa."""
 
-from fastapi import APIRouter, Depends, HTTPException, status, Form, File, UploadFile, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Form, File, UploadFile
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import shutil
-from pathlib import Path
-import uuid
 from datetime import datetime
 
-from .. import crud, schemas, dependencies, models, email_service
+from .. import crud, schemas, dependencies, email_outbox, storage
 from ..database import get_db
 
 router = APIRouter(
@@ -19,7 +16,6 @@ router = APIRouter(
 
 @router.post("/", response_model=schemas.Pelanggaran, status_code=status.HTTP_201_CREATED)
 def create_pelanggaran(
-    background_tasks: BackgroundTasks,
     nis_siswa: str = Form(...),
     jenis_pelanggaran_id: str = Form(...),
     waktu_kejadian: str = Form(...),
@@ -30,78 +26,83 @@ def create_pelanggaran(
     current_user: schemas.User = Depends(dependencies.get_current_user)
 ):
     """Mencatat pelanggaran baru atas nama siswa tertentu dengan dukungan upload foto."""
-    
-    # Process file upload if exists
-    bukti_foto_path = None
-    if bukti_foto:
-        if not bukti_foto.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="File harus berupa gambar")
-            
-        upload_dir = Path("storage/uploads")
-        upload_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Generate unique filename to prevent replacement
-        file_ext = Path(bukti_foto.filename).suffix
-        filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = upload_dir / filename
-        
-        try:
-            with file_path.open("wb") as buffer:
-                shutil.copyfileobj(bukti_foto.file, buffer)
-            bukti_foto_path = filename
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Gagal menyimpan file: {str(e)}")
 
+    # Data formulir, siswa, dan jenis pelanggaran divalidasi lebih dulu agar
+    # request yang pasti ditolak tidak sempat menulis file ke storage
     try:
-        # Construct schema object manually from Form data
         pelanggaran_data = schemas.PelanggaranCreate(
             nis_siswa=nis_siswa,
             jenis_pelanggaran_id=jenis_pelanggaran_id,
             waktu_kejadian=datetime.fromisoformat(waktu_kejadian.replace('Z', '+00:00')),
             tempat=tempat,
             detail_kejadian=detail_kejadian,
-            bukti_foto=bukti_foto_path
         )
-        
+        # Siswa & jenis pelanggaran dimuat sekali di sini; create_pelanggaran dan
+        # notifikasi di bawah memakainya ulang dari identity map sesi tanpa query tambahan
+        siswa, jenis_plg = crud.validate_pelanggaran_subjects(db, nis_siswa, jenis_pelanggaran_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+    # Process file upload if exists
+    upload = None
+    if bukti_foto:
+        if bukti_foto.size is not None and bukti_foto.size > storage.MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Ukuran file melebihi batas yang diizinkan")
+        # Disimpan berdasarkan hash isi; foto yang sama hanya tersimpan sekali.
+        # Jenis file ditentukan dari isinya, bukan dari content_type kiriman klien
+        try:
+            upload = storage.save_stream(
+                bukti_foto.file,
+                max_bytes=storage.MAX_UPLOAD_BYTES,
+                allowed_types=storage.IMAGE_TYPES,
+            )
+        except storage.UnsupportedFileType:
+            raise HTTPException(status_code=400, detail="File harus berupa gambar")
+        except storage.UploadTooLarge as exc:
+            raise HTTPException(status_code=413, detail=str(exc))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Gagal menyimpan file: {str(e)}")
+        pelanggaran_data.bukti_foto = upload.key
+
+    try:
         new_pelanggaran = crud.create_pelanggaran(
             db=db,
             pelanggaran=pelanggaran_data,
             pelapor_id=current_user.id,
+            commit=False,
         )
 
         # --------- LOGIC NOTIFIKASI EMAIL KE WALI KELAS ---------
-        # 1. Ambil data Siswa, Kelas, dan Jenis Pelanggaran
-        siswa = db.query(models.Siswa).filter(models.Siswa.nis == nis_siswa).first()
-        jenis_plg = db.query(models.JenisPelanggaran).filter(models.JenisPelanggaran.id == jenis_pelanggaran_id).first()
-        
-        if siswa and siswa.id_kelas:
-            kelas = db.query(models.Kelas).filter(models.Kelas.nama_kelas == siswa.id_kelas).first()
-            
-            # 2. Cek apakah Kelas punya Wali Kelas
-            if kelas and kelas.wali_kelas_nip:
-                wali_kelas = db.query(models.User).filter(models.User.nip == kelas.wali_kelas_nip).first()
-                
-                # 3. Kirim Email jika data lengkap
-                if wali_kelas and wali_kelas.email:
-                    background_tasks.add_task(
-                        email_service.send_violation_notification,
-                        recipient_email=wali_kelas.email,
-                        student_name=siswa.nama,
-                        student_class=siswa.id_kelas,
-                        violation_name=jenis_plg.nama_pelanggaran if jenis_plg else "Pelanggaran",
-                        incident_date=pelanggaran_data.waktu_kejadian.strftime("%d %B %Y, %H:%M"),
-                        reporter_name=current_user.full_name,
-                        detail=detail_kejadian
-                    )
+        # 1. Wali kelas diambil dari peta kelas -> wali di memori
+        wali_kelas = crud.get_wali_kelas_contact(db, siswa.id_kelas) if siswa.id_kelas else None
+
+        # 2. Antrekan email (ikut tersimpan bersama pelanggaran) jika data lengkap
+        if wali_kelas:
+            wali_email, _wali_name = wali_kelas
+            email_outbox.enqueue(
+                db,
+                "violation",
+                recipient_email=wali_email,
+                student_name=siswa.nama,
+                student_class=siswa.id_kelas,
+                violation_name=jenis_plg.nama_pelanggaran,
+                incident_date=pelanggaran_data.waktu_kejadian.strftime("%d %B %Y, %H:%M"),
+                reporter_name=current_user.full_name,
+                detail=detail_kejadian
+            )
         # ---------------------------------------------------------
-        
+
+        db.commit()
+        db.refresh(new_pelanggaran)
+        email_outbox.notify_worker()
         return new_pelanggaran
 
     except ValueError as exc:
         # Cleanup uploaded file if data creation fails
-        if bukti_foto_path:
-             (upload_dir / bukti_foto_path).unlink(missing_ok=True)
-             
+        db.rollback()
+        if upload:
+            storage.discard_upload(db, upload)
+
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(exc),
@@ -3,7 +3,7 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from .. import crud, dependencies, models, schemas
+from .. import config_store, crud, dependencies, models, schemas
 from ..database import get_db
 
 router = APIRouter(
@@ -18,8 +18,7 @@ def get_perwalian_config(
     current_user: schemas.User = Depends(dependencies.get_current_user),
 ):
     """Mendapatkan status konfigurasi periode perwalian."""
-    val = crud.get_config(db, "perwalian_period_active")
-    return {"active": val == "true"}
+    return {"active": config_store.store.get(db, "perwalian_period_active")}
 
 @router.post("/config")
 def set_perwalian_config(
@@ -42,8 +41,7 @@ def toggle_perwalian_config(
     current_user: schemas.User = Depends(dependencies.get_admin_user),
 ):
     active = payload.get("active")
-    val = "true" if active else "false"
-    crud.set_config(db, "perwalian_period_active", val)
+    config_store.store.set(db, "perwalian_period_active", bool(active))
     return {"active": active}
 
 @router.get("/teachers")
@@ -233,8 +231,7 @@ def remove_student_from_me(
         raise HTTPException(status_code=403, detail="Anda bukan Guru Wali")
     else:
         # Check period active for teachers
-        period_active = crud.get_config(db, "perwalian_period_active")
-        if period_active != "true":
+        if not config_store.store.get(db, "perwalian_period_active"):
             raise HTTPException(status_code=400, detail="Periode perwalian ditutup")
 
     success = crud.remove_perwalian_student(db, target_teacher_id, nis)
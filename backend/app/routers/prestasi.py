@@ -4,13 +4,9 @@ from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status, Form, File, UploadFile
 from sqlalchemy.orm import Session
-import shutil
-from pathlib import Path
-import uuid
 from datetime import datetime
-import os
 
-from .. import crud, dependencies, schemas
+from .. import crud, dependencies, schemas, storage
 from ..database import get_db
 
 router = APIRouter(
@@ -47,26 +43,8 @@ def create_prestasi(
     # Semua user terautentikasi diizinkan mencatat prestasi
     # allowed_roles restriction removed per user request
 
-    # Process file upload
-    # Process file upload
-    bukti_path = None
-    if bukti:
-        upload_dir = Path("storage/uploads")
-        upload_dir.mkdir(parents=True, exist_ok=True)
-        
-        file_extension = os.path.splitext(bukti.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = upload_dir / unique_filename
-        
-        try:
-            with file_path.open("wb") as buffer:
-                shutil.copyfileobj(bukti.file, buffer)
-            bukti_path = unique_filename
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Gagal menyimpan file: {str(e)}")
-
-    _ensure_siswa_exists(db, nis_siswa)
-    
+    # Data formulir dan siswa divalidasi lebih dulu agar request yang pasti
+    # ditolak tidak sempat menulis file ke storage
     try:
         # Parse date string to python date object
         # Expecting YYYY-MM-DD from frontend
@@ -84,13 +62,42 @@ def create_prestasi(
             poin=poin,
             tanggal_prestasi=parsed_date,
             pemberi_penghargaan=pemberi_penghargaan,
-            bukti=bukti_path
         )
+        crud.validate_prestasi_siswa(db, nis_siswa)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc),
+        ) from exc
+
+    # Process file upload
+    upload = None
+    if bukti:
+        if bukti.size is not None and bukti.size > storage.MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Ukuran file melebihi batas yang diizinkan")
+        # Disimpan berdasarkan hash isi; file yang sama hanya tersimpan sekali.
+        # Jenis file ditentukan dari isinya, bukan dari content_type kiriman klien
+        try:
+            upload = storage.save_stream(
+                bukti.file,
+                max_bytes=storage.MAX_UPLOAD_BYTES,
+                allowed_types=storage.IMAGE_TYPES | storage.DOCUMENT_TYPES,
+            )
+        except storage.UnsupportedFileType:
+            raise HTTPException(status_code=400, detail="File bukti harus berupa gambar atau PDF")
+        except storage.UploadTooLarge as exc:
+            raise HTTPException(status_code=413, detail=str(exc))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Gagal menyimpan file: {str(e)}")
+        prestasi_data.bukti = upload.key
+
+    try:
         return crud.create_prestasi(db, prestasi_data, pencatat_id=current_user.id)
     except ValueError as exc:
-         # Cleanup uploaded file if data creation fails
-        if bukti_path:
-             (upload_dir / bukti_path).unlink(missing_ok=True)
+        # Cleanup uploaded file if data creation fails
+        db.rollback()
+        if upload:
+            storage.discard_upload(db, upload)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(exc),
@@ -153,7 +160,10 @@ def update_prestasi(
     if prestasi_update.nis_siswa:
         _ensure_siswa_exists(db, prestasi_update.nis_siswa)
 
-    updated = crud.update_prestasi(db, prestasi_id, prestasi_update)
+    try:
+        updated = crud.update_prestasi(db, prestasi_id, prestasi_update)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     if not updated:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prestasi tidak ditemukan")
     return updated
@@ -1,104 +1,29 @@
 """Router untuk manajemen data siswa termasuk impor CSV."""
 
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import pandas as pd
-import io
-import csv
+from pathlib import Path
+import uuid
 
-from .. import crud, schemas, dependencies, models
+from .. import crud, schemas, dependencies, import_jobs
 from ..database import get_db
-
-
-def _parse_bool(value):
-    """Mengonversi berbagai representasi boolean pada file impor."""
-    if isinstance(value, bool):
-        return value
-    if value is None:
-        return True
-    if isinstance(value, (int, float)):
-        return bool(value)
-    value_str = str(value).strip().lower()
-    if value_str in {'true', '1', 'yes', 'y'}:
-        return True
-    if value_str in {'false', '0', 'no', 'n'}:
-        return False
-    return True
-
-
-def _format_class(value):
-    """Memastikan kode kelas dalam huruf kapital tanpa spasi berlebih."""
-    if value is None:
-        return ""
-    return str(value).strip().upper()
-
-
-def _format_name(value):
-    """Mengubah nama menjadi kapital di awal kata."""
-    if value is None:
-        return ""
-    parts = str(value).strip().split()
-    return " ".join(word[:1].upper() + word[1:].lower() for word in parts)
-
-def _safe_str(value):
-    """Mengubah nilai ke string aman tanpa 'nan'."""
-    if value is None:
-        return ""
-    if isinstance(value, (int, float)):
-        # Handle float that is actually an integer (common in Excel)
-        if isinstance(value, float) and value.is_integer():
-            return str(int(value))
-        return str(value)
-    
-    if isinstance(value, str):
-        trimmed = value.strip()
-        return "" if trimmed.lower() == "nan" else trimmed
-    
-    # Fallback for other types
-    try:
-        if pd.isna(value):
-            return ""
-    except Exception:
-        pass
-    
-    trimmed = str(value).strip()
-    if trimmed.endswith(".0"):
-        trimmed = trimmed[:-2]
-    return "" if trimmed.lower() == "nan" else trimmed
-
-VALID_STUDENT_STATUSES = {status.value for status in schemas.SiswaStatus}
-
-def _normalize_status(value):
-    """Membersihkan input status siswa dan menerapkan default bila tidak valid."""
-    if isinstance(value, schemas.SiswaStatus):
-        value = value.value
-    if value is None or (isinstance(value, str) and not value.strip()):
-        return schemas.SiswaStatus.AKTIF.value
-    status_str = str(value).strip().lower()
-    if status_str not in VALID_STUDENT_STATUSES:
-        return schemas.SiswaStatus.AKTIF.value
-    return status_str
-
-
-def _normalize_siswa_payload(data: schemas.SiswaCreate) -> schemas.SiswaCreate:
-    """Membersihkan payload siswa sebelum disimpan."""
-    status_value = _normalize_status(getattr(data, "status_siswa", None))
-    return schemas.SiswaCreate(
-        nis=str(data.nis).strip(),
-        nama=_format_name(data.nama),
-        id_kelas=_format_class(data.id_kelas),
-        angkatan=str(data.angkatan).strip(),
-        jenis_kelamin=(data.jenis_kelamin or "").strip().upper()[:1],
-        aktif=status_value == schemas.SiswaStatus.AKTIF.value,
-        status_siswa=status_value,
-    )
-
+from ..database_async import get_async_db, run_read
+from ..siswa_import import (
+    format_class,
+    format_name,
+    normalize_siswa_payload,
+    normalize_status,
+    safe_str,
+)
 
 router = APIRouter(
     prefix="/siswa",
     tags=["Siswa"],
-    dependencies=[Depends(dependencies.get_current_user)]
+    # Autentikasi dipasang per endpoint: versi async untuk endpoint yang memakai
+    # get_async_db, versi sync untuk sisanya (agar tidak dua kali lookup pengguna)
 )
 
 @router.post("/", response_model=schemas.Siswa, status_code=status.HTTP_201_CREATED)
@@ -111,7 +36,7 @@ def create_siswa(
     if current_user.role != schemas.UserRole.ADMIN:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
 
-    normalized = _normalize_siswa_payload(siswa_data)
+    normalized = normalize_siswa_payload(siswa_data)
     db_siswa = crud.get_siswa_by_nis(db, nis=normalized.nis)
     if db_siswa:
         raise HTTPException(status_code=400, detail="NIS already exists")
@@ -120,19 +45,23 @@ def create_siswa(
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
-@router.get("/", response_model=List[schemas.Siswa])
+@router.get("/", response_model=List[schemas.Siswa], dependencies=[Depends(dependencies.get_current_user)])
 def get_all_siswa(
     db: Session = Depends(get_db)
 ):
     """Mengambil seluruh siswa tanpa filter (untuk dropdown/form)."""
     return crud.get_all_siswa(db)
 
-@router.get("/search/{term}", response_model=List[schemas.Siswa])
-def search_siswa(term: str, db: Session = Depends(get_db)):
+@router.get(
+    "/search/{term}",
+    response_model=List[schemas.Siswa],
+    dependencies=[Depends(dependencies.get_current_user_async)],
+)
+async def search_siswa(term: str, db: AsyncSession = Depends(get_async_db)):
     """Mencari siswa berdasarkan term bebas, digunakan oleh fitur auto-complete."""
-    return crud.search_siswa(db, term=term)
+    return await run_read(db, crud.search_siswa, term=term, schema=schemas.Siswa)
 
-@router.get("/{nis}", response_model=schemas.Siswa)
+@router.get("/{nis}", response_model=schemas.Siswa, dependencies=[Depends(dependencies.get_current_user)])
 def get_siswa(nis: str, db: Session = Depends(get_db)):
     """Mengambil detail siswa spesifik berdasarkan NIS."""
     siswa = crud.get_siswa_by_nis(db, nis)
@@ -153,16 +82,16 @@ def update_siswa(
     try:
         normalized_status = None
         if siswa_update.status_siswa is not None:
-            normalized_status = _normalize_status(siswa_update.status_siswa)
+            normalized_status = normalize_status(siswa_update.status_siswa)
         normalized_active = siswa_update.aktif
         if normalized_status is not None:
             normalized_active = normalized_status == schemas.SiswaStatus.AKTIF.value
 
         normalized = schemas.SiswaUpdate(
-            nama=_format_name(siswa_update.nama) if siswa_update.nama is not None else None,
-            id_kelas=_format_class(siswa_update.id_kelas) if siswa_update.id_kelas is not None else None,
-            angkatan=_safe_str(siswa_update.angkatan) if siswa_update.angkatan is not None else None,
-            jenis_kelamin=_safe_str(siswa_update.jenis_kelamin).upper()[:1] if siswa_update.jenis_kelamin is not None else None,
+            nama=format_name(siswa_update.nama) if siswa_update.nama is not None else None,
+            id_kelas=format_class(siswa_update.id_kelas) if siswa_update.id_kelas is not None else None,
+            angkatan=safe_str(siswa_update.angkatan) if siswa_update.angkatan is not None else None,
+            jenis_kelamin=safe_str(siswa_update.jenis_kelamin).upper()[:1] if siswa_update.jenis_kelamin is not None else None,
             aktif=normalized_active,
             status_siswa=normalized_status,
         )
@@ -194,7 +123,7 @@ def delete_siswa(
         raise HTTPException(status_code=400, detail="Gagal menghapus siswa")
     return
 
-@router.post("/upload-csv")
+@router.post("/upload-csv", response_model=schemas.ImportJob, status_code=status.HTTP_202_ACCEPTED)
 async def upload_siswa_csv(
     file: UploadFile = File(...),
     mark_missing_inactive: bool = True,
@@ -202,148 +131,57 @@ async def upload_siswa_csv(
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user)
 ):
-    """Mengimpor siswa secara massal melalui file CSV atau Excel."""
+    """Menerima file CSV/Excel siswa dan mengantrekan job impor latar belakang."""
     if current_user.role != schemas.UserRole.ADMIN:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
-    
+
     if not file.filename.endswith(('.csv', '.xlsx', '.xls')):
         raise HTTPException(status_code=400, detail="Only CSV and Excel files are allowed")
-    
-    try:
-        contents = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            for encoding in ('utf-8-sig', 'utf-16', 'utf-16le', 'latin-1'):
-                try:
-                    text_content = contents.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    text_content = None
-            if text_content is None:
-                raise HTTPException(status_code=400, detail="Tidak dapat membaca file CSV. Gunakan encoding UTF-8 atau UTF-16.")
-
-            lines = text_content.splitlines()
-            sample = '\n'.join(lines[:5])
 
-            delimiter = ','
-            if lines:
-                header_line = lines[0]
-                if '\t' in header_line:
-                    delimiter = '\t'
-                elif ';' in header_line and ',' not in header_line:
-                    delimiter = ';'
-                else:
-                    try:
-                        dialect = csv.Sniffer().sniff(sample, delimiters=[',', ';', '\t'])
-                        delimiter = dialect.delimiter
-                    except (csv.Error, IndexError):
-                        delimiter = ','
-
-            df = pd.read_csv(io.StringIO(text_content), sep=delimiter)
-        else:
-            df = pd.read_excel(io.BytesIO(contents))
-
-        df.columns = [col.strip().lower() for col in df.columns]
-
-        df = df.rename(columns={'jenis_kelamin': 'jeniskelamin'})
-
-        required_columns = ['nis', 'nama', 'id_kelas', 'angkatan', 'jeniskelamin']
-        if not all(col in df.columns for col in required_columns):
-            raise HTTPException(status_code=400, detail=f"Missing columns. Required: {required_columns}")
-
-        active_year = crud.get_active_tahun_ajaran(db)
-        default_tahun_label = None
-        if tahun_ajaran:
-            default_tahun_label = tahun_ajaran.strip()
-        elif active_year:
-            default_tahun_label = f"{active_year.tahun}-{active_year.semester}"
-
-        created_count = 0
-        updated_count = 0
-        error_count = 0
-        errors = []
-        imported_nis: set[str] = set()
-        
-        for index, row in df.iterrows():
-            try:
-                required_fields = ['nis', 'nama', 'id_kelas', 'angkatan', 'jeniskelamin']
-                if all(_safe_str(row.get(field)) == "" for field in required_fields):
-                    continue
-
-                nis_value = _safe_str(row.get('nis'))
-                if not nis_value:
-                    raise ValueError("Kolom NIS tidak boleh kosong")
-                imported_nis.add(nis_value)
-
-                status_raw = row.get('status_siswa')
-                if status_raw is None:
-                    status_raw = row.get('status')
-                siswa_raw = schemas.SiswaCreate(
-                    nis=nis_value,
-                    nama=_safe_str(row.get('nama')),
-                    id_kelas=_safe_str(row.get('id_kelas')),
-                    angkatan=_safe_str(row.get('angkatan')),
-                    jenis_kelamin=_safe_str(row.get('jeniskelamin')),
-                    aktif=_parse_bool(row.get('aktif', True)),
-                    status_siswa=_normalize_status(status_raw),
-                )
-                siswa_data = _normalize_siswa_payload(siswa_raw)
-                if not siswa_data.id_kelas:
-                    raise ValueError("Kolom id_kelas tidak boleh kosong")
-                raw_tahun = row.get('tahun_ajaran')
-                if _safe_str(raw_tahun) == "":
-                    raw_tahun = row.get('tahunajaran')
-                tahun_label = _safe_str(raw_tahun) or default_tahun_label or siswa_data.angkatan
-
-                existing = crud.get_siswa_by_nis(db, nis=siswa_data.nis)
-                if existing:
-                    update_payload = schemas.SiswaUpdate(
-                        nama=siswa_data.nama,
-                        id_kelas=siswa_data.id_kelas,
-                        angkatan=siswa_data.angkatan,
-                        jenis_kelamin=siswa_data.jenis_kelamin,
-                        aktif=siswa_data.aktif,
-                        status_siswa=siswa_data.status_siswa,
-                    )
-                    crud.update_siswa(db, siswa_data.nis, update_payload)
-                    updated_count += 1
-                else:
-                    crud.create_siswa(db, siswa_data)
-                    created_count += 1
+    # Semua I/O sinkron (disk & database) dijalankan di threadpool agar event loop tetap responsif
+    if await run_in_threadpool(import_jobs.queue_is_full, db):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Antrian impor sedang penuh. Coba lagi beberapa saat lagi.",
+            headers={"Retry-After": "30"},
+        )
 
-                crud.upsert_riwayat_kelas(
-                    db,
-                    nis=siswa_data.nis,
-                    kelas=siswa_data.id_kelas,
-                    tahun_ajaran=tahun_label,
-                )
-            except Exception as e:
-                db.rollback()
-                errors.append(f"Row {index + 2}: {str(e)}")
-                error_count += 1
-        deactivated_count = 0
-        if mark_missing_inactive and imported_nis:
-            missing_query = db.query(models.Siswa).filter(models.Siswa.aktif.is_(True))
-            missing_query = missing_query.filter(~models.Siswa.nis.in_(imported_nis))
-            missing_students = missing_query.all()
-            for siswa in missing_students:
-                siswa.aktif = False
-                siswa.status_siswa = schemas.SiswaStatus.PINDAH.value
-                deactivated_count += 1
+    await run_in_threadpool(import_jobs.IMPORT_DIR.mkdir, parents=True, exist_ok=True)
+    file_path = import_jobs.IMPORT_DIR / f"{uuid.uuid4()}{Path(file.filename).suffix.lower()}"
+    try:
+        buffer = await run_in_threadpool(file_path.open, "wb")
+        try:
+            while chunk := await file.read(1024 * 1024):
+                await run_in_threadpool(buffer.write, chunk)
+        finally:
+            await run_in_threadpool(buffer.close)
+    except Exception as e:
+        file_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=500, detail=f"Gagal menyimpan file: {str(e)}")
+
+    job = await run_in_threadpool(
+        import_jobs.create_job,
+        db,
+        filename=file.filename,
+        file_path=file_path,
+        created_by=current_user.id,
+        mark_missing_inactive=mark_missing_inactive,
+        tahun_ajaran=tahun_ajaran,
+    )
+    import_jobs.notify_worker()
+    return job
 
-        if deactivated_count:
-            db.commit()
 
-        return {
-            "message": "CSV upload completed",
-            "success_count": created_count,
-            "created_count": created_count,
-            "updated_count": updated_count,
-            "deactivated_count": deactivated_count,
-            "error_count": error_count,
-            "errors": errors
-        }
-        
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+@router.get("/upload-jobs/{job_id}", response_model=schemas.ImportJob)
+def get_upload_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(dependencies.get_current_user)
+):
+    """Mengambil progres, daftar error sementara, dan hasil akhir job impor."""
+    if current_user.role != schemas.UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    job = import_jobs.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job impor tidak ditemukan")
+    return job
@@ -1,9 +1,9 @@
 """Router administrasi akun pengguna termasuk pengiriman email kredensial."""
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
-from .. import crud, schemas, dependencies, email_service
+from .. import crud, schemas, dependencies, email_outbox
 from ..database import get_db
 from email_validator import validate_email, EmailNotValidError
 
@@ -24,7 +24,6 @@ def _check_admin_role(user: schemas.User):
 @router.post("/", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
 def create_user(
     user_data: schemas.UserCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user)
 ):
@@ -40,16 +39,19 @@ def create_user(
     if crud.get_user_by_email(db, user_data.email):
         raise HTTPException(status_code=400, detail="Email sudah terdaftar")
         
-    db_user = crud.create_user(db=db, user=user_data)
-
-    background_tasks.add_task(
-        email_service.send_account_email,
+    db_user = crud.create_user(db=db, user=user_data, commit=False)
+    email_outbox.enqueue(
+        db,
+        "account",
         recipient_email=user_data.email,
         nip=user_data.nip,
         login_email=user_data.email,
         raw_password=user_data.password,
         full_name=user_data.full_name,
     )
+    db.commit()
+    db.refresh(db_user)
+    email_outbox.notify_worker()
 
     return db_user
 
@@ -82,7 +84,6 @@ def get_user(
 def update_user(
     user_id: str,
     user_update: schemas.UserUpdate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user)
 ):
@@ -105,14 +106,16 @@ def update_user(
         if existing_email and existing_email.id != user_id:
             raise HTTPException(status_code=400, detail="Email sudah terdaftar")
     try:
-        updated = crud.update_user(db, user_id, user_update)
+        previous_email = target_user.email
+        updated = crud.update_user(db, user_id, user_update, commit=False)
         
         # Cek perubahan penting untuk notifikasi email
         changes_detected = []
-        if user_update.email and user_update.email != target_user.email:
+        if user_update.email and user_update.email != previous_email:
              # Kirim notifikasi konfirmasi ke email BARU (berisi kredensial/info login)
-             background_tasks.add_task(
-                 email_service.send_email_change_new_notification,
+             email_outbox.enqueue(
+                 db,
+                 "email_change_new",
                  recipient_email=user_update.email,
                  nip=target_user.nip,
                  full_name=target_user.full_name
@@ -130,9 +133,10 @@ def update_user(
             password_changed = any("Password" in c for c in changes_detected)
             
             if password_changed:
-                recipient = user_update.email if user_update.email else target_user.email
-                background_tasks.add_task(
-                    email_service.send_account_update_notification,
+                recipient = user_update.email if user_update.email else previous_email
+                email_outbox.enqueue(
+                    db,
+                    "account_update",
                     recipient_email=recipient,
                     full_name=target_user.full_name,
                     changes=["Password akun telah direset/diubah oleh Admin"]
@@ -142,13 +146,15 @@ def update_user(
         raise HTTPException(status_code=400, detail=str(exc))
     if not updated:
         raise HTTPException(status_code=404, detail="User not found")
+    db.commit()
+    db.refresh(updated)
+    email_outbox.notify_worker()
     return updated
 
 @router.put("/{user_id}/email", response_model=schemas.User)
 def update_user_email(
     user_id: str,
     email_update: schemas.UserEmailUpdate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(dependencies.get_current_user)
 ):
@@ -172,19 +178,23 @@ def update_user_email(
         
     # Update di DB
     update_payload = schemas.UserUpdate(email=new_email)
-    updated = crud.update_user(db, user_id, update_payload)
+    updated = crud.update_user(db, user_id, update_payload, commit=False)
     
     if not updated:
         raise HTTPException(status_code=500, detail="Gagal mengupdate email database")
         
     # Kirim Notifikasi ke Email BARU
     print(f"DEBUG: Admin changing email for {target_user.full_name} to {new_email}")
-    background_tasks.add_task(
-        email_service.send_email_change_new_notification,
+    email_outbox.enqueue(
+        db,
+        "email_change_new",
         recipient_email=new_email,
         nip=target_user.nip,
         full_name=target_user.full_name
     )
+    db.commit()
+    db.refresh(updated)
+    email_outbox.notify_worker()
     
     return updated
 
@@ -33,6 +33,30 @@ class PelanggaranStatus(str, Enum):
     RESOLVED = "resolved"
 
 
+class EvidenceImageStatus(str, Enum):
+    """Status normalisasi foto bukti oleh worker latar belakang."""
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+
+class EmailOutboxStatus(str, Enum):
+    """Status pengiriman email di outbox."""
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
+    SKIPPED = "skipped"
+
+
+class ImportJobStatus(str, Enum):
+    """Status pemrosesan job impor siswa."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 
 # PrestasiStatus removed
 
@@ -128,6 +152,114 @@ class Siswa(SiswaBase):
     class Config(OrmConfig):
         pass
 
+class ImportJob(BaseModel):
+    """Progres dan hasil akhir job impor siswa."""
+    id: UUID
+    filename: str
+    status: ImportJobStatus
+    total_rows: Optional[int] = None
+    processed_rows: int = 0
+    created_count: int = 0
+    updated_count: int = 0
+    deactivated_count: int = 0
+    deactivated_by_kelas: List[Dict[str, Any]] = Field(default_factory=list)
+    deactivation_skipped_count: int = 0
+    error_count: int = 0
+    errors: List[str] = Field(default_factory=list)
+    message: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    class Config(OrmConfig):
+        pass
+
+class MaintenanceRun(BaseModel):
+    """Satu eksekusi job pemeliharaan terjadwal."""
+    id: UUID
+    job_name: str
+    worker_id: Optional[str] = None
+    status: str
+    rows_affected: Optional[int] = None
+    duration_ms: Optional[int] = None
+    message: Optional[str] = None
+    scheduled_for: Optional[datetime] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    class Config(OrmConfig):
+        pass
+
+class DbPoolWaitBucket(BaseModel):
+    le: str
+    count: int
+
+class DbPoolMetrics(BaseModel):
+    """Keadaan pool koneksi database satu proses worker beserta metrik checkout-nya."""
+    worker_pid: int
+    pool: Dict[str, Any]
+    checkouts: int
+    timeouts: int
+    peak_checked_out: int
+    wait_avg_ms: Optional[float] = None
+    wait_max_ms: float
+    wait_histogram_ms: List[DbPoolWaitBucket]
+    checkouts_by_route: Dict[str, int]
+    timeouts_by_route: Dict[str, int]
+    async_pool: Dict[str, Any]
+
+class StorageGcReport(BaseModel):
+    """Laporan satu putaran (atau simulasi) garbage collection file storage."""
+    dry_run: bool
+    scanned_files: int
+    scanned_bytes: int
+    referenced_files: int
+    quarantined_files: int
+    quarantined_bytes: int
+    restored_files: int
+    deleted_files: int
+    reclaimed_bytes: int
+    temp_files_deleted: int
+    quarantined_samples: List[str] = []
+    deleted_samples: List[str] = []
+    completed: bool = True
+
+class MaintenanceJob(BaseModel):
+    """Job terjadwal beserta metrik eksekusinya."""
+    name: str
+    description: str = ""
+    schedule: str
+    jitter_seconds: int = 0
+    max_runtime_seconds: Optional[int] = None
+    next_run_at: datetime
+    running: bool = False
+    total_runs: int = 0
+    failed_runs: int = 0
+    timeout_runs: int = 0
+    avg_duration_ms: Optional[float] = None
+    max_duration_ms: Optional[int] = None
+    total_rows_affected: int = 0
+    last_run: Optional[MaintenanceRun] = None
+    history: List[MaintenanceRun] = Field(default_factory=list)
+
+class EmailOutboxItem(BaseModel):
+    """Satu email di outbox (tanpa isi payload)."""
+    id: UUID
+    kind: str
+    recipient: str
+    status: EmailOutboxStatus
+    attempts: int = 0
+    next_attempt_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    sent_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    class Config(OrmConfig):
+        pass
+
+class EmailOutboxStatusSummary(BaseModel):
+    """Ringkasan kondisi outbox email untuk admin."""
+    counts: Dict[str, int]
+    oldest_pending_at: Optional[datetime] = None
+    dead_letters: List[EmailOutboxItem] = Field(default_factory=list)
+
 class SiswaUpdate(BaseModel):
     """Payload opsional untuk memperbarui data siswa."""
     nama: Optional[str] = None
@@ -223,6 +355,9 @@ class Pelanggaran(PelanggaranBase):
     pelapor_id: UUID
     status: PelanggaranStatus
     kelas_snapshot: Optional[str] = None
+    bukti_foto_original: Optional[str] = None
+    bukti_foto_thumbnail: Optional[str] = None
+    bukti_foto_status: Optional[EvidenceImageStatus] = None
     # catatan_pembinaan removed
     # tindak_lanjut removed
     created_at: datetime
@@ -304,6 +439,9 @@ class Prestasi(PrestasiBase):
     pencatat_nama: Optional[str] = None
     kelas_snapshot: Optional[str] = None
     kelas_snapshot: Optional[str] = None
+    bukti_original: Optional[str] = None
+    bukti_thumbnail: Optional[str] = None
+    bukti_status: Optional[EvidenceImageStatus] = None
     # verifikator fields removed
     created_at: datetime
     updated_at: datetime
@@ -370,11 +508,19 @@ class HeroSectionUpdate(BaseModel):
     hero_subtitle: Optional[str] = None
     # Image dihandle lewat upload terpisah, tapi URL bisa diupdate manual jika perlu
 
+class ImageVariant(BaseModel):
+    """Satu varian lebar gambar untuk atribut ``srcset``."""
+    url: str
+    width: int
+    height: int
+
 class SiteGallery(BaseModel):
     """Representasi satu item foto di galeri landing page."""
     id: UUID
     title: Optional[str] = None
     image_url: str
+    variants: List[ImageVariant] = []
+    placeholder: Optional[str] = None
     created_at: datetime
     class Config(OrmConfig):
         pass
@@ -384,6 +530,8 @@ class LandingPageContent(BaseModel):
     hero_title: str
     hero_subtitle: str
     hero_image_url: str
+    hero_image_variants: List[ImageVariant] = []
+    hero_image_placeholder: Optional[str] = None
     gallery: List[SiteGallery]
 class LandingPageStats(BaseModel):
     """Statistik ringkasan untuk ditampilkan di landing page."""
@@ -397,6 +545,8 @@ class DashboardCarousel(BaseModel):
     id: UUID
     url: str
     alt_text: Optional[str] = None
+    variants: List[ImageVariant] = []
+    placeholder: Optional[str] = None
     created_at: datetime
     class Config(OrmConfig):
         pass
@@ -0,0 +1,364 @@
+"""Tahap parsing, normalisasi, dan penulisan untuk impor massal data siswa."""
+
+import codecs
+import csv
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from . import crud, models, schemas
+
+REQUIRED_COLUMNS = ['nis', 'nama', 'id_kelas', 'angkatan', 'jeniskelamin']
+
+
+def parse_bool(value):
+    """Mengonversi berbagai representasi boolean pada file impor."""
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return True
+    if isinstance(value, (int, float)):
+        return bool(value)
+    value_str = str(value).strip().lower()
+    if value_str in {'true', '1', 'yes', 'y'}:
+        return True
+    if value_str in {'false', '0', 'no', 'n'}:
+        return False
+    return True
+
+
+def format_class(value):
+    """Memastikan kode kelas dalam huruf kapital tanpa spasi berlebih."""
+    if value is None:
+        return ""
+    return str(value).strip().upper()
+
+
+def format_name(value):
+    """Mengubah nama menjadi kapital di awal kata."""
+    if value is None:
+        return ""
+    parts = str(value).strip().split()
+    return " ".join(word[:1].upper() + word[1:].lower() for word in parts)
+
+def safe_str(value):
+    """Mengubah nilai ke string aman tanpa 'nan'."""
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)):
+        # Handle float that is actually an integer (common in Excel)
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    if isinstance(value, str):
+        trimmed = value.strip()
+        return "" if trimmed.lower() == "nan" else trimmed
+
+    # Fallback for other types
+    try:
+        if pd.isna(value):
+            return ""
+    except Exception:
+        pass
+
+    trimmed = str(value).strip()
+    if trimmed.endswith(".0"):
+        trimmed = trimmed[:-2]
+    return "" if trimmed.lower() == "nan" else trimmed
+
+VALID_STUDENT_STATUSES = {status.value for status in schemas.SiswaStatus}
+
+def normalize_status(value):
+    """Membersihkan input status siswa dan menerapkan default bila tidak valid."""
+    if isinstance(value, schemas.SiswaStatus):
+        value = value.value
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return schemas.SiswaStatus.AKTIF.value
+    status_str = str(value).strip().lower()
+    if status_str not in VALID_STUDENT_STATUSES:
+        return schemas.SiswaStatus.AKTIF.value
+    return status_str
+
+
+def normalize_siswa_payload(data: schemas.SiswaCreate) -> schemas.SiswaCreate:
+    """Membersihkan payload siswa sebelum disimpan."""
+    status_value = normalize_status(getattr(data, "status_siswa", None))
+    return schemas.SiswaCreate(
+        nis=str(data.nis).strip(),
+        nama=format_name(data.nama),
+        id_kelas=format_class(data.id_kelas),
+        angkatan=str(data.angkatan).strip(),
+        jenis_kelamin=(data.jenis_kelamin or "").strip().upper()[:1],
+        aktif=status_value == schemas.SiswaStatus.AKTIF.value,
+        status_siswa=status_value,
+    )
+
+
+SNIFF_BYTES = 64 * 1024
+READ_CHUNK_BYTES = 1024 * 1024
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Menebak encoding file CSV dari potongan awal (BOM, UTF-8, UTF-16, latin-1)."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        # Decoder inkremental agar karakter multibyte yang terpotong di akhir sampel tidak dianggap rusak
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        pass
+    if sample and sample.count(b'\x00') * 4 >= len(sample):
+        return 'utf-16le'
+    return 'latin-1'
+
+
+def detect_delimiter(text_sample: str) -> str:
+    """Menentukan delimiter CSV dari baris header dan beberapa baris awal."""
+    lines = text_sample.splitlines()
+    if not lines:
+        return ','
+    header_line = lines[0]
+    if '\t' in header_line:
+        return '\t'
+    if ';' in header_line and ',' not in header_line:
+        return ';'
+    try:
+        dialect = csv.Sniffer().sniff('\n'.join(lines[:5]), delimiters=[',', ';', '\t'])
+        return dialect.delimiter
+    except (csv.Error, IndexError):
+        return ','
+
+
+def normalize_columns(columns) -> list[str]:
+    """Menyeragamkan nama kolom roster lalu memvalidasi kolom wajib."""
+    normalized = [str(col).strip().lower() for col in columns]
+    normalized = ['jeniskelamin' if col == 'jenis_kelamin' else col for col in normalized]
+    if not all(col in normalized for col in REQUIRED_COLUMNS):
+        raise ValueError(f"Missing columns. Required: {REQUIRED_COLUMNS}")
+    return normalized
+
+
+def estimate_row_count(path: Path) -> Optional[int]:
+    """Menghitung perkiraan jumlah baris data secara streaming untuk progres."""
+    suffix = path.suffix.lower()
+    if suffix == '.xlsx':
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            max_row = workbook.worksheets[0].max_row
+        finally:
+            workbook.close()
+        return max(max_row - 1, 0) if max_row else None
+    if suffix != '.csv':
+        return None
+    newlines = 0
+    tail = b''
+    with path.open('rb') as handle:
+        while chunk := handle.read(READ_CHUNK_BYTES):
+            newlines += chunk.count(b'\n')
+            tail = (tail + chunk)[-2:]
+    # Baris terakhir tanpa newline penutup (UTF-16 LE diakhiri b'\n\x00')
+    if tail and not (tail.endswith(b'\n') or tail == b'\n\x00'):
+        newlines += 1
+    return max(newlines - 1, 0)
+
+
+def iter_csv_rows(path: Path) -> Iterator[tuple[int, dict]]:
+    """Membaca CSV baris per baris tanpa memuat seluruh file ke memori."""
+    with path.open('rb') as raw:
+        sample = raw.read(SNIFF_BYTES)
+    encoding = detect_encoding(sample)
+    delimiter = detect_delimiter(sample.decode(encoding, errors='ignore'))
+
+    try:
+        with path.open('r', encoding=encoding, newline='') as handle:
+            reader = csv.reader(handle, delimiter=delimiter)
+            header = next(reader, None)
+            if header is None:
+                raise ValueError(f"Missing columns. Required: {REQUIRED_COLUMNS}")
+            columns = normalize_columns(header)
+            for values in reader:
+                yield reader.line_num, dict(zip(columns, values))
+    except UnicodeDecodeError as exc:
+        raise ValueError("Tidak dapat membaca file CSV. Gunakan encoding UTF-8 atau UTF-16.") from exc
+
+
+def iter_xlsx_rows(path: Path) -> Iterator[tuple[int, dict]]:
+    """Membaca sheet pertama .xlsx baris per baris dengan openpyxl mode read-only."""
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError(f"Missing columns. Required: {REQUIRED_COLUMNS}")
+        columns = normalize_columns("" if col is None else col for col in header)
+        for row_number, values in enumerate(rows, start=2):
+            yield row_number, dict(zip(columns, values))
+    finally:
+        workbook.close()
+
+
+def iter_excel_rows(path: Path) -> Iterator[tuple[int, pd.Series]]:
+    """Membaca roster Excel format lama (.xls) melalui pandas."""
+    df = pd.read_excel(path)
+    df.columns = normalize_columns(df.columns)
+    for index, row in df.iterrows():
+        yield index + 2, row
+
+
+def iter_roster(path: Path) -> Iterator[tuple[int, object]]:
+    """Menghasilkan pasangan (nomor baris di file, data baris) sesuai jenis file."""
+    suffix = path.suffix.lower()
+    if suffix == '.csv':
+        return iter_csv_rows(path)
+    if suffix == '.xlsx':
+        return iter_xlsx_rows(path)
+    return iter_excel_rows(path)
+
+
+def is_blank_row(row) -> bool:
+    """Menandai baris yang seluruh kolom wajibnya kosong."""
+    return all(safe_str(row.get(field)) == "" for field in REQUIRED_COLUMNS)
+
+
+def resolve_default_tahun_label(db: Session, tahun_ajaran: Optional[str]) -> Optional[str]:
+    """Menentukan label tahun ajaran default untuk riwayat kelas hasil impor."""
+    if tahun_ajaran and tahun_ajaran.strip():
+        return tahun_ajaran.strip()
+    active_year = crud.get_active_tahun_ajaran(db)
+    if active_year:
+        return f"{active_year.tahun}-{active_year.semester}"
+    return None
+
+
+def import_row(db: Session, row, default_tahun_label: Optional[str]) -> str:
+    """Menulis satu baris roster tanpa commit; mengembalikan 'created' atau 'updated'."""
+    nis_value = safe_str(row.get('nis'))
+    if not nis_value:
+        raise ValueError("Kolom NIS tidak boleh kosong")
+
+    status_raw = row.get('status_siswa')
+    if status_raw is None:
+        status_raw = row.get('status')
+    siswa_raw = schemas.SiswaCreate(
+        nis=nis_value,
+        nama=safe_str(row.get('nama')),
+        id_kelas=safe_str(row.get('id_kelas')),
+        angkatan=safe_str(row.get('angkatan')),
+        jenis_kelamin=safe_str(row.get('jeniskelamin')),
+        aktif=parse_bool(row.get('aktif', True)),
+        status_siswa=normalize_status(status_raw),
+    )
+    siswa_data = normalize_siswa_payload(siswa_raw)
+    if not siswa_data.id_kelas:
+        raise ValueError("Kolom id_kelas tidak boleh kosong")
+    raw_tahun = row.get('tahun_ajaran')
+    if safe_str(raw_tahun) == "":
+        raw_tahun = row.get('tahunajaran')
+    tahun_label = safe_str(raw_tahun) or default_tahun_label or siswa_data.angkatan
+
+    existing = crud.get_siswa_by_nis(db, nis=siswa_data.nis)
+    if existing:
+        update_payload = schemas.SiswaUpdate(
+            nama=siswa_data.nama,
+            id_kelas=siswa_data.id_kelas,
+            angkatan=siswa_data.angkatan,
+            jenis_kelamin=siswa_data.jenis_kelamin,
+            aktif=siswa_data.aktif,
+            status_siswa=siswa_data.status_siswa,
+        )
+        crud.update_siswa(db, siswa_data.nis, update_payload, commit=False)
+        outcome = "updated"
+    else:
+        crud.create_siswa(db, siswa_data, commit=False)
+        outcome = "created"
+
+    crud.upsert_riwayat_kelas(
+        db,
+        nis=siswa_data.nis,
+        kelas=siswa_data.id_kelas,
+        tahun_ajaran=tahun_label,
+        commit=False,
+    )
+    return outcome
+
+
+def stage_imported_nis(db: Session, job_id: str, nis_values: set[str]):
+    """Mencatat NIS yang muncul di roster ke tabel staging job (tanpa commit)."""
+    if not nis_values:
+        return
+    existing = {
+        nis
+        for (nis,) in db.query(models.ImportJobNis.nis).filter(
+            models.ImportJobNis.job_id == job_id,
+            models.ImportJobNis.nis.in_(nis_values),
+        )
+    }
+    db.add_all(
+        models.ImportJobNis(job_id=job_id, nis=nis)
+        for nis in nis_values - existing
+    )
+
+
+def clear_staged_nis(db: Session, job_id: str):
+    """Menghapus staging NIS milik job yang sudah selesai (tanpa commit)."""
+    db.query(models.ImportJobNis).filter(models.ImportJobNis.job_id == job_id).delete(
+        synchronize_session=False
+    )
+
+
+def mark_missing_inactive(db: Session, job_id: str) -> dict:
+    """Menandai siswa aktif yang tidak ada di staging roster sebagai pindah (tanpa commit).
+
+    Dijalankan sebagai satu UPDATE ... RETURNING. Aturannya sama dengan
+    ``crud.update_siswa``: siswa yang masih punya pelanggaran belum selesai
+    dilewati, dan siswa yang dinonaktifkan dijadwalkan untuk dihapus permanen.
+    """
+    staged_nis = select(models.ImportJobNis.nis).where(models.ImportJobNis.job_id == job_id)
+    if db.execute(staged_nis.limit(1)).first() is None:
+        return {"deactivated_count": 0, "by_kelas": [], "skipped_count": 0}
+
+    unresolved_nis = select(models.Pelanggaran.nis_siswa).where(
+        models.Pelanggaran.status != schemas.PelanggaranStatus.RESOLVED.value
+    )
+    missing = (
+        models.Siswa.aktif.is_(True),
+        models.Siswa.nis.not_in(staged_nis),
+    )
+
+    skipped_count = (
+        db.query(func.count(models.Siswa.nis))
+        .filter(*missing, models.Siswa.nis.in_(unresolved_nis))
+        .scalar()
+    ) or 0
+
+    deactivated = db.execute(
+        update(models.Siswa)
+        .where(*missing, models.Siswa.nis.not_in(unresolved_nis))
+        .values(
+            aktif=False,
+            status_siswa=schemas.SiswaStatus.PINDAH.value,
+            scheduled_deletion_at=datetime.now(timezone.utc) + crud.SCHEDULED_DELETION_DELAY,
+        )
+        .returning(models.Siswa.nis, models.Siswa.id_kelas)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    per_kelas = Counter(row.id_kelas for row in deactivated)
+    return {
+        "deactivated_count": len(deactivated),
+        "by_kelas": [
+            {"kelas": kelas, "jumlah": jumlah}
+            for kelas, jumlah in sorted(per_kelas.items())
+        ],
+        "skipped_count": skipped_count,
+    }
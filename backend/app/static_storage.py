@@ -0,0 +1,112 @@
+"""Penyajian folder ``storage`` dengan header cache yang sesuai jenis filenya.
+
+Nama file yang memuat hash isi (unggahan berbasis konten di ``uploads`` dan
+file CMS ``<nama>.<hash>.webp`` di ``site_content``) tidak pernah berubah
+isinya, sehingga boleh di-cache selamanya (``immutable``). File lain tetap
+boleh di-cache tetapi wajib divalidasi ulang lewat ETag. ETag selalu strong
+dan berbasis isi file, sehingga sama di semua server. Hash isi dihitung di
+thread saat ``lookup_path`` (bukan di ``file_response`` yang dipanggil
+Starlette langsung di event loop). Permintaan Range ditangani oleh
+``FileResponse`` bawaan Starlette.
+"""
+
+import hashlib
+import os
+import re
+import stat
+import threading
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from . import storage
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Hash versi pada nama file CMS: <nama>.<16 hex>.<ext>
+_VERSIONED_NAME = re.compile(r"\.([0-9a-f]{16,64})\.[a-z0-9]+$")
+_ETAG_CACHE_SIZE = 4096
+
+_etag_cache: dict[tuple[str, int, int], str] = {}
+_etag_cache_lock = threading.Lock()
+
+
+def version_hash(data: bytes) -> str:
+    """Hash versi yang disisipkan ke nama file CMS."""
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _content_digest(full_path: str, stat_result: os.stat_result) -> str:
+    """SHA-256 isi file, di-cache per (path, mtime, ukuran) agar tidak dibaca ulang tiap request."""
+    cache_key = (full_path, stat_result.st_mtime_ns, stat_result.st_size)
+    with _etag_cache_lock:
+        digest = _etag_cache.get(cache_key)
+    if digest is not None:
+        return digest
+    hasher = hashlib.sha256()
+    with open(full_path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(storage.CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+    with _etag_cache_lock:
+        if len(_etag_cache) >= _ETAG_CACHE_SIZE:
+            # Entri tertua dibuang; entri yang baru dihitung request berjalan tetap ada
+            del _etag_cache[next(iter(_etag_cache))]
+        _etag_cache[cache_key] = digest
+    return digest
+
+
+def _cache_policy(path: str) -> tuple[str, str | None]:
+    """(Cache-Control, hash dari nama file bila ada) untuk path relatif di dalam storage."""
+    path = path.replace(os.sep, "/")
+    if path.startswith("uploads/"):
+        key = path[len("uploads/"):]
+        if storage.is_content_key(key):
+            # Bukti siswa: hanya browser yang boleh menyimpan, bukan proxy bersama
+            return f"private, max-age={IMMUTABLE_MAX_AGE}, immutable", key.split("/")[-1][:64]
+        return "private, no-cache", None
+    match = _VERSIONED_NAME.search(path)
+    if match:
+        return f"public, max-age={IMMUTABLE_MAX_AGE}, immutable", match.group(1)
+    return "public, no-cache", None
+
+
+class StorageStaticFiles(StaticFiles):
+    """``StaticFiles`` dengan ETag berbasis isi dan Cache-Control per jenis file."""
+
+    def get_path(self, scope: Scope) -> str:
+        path = super().get_path(scope)
+        parts = path.replace(os.sep, "/").split("/")
+        # File sementara unggahan dan karantina GC (folder berawalan titik) tidak disajikan,
+        # begitu pula roster impor lama yang masih tersisa di storage/imports
+        if parts[0] == "imports" or any(part.startswith(".") for part in parts):
+            raise HTTPException(status_code=404)
+        return path
+
+    def lookup_path(self, path: str) -> tuple[str, os.stat_result | None]:
+        # Dijalankan Starlette di thread: hash isi file (bisa beberapa MB) dihitung
+        # di sini agar file_response cukup mengambilnya dari cache
+        full_path, stat_result = super().lookup_path(path)
+        if stat_result is not None and stat.S_ISREG(stat_result.st_mode) and _cache_policy(path)[1] is None:
+            _content_digest(full_path, stat_result)
+        return full_path, stat_result
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        cache_control, name_digest = _cache_policy(self.get_path(scope))
+
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        digest = name_digest or _content_digest(str(full_path), stat_result)
+        response.headers["etag"] = f'"{digest}"'
+        response.headers["cache-control"] = cache_control
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
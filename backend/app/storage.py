@@ -0,0 +1,297 @@
+"""Penyimpanan file unggahan berbasis konten (content-addressed) di storage/uploads.
+
+File ditulis ke file sementara sambil dihitung SHA-256-nya, lalu dipindahkan
+secara atomik ke ``ab/cd/<sha256><ext>``. Isi yang sama hanya disimpan sekali;
+jumlah kolom database yang merujuk sebuah file dicatat di tabel
+``stored_files`` sehingga file baru dihapus ketika rujukan terakhirnya hilang.
+
+Nilai yang disimpan di kolom bukti adalah *key* relatif terhadap
+``UPLOAD_DIR`` (misal ``3f/a2/3fa2...c9.jpg``), jadi URL publiknya tetap
+``/storage/uploads/<key>``. File lama yang bernama UUID di akar folder tetap
+didukung sebagai key tanpa shard dan tidak ikut dihitung rujukannya.
+
+Unggahan dari klien dibatasi ukurannya (``MAX_UPLOAD_BYTES``) selama streaming
+dan jenisnya ditentukan dari isi file (magic bytes), bukan dari
+``content_type`` atau nama file kiriman klien.
+"""
+
+import hashlib
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Iterable, NamedTuple, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+
+UPLOAD_DIR = Path("storage/uploads")
+TMP_DIR = UPLOAD_DIR / ".tmp"
+CHUNK_SIZE = 1024 * 1024
+# File yang baru ditulis/dipakai ulang tidak dihapus dulu walau rujukannya nol,
+# karena unggahan lain dengan isi sama bisa saja belum commit. Sisanya dibersihkan GC.
+DELETE_GRACE_SECONDS = int(os.getenv("STORAGE_DELETE_GRACE_SECONDS", "300"))
+# Batas ukuran satu file bukti yang diunggah klien
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "10")) * 1024 * 1024
+
+# Tanda awal file (magic bytes) -> ekstensi yang dipakai untuk menyimpannya
+_SIGNATURES = [
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+    (b"BM", ".bmp"),
+    (b"%PDF-", ".pdf"),
+]
+IMAGE_TYPES = frozenset({".jpg", ".png", ".gif", ".bmp", ".webp", ".heic"})
+DOCUMENT_TYPES = frozenset({".pdf"})
+
+_SUFFIX_PATTERN = re.compile(r"^\.[a-z0-9]{1,10}$")
+_CONTENT_KEY_PATTERN = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[a-z0-9]{1,10})?$")
+
+
+class UploadTooLarge(Exception):
+    """Isi unggahan melebihi batas ukuran yang diizinkan."""
+
+
+class UnsupportedFileType(Exception):
+    """Isi unggahan bukan salah satu jenis file yang diizinkan."""
+
+
+class SavedUpload(NamedTuple):
+    """Hasil ``save_stream``: key file dan apakah file tersebut baru dibuat."""
+
+    key: str
+    # False bila isi yang sama sudah tersimpan sebelumnya (deduplikasi)
+    created: bool
+    # mtime file saat dibuat; berubah bila request lain memakai ulang isinya
+    mtime_ns: int
+
+
+def sniff_type(head: bytes) -> Optional[str]:
+    """Ekstensi file berdasarkan beberapa byte pertamanya; None bila tidak dikenali."""
+    for signature, extension in _SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        # Foto bawaan kamera iPhone
+        return ".heic"
+    return None
+
+
+def _clean_suffix(suffix: Optional[str]) -> str:
+    """Ekstensi huruf kecil yang aman dipakai di nama file; selain itu dibuang."""
+    suffix = (suffix or "").lower()
+    return suffix if _SUFFIX_PATTERN.match(suffix) else ""
+
+
+def is_content_key(key: str) -> bool:
+    """True bila key berasal dari penyimpanan berbasis konten (bukan file lama)."""
+    return bool(key) and bool(_CONTENT_KEY_PATTERN.match(key))
+
+
+def path_for(key: str) -> Path:
+    """Path lokal sebuah key; key lama hanya boleh berupa nama file di akar folder."""
+    if is_content_key(key):
+        return UPLOAD_DIR / key
+    return UPLOAD_DIR / Path(key).name
+
+
+def _commit_temp(tmp_path: Path, digest: str, suffix: str) -> SavedUpload:
+    """Memindahkan file sementara ke lokasi shard-nya; duplikat cukup dibuang."""
+    key = f"{digest[:2]}/{digest[2:4]}/{digest}{suffix}"
+    target = UPLOAD_DIR / key
+    if target.exists():
+        tmp_path.unlink(missing_ok=True)
+        # Tandai baru dipakai agar tidak terhapus oleh pelepasan rujukan yang bersamaan
+        os.utime(target)
+        return SavedUpload(key, False, target.stat().st_mtime_ns)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, target)
+    return SavedUpload(key, True, target.stat().st_mtime_ns)
+
+
+def save_stream(
+    fileobj: BinaryIO,
+    suffix: Optional[str] = None,
+    *,
+    max_bytes: Optional[int] = None,
+    allowed_types: Optional[Iterable[str]] = None,
+) -> SavedUpload:
+    """Menyimpan isi stream per chunk tanpa memuat seluruhnya ke memori.
+
+    Dengan ``allowed_types`` jenis file ditentukan dari isinya dan ekstensi key
+    mengikuti hasil deteksi tersebut (``suffix`` kiriman klien diabaikan).
+    Melempar ``UnsupportedFileType`` / ``UploadTooLarge`` sebelum file
+    sementara dipindahkan ke lokasi permanen.
+    """
+    first_chunk = fileobj.read(CHUNK_SIZE)
+    if allowed_types is not None:
+        detected = sniff_type(first_chunk[:32])
+        if detected not in allowed_types:
+            raise UnsupportedFileType("Jenis file tidak didukung")
+        suffix = detected
+
+    TMP_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = TMP_DIR / f"{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with tmp_path.open("wb") as buffer:
+            chunk = first_chunk
+            while chunk:
+                written += len(chunk)
+                if max_bytes is not None and written > max_bytes:
+                    raise UploadTooLarge(f"Ukuran file melebihi {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                buffer.write(chunk)
+                chunk = fileobj.read(CHUNK_SIZE)
+            buffer.flush()
+            os.fsync(buffer.fileno())
+        return _commit_temp(tmp_path, digest.hexdigest(), _clean_suffix(suffix))
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def save_bytes(data: bytes, suffix: Optional[str] = None) -> str:
+    """Menyimpan bytes yang sudah ada di memori (misal hasil kompresi); mengembalikan key-nya."""
+    TMP_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = TMP_DIR / f"{uuid.uuid4().hex}.part"
+    try:
+        with tmp_path.open("wb") as buffer:
+            buffer.write(data)
+            buffer.flush()
+            os.fsync(buffer.fileno())
+        return _commit_temp(tmp_path, hashlib.sha256(data).hexdigest(), _clean_suffix(suffix)).key
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def is_stored(db: Session, key: Optional[str]) -> bool:
+    """True bila ``key`` merujuk file yang benar-benar tersimpan.
+
+    Dipakai untuk memvalidasi key kiriman klien sebelum dirujuk baris baru,
+    agar ``stored_files`` tidak berisi key fiktif.
+    """
+    if not key:
+        return False
+    if is_content_key(key):
+        if db.query(models.StoredFile.key).filter(models.StoredFile.key == key).first():
+            return True
+    elif Path(key).name != key:
+        return False
+    return path_for(key).is_file()
+
+
+def add_refs(db: Session, keys: Iterable[Optional[str]]):
+    """Menambah jumlah rujukan key (satu per kolom yang merujuk) di transaksi pemanggil."""
+    for key in keys:
+        if not is_content_key(key):
+            continue
+        updated = db.execute(
+            update(models.StoredFile)
+            .where(models.StoredFile.key == key)
+            .values(refcount=models.StoredFile.refcount + 1)
+        ).rowcount
+        if updated:
+            continue
+        path = UPLOAD_DIR / key
+        record = models.StoredFile(
+            key=key,
+            sha256=Path(key).name[:64],
+            size=path.stat().st_size if path.exists() else None,
+            refcount=1,
+        )
+        # Savepoint agar bentrok insert dari request lain cukup diulang sebagai update
+        try:
+            with db.begin_nested():
+                db.add(record)
+        except IntegrityError:
+            db.execute(
+                update(models.StoredFile)
+                .where(models.StoredFile.key == key)
+                .values(refcount=models.StoredFile.refcount + 1)
+            )
+
+
+def release_refs(db: Session, keys: Iterable[Optional[str]]) -> list[str]:
+    """Mengurangi rujukan; mengembalikan key yang boleh dihapus setelah transaksi commit.
+
+    Key lama (tanpa shard) tidak pernah dipakai bersama sehingga langsung dikembalikan.
+    """
+    removable = []
+    for key in keys:
+        if not key:
+            continue
+        if not is_content_key(key):
+            removable.append(key)
+            continue
+        db.execute(
+            update(models.StoredFile)
+            .where(models.StoredFile.key == key)
+            .values(refcount=models.StoredFile.refcount - 1)
+        )
+        deleted = db.execute(
+            delete(models.StoredFile).where(
+                models.StoredFile.key == key, models.StoredFile.refcount <= 0
+            )
+        ).rowcount
+        if deleted:
+            removable.append(key)
+    return removable
+
+
+def delete_files(db: Session, keys: Iterable[str]):
+    """Menghapus file yang rujukannya sudah nol; dipanggil setelah commit.
+
+    File yang masih punya baris ``stored_files`` atau baru saja ditulis ulang
+    (dalam ``DELETE_GRACE_SECONDS``) dilewati dan diserahkan ke GC.
+    """
+    now = time.time()
+    for key in keys:
+        if not key:
+            continue
+        if is_content_key(key) and (
+            db.query(models.StoredFile.key).filter(models.StoredFile.key == key).first()
+        ):
+            continue
+        path = path_for(key)
+        try:
+            if is_content_key(key) and now - path.stat().st_mtime < DELETE_GRACE_SECONDS:
+                continue
+            path.unlink(missing_ok=True)
+        except FileNotFoundError:
+            continue
+        except OSError as exc:
+            print(f"Storage: gagal menghapus file {key}: {exc}")
+
+
+def discard_upload(db: Session, upload: SavedUpload):
+    """Membuang file unggahan milik request yang gagal; dipanggil setelah rollback.
+
+    File yang dibuat request ini, belum dirujuk baris mana pun, dan belum
+    dipakai ulang request lain (mtime tidak berubah) langsung dihapus tanpa
+    menunggu ``DELETE_GRACE_SECONDS``. Selain itu ditangani ``delete_files``.
+    """
+    if not upload.created:
+        delete_files(db, [upload.key])
+        return
+    if db.query(models.StoredFile.key).filter(models.StoredFile.key == upload.key).first():
+        return
+    path = path_for(upload.key)
+    try:
+        if path.stat().st_mtime_ns != upload.mtime_ns:
+            return
+        path.unlink()
+    except FileNotFoundError:
+        return
+    except OSError as exc:
+        print(f"Storage: gagal menghapus file {upload.key}: {exc}")
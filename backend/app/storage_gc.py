@@ -0,0 +1,285 @@
+"""Garbage collection file yatim di storage/uploads dan storage/site_content.
+
+File yang tidak dirujuk kolom database mana pun (misal tertinggal karena siswa
+dihapus bertingkat, unggahan yang gagal di tengah jalan, atau versi lama
+gambar CMS) tidak langsung dihapus. Putaran GC memindahkannya ke folder
+karantina dengan path relatif yang sama; baru setelah masa karantina lewat
+file dihapus permanen. File karantina yang ternyata dirujuk lagi dikembalikan.
+
+Folder dibaca secara streaming dengan ``os.scandir`` sehingga jumlah file
+tidak memengaruhi pemakaian memori; yang dimuat hanya himpunan path yang
+dirujuk database.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from . import models, storage
+
+STORAGE_ROOT = Path("storage")
+QUARANTINE_DIR = STORAGE_ROOT / ".quarantine"
+# Folder yang diperiksa GC beserta path lokalnya
+AREAS = {
+    "uploads": storage.UPLOAD_DIR,
+    "site_content": STORAGE_ROOT / "site_content",
+}
+# File yang lebih muda dari ini tidak disentuh: barisnya mungkin belum commit
+GC_MIN_AGE_SECONDS = int(os.getenv("STORAGE_GC_MIN_AGE_HOURS", "24")) * 3600
+# Lama file berada di karantina sebelum dihapus permanen
+GC_QUARANTINE_SECONDS = int(os.getenv("STORAGE_GC_QUARANTINE_DAYS", "7")) * 86400
+# File sementara unggahan (.part) yang tertinggal karena proses mati di tengah jalan
+GC_TMP_MAX_AGE_SECONDS = int(os.getenv("STORAGE_GC_TMP_MAX_AGE_HOURS", "6")) * 3600
+SAMPLE_SIZE = 20
+
+# Kolom bukti yang berisi key relatif terhadap storage/uploads
+_UPLOAD_COLUMNS = [
+    models.Pelanggaran.bukti_foto,
+    models.Pelanggaran.bukti_foto_original,
+    models.Pelanggaran.bukti_foto_thumbnail,
+    models.Prestasi.bukti,
+    models.Prestasi.bukti_original,
+    models.Prestasi.bukti_thumbnail,
+]
+_SITE_CONTENT_PREFIX = "storage/site_content/"
+
+
+def _walk(root: Path) -> Iterator[tuple[str, os.DirEntry]]:
+    """Menelusuri file di bawah ``root`` tanpa mengikuti symlink maupun folder tersembunyi.
+
+    Menghasilkan ``(path_relatif_posix, entry)``.
+    """
+    stack = [(root, "")]
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    relative = f"{prefix}{entry.name}"
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((Path(entry.path), f"{relative}/"))
+                    elif entry.is_file(follow_symlinks=False):
+                        yield relative, entry
+        except FileNotFoundError:
+            continue
+
+
+def _upload_key(value: Optional[str]) -> Optional[str]:
+    """Path relatif di storage/uploads untuk nilai kolom bukti (key baru maupun nama file lama)."""
+    if not value:
+        return None
+    if storage.is_content_key(value):
+        return value
+    return Path(value).name
+
+
+def _site_content_name(url: Optional[str]) -> Optional[str]:
+    """Path relatif di storage/site_content untuk URL gambar CMS; URL lain diabaikan."""
+    if not url:
+        return None
+    clean_url = url.lstrip("/")
+    if not clean_url.startswith(_SITE_CONTENT_PREFIX):
+        return None
+    return clean_url[len(_SITE_CONTENT_PREFIX):]
+
+
+def _variant_urls(variants) -> list:
+    """URL seluruh varian dari kolom JSON / nilai config berformat JSON."""
+    if isinstance(variants, str):
+        try:
+            variants = json.loads(variants) if variants else []
+        except ValueError:
+            return []
+    return [variant.get("url") for variant in variants or [] if isinstance(variant, dict)]
+
+
+def load_referenced_paths(db: Session) -> dict[str, set]:
+    """Himpunan path relatif per area yang masih dirujuk database."""
+    uploads = set()
+    for column in _UPLOAD_COLUMNS:
+        query = db.query(column).filter(column.isnot(None)).yield_per(1000)
+        for (value,) in query:
+            key = _upload_key(value)
+            if key:
+                uploads.add(key)
+
+    urls = []
+    for url, variants in db.query(models.SiteGallery.image_url, models.SiteGallery.variants):
+        urls.append(url)
+        urls.extend(_variant_urls(variants))
+    for url, variants in db.query(models.DashboardCarousel.url, models.DashboardCarousel.variants):
+        urls.append(url)
+        urls.extend(_variant_urls(variants))
+    for key, value in db.query(models.SystemConfig.key, models.SystemConfig.value).filter(
+        models.SystemConfig.key.in_(["hero_image_url", "hero_image_variants"])
+    ):
+        if key == "hero_image_variants":
+            urls.extend(_variant_urls(value))
+        else:
+            urls.append(value)
+    site_content = {name for name in map(_site_content_name, urls) if name}
+
+    return {"uploads": uploads, "site_content": site_content}
+
+
+def _new_report(dry_run: bool) -> dict:
+    return {
+        "dry_run": dry_run,
+        "scanned_files": 0,
+        "scanned_bytes": 0,
+        "referenced_files": 0,
+        "quarantined_files": 0,
+        "quarantined_bytes": 0,
+        "restored_files": 0,
+        "deleted_files": 0,
+        "reclaimed_bytes": 0,
+        "temp_files_deleted": 0,
+        "quarantined_samples": [],
+        "deleted_samples": [],
+        "completed": True,
+    }
+
+
+def _sample(report: dict, field: str, value: str):
+    if len(report[field]) < SAMPLE_SIZE:
+        report[field].append(value)
+
+
+def _quarantine_orphans(referenced: dict, report: dict, dry_run: bool, should_stop) -> bool:
+    """Memindahkan file yatim yang sudah cukup tua ke karantina; False bila dihentikan."""
+    now = time.time()
+    for area, root in AREAS.items():
+        area_refs = referenced[area]
+        for relative, entry in _walk(root):
+            if should_stop and should_stop():
+                return False
+            try:
+                stat_result = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            report["scanned_files"] += 1
+            report["scanned_bytes"] += stat_result.st_size
+            if relative in area_refs:
+                report["referenced_files"] += 1
+                continue
+            # Unggahan yang masih berjalan atau isi yang baru dipakai ulang (mtime disentuh)
+            if now - stat_result.st_mtime < GC_MIN_AGE_SECONDS:
+                continue
+            report["quarantined_files"] += 1
+            report["quarantined_bytes"] += stat_result.st_size
+            _sample(report, "quarantined_samples", f"{area}/{relative}")
+            if dry_run:
+                continue
+            target = QUARANTINE_DIR / area / relative
+            try:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(entry.path, target)
+                # Waktu masuk karantina dicatat sebagai mtime file
+                os.utime(target)
+            except OSError as exc:
+                print(f"Storage GC: gagal mengkarantina {area}/{relative}: {exc}")
+    return True
+
+
+def _purge_quarantine(db: Session, referenced: dict, report: dict, dry_run: bool, should_stop) -> bool:
+    """Menghapus file karantina yang masa tunggunya lewat, atau mengembalikan yang dirujuk lagi."""
+    now = time.time()
+    for area, root in AREAS.items():
+        area_refs = referenced[area]
+        for relative, entry in _walk(QUARANTINE_DIR / area):
+            if should_stop and should_stop():
+                return False
+            try:
+                stat_result = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if relative in area_refs:
+                # Baris yang merujuk dipulihkan atau isi yang sama diunggah ulang
+                report["restored_files"] += 1
+                if dry_run:
+                    continue
+                original = root / relative
+                try:
+                    if original.exists():
+                        os.unlink(entry.path)
+                    else:
+                        original.parent.mkdir(parents=True, exist_ok=True)
+                        os.replace(entry.path, original)
+                except OSError as exc:
+                    print(f"Storage GC: gagal memulihkan {area}/{relative}: {exc}")
+                continue
+            if now - stat_result.st_mtime < GC_QUARANTINE_SECONDS:
+                continue
+            report["deleted_files"] += 1
+            report["reclaimed_bytes"] += stat_result.st_size
+            _sample(report, "deleted_samples", f"{area}/{relative}")
+            if dry_run:
+                continue
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                continue
+            except OSError as exc:
+                print(f"Storage GC: gagal menghapus {area}/{relative}: {exc}")
+                continue
+            if area == "uploads" and storage.is_content_key(relative):
+                # Hitungan rujukan yang melenceng (misal baris terhapus bertingkat)
+                db.execute(delete(models.StoredFile).where(models.StoredFile.key == relative))
+    return True
+
+
+def _sweep_temp_files(report: dict, dry_run: bool):
+    """Menghapus file .part yang tertinggal di folder sementara unggahan."""
+    if not storage.TMP_DIR.exists():
+        return
+    cutoff = time.time() - GC_TMP_MAX_AGE_SECONDS
+    for entry in os.scandir(storage.TMP_DIR):
+        if not entry.is_file(follow_symlinks=False):
+            continue
+        try:
+            stat_result = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            continue
+        if stat_result.st_mtime > cutoff:
+            continue
+        report["temp_files_deleted"] += 1
+        report["reclaimed_bytes"] += stat_result.st_size
+        if not dry_run:
+            Path(entry.path).unlink(missing_ok=True)
+
+
+def collect_garbage(
+    db: Session,
+    dry_run: bool = False,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> dict:
+    """Satu putaran GC: karantina file yatim, hapus karantina lama, bersihkan file sementara.
+
+    Dengan ``dry_run`` tidak ada file yang dipindah/dihapus; laporan berisi apa
+    yang akan terjadi beserta jumlah byte yang akan dibebaskan.
+    """
+    report = _new_report(dry_run)
+    referenced = load_referenced_paths(db)
+    # Lepas koneksi selama penelusuran folder yang bisa lama
+    db.rollback()
+
+    if not _quarantine_orphans(referenced, report, dry_run, should_stop):
+        report["completed"] = False
+        return report
+    # Muat ulang: baris baru mungkin sudah merujuk file yang barusan dikarantina
+    referenced = load_referenced_paths(db)
+    completed = _purge_quarantine(db, referenced, report, dry_run, should_stop)
+    if not dry_run:
+        db.commit()
+    if not completed:
+        report["completed"] = False
+        return report
+    _sweep_temp_files(report, dry_run)
+    return report
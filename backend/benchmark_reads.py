@@ -0,0 +1,118 @@
+"""Benchmark throughput endpoint baca pada beberapa tingkat konkurensi klien.
+
+Contoh (server sudah berjalan, token admin/wali dari /api/auth/login):
+
+    python benchmark_reads.py --base-url http://127.0.0.1:8000 --token <JWT> \\
+        --concurrency 50 200 500 --duration 20
+
+Klien dijalankan di beberapa proses (``--processes``) agar generator beban
+sendiri tidak menjadi batas. Membutuhkan paket ``httpx``.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import time
+
+import httpx
+
+DEFAULT_PATHS = [
+    "/api/siswa/search/a",
+    "/api/master-data/kelas",
+    "/api/master-data/jenis-pelanggaran",
+    "/api/master-data/tahun-ajaran",
+    "/api/cms/stats",
+    "/api/cms/landing-page",
+    "/api/cms/dashboard-carousel",
+]
+
+
+async def _run_clients(base_url, token, paths, clients, duration, timeout):
+    """Menjalankan ``clients`` klien paralel selama ``duration`` detik."""
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=timeout) as client:
+        async def worker(offset):
+            nonlocal errors
+            index = offset
+            while time.perf_counter() < deadline:
+                path = paths[index % len(paths)]
+                index += 1
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(worker(offset) for offset in range(clients)))
+    return latencies, errors
+
+
+def _process_main(args):
+    return asyncio.run(_run_clients(*args))
+
+
+def run_level(base_url, token, paths, concurrency, duration, processes, timeout) -> dict:
+    """Satu putaran benchmark pada tingkat konkurensi ``concurrency``."""
+    processes = max(1, min(processes, concurrency))
+    shares = [concurrency // processes + (1 if i < concurrency % processes else 0) for i in range(processes)]
+    jobs = [(base_url, token, paths, share, duration, timeout) for share in shares]
+    started = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(_process_main, jobs)
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for result, _ in results for latency in result)
+    errors = sum(error for _, error in results)
+
+    def percentile(fraction):
+        if not latencies:
+            return None
+        return round(latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000, 1)
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", default="", help="JWT Bearer untuk endpoint yang butuh login")
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[50, 200, 500])
+    parser.add_argument("--duration", type=float, default=20, help="Lama tiap putaran (detik)")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    print(f"{'klien':>6} {'request':>8} {'error':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for concurrency in args.concurrency:
+        result = run_level(
+            args.base_url, args.token, args.paths, concurrency, args.duration, args.processes, args.timeout
+        )
+        print(
+            f"{result['concurrency']:>6} {result['requests']:>8} {result['errors']:>6} {result['rps']:>8} "
+            f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
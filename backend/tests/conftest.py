@@ -0,0 +1,57 @@
+"""Fixture pytest: aplikasi dijalankan di atas database SQLite sementara.
+
+Variabel lingkungan dipasang sebelum paket ``app`` diimpor, karena engine
+database, kunci JWT, dan direktori storage (relatif terhadap direktori kerja)
+dibaca saat import.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+WORK_DIR = Path(tempfile.mkdtemp(prefix="pembinaan-test-"))
+
+os.environ["DATABASE_URL"] = f"sqlite:///{WORK_DIR / 'test.db'}"
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("IMPORT_POLL_INTERVAL", "1")
+sys.path.insert(0, str(BACKEND_DIR))
+os.chdir(WORK_DIR)
+
+ADMIN_NIP = "100"
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient dengan event startup (worker impor, cache bus, dll.) berjalan."""
+    from fastapi.testclient import TestClient
+
+    from app import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    """Header Authorization milik akun admin uji."""
+    from app import auth_utils, crud, schemas
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        crud.create_user(
+            db,
+            schemas.UserCreate(
+                nip=ADMIN_NIP,
+                email="admin@example.com",
+                full_name="Admin Uji",
+                password="rahasia",
+                role=schemas.UserRole.ADMIN,
+            ),
+        )
+    token = auth_utils.create_access_token({"sub": ADMIN_NIP})
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,51 @@
+"""Statistik dashboard yang lambat tidak boleh menahan request lain di worker yang sama."""
+
+import threading
+import time
+
+from app import crud
+
+DASHBOARD_SECONDS = 0.5
+DASHBOARD_CLIENTS = 4
+# Endpoint async ringan; bila dashboard berjalan di event loop, request ini
+# ikut menunggu sampai seluruh dashboard selesai (>= 2 s)
+LIGHT_PATH = "/api/master-data/tahun-ajaran"
+MAX_LIGHT_SECONDS = 0.4
+
+
+def test_dashboard_stats_do_not_block_the_event_loop(client, admin_headers, monkeypatch):
+    get_dashboard_stats = crud.get_dashboard_stats
+
+    def slow_dashboard_stats(*args, **kwargs):
+        # Menirukan agregasi Python yang berat: memblokir thread pemanggil
+        time.sleep(DASHBOARD_SECONDS)
+        return get_dashboard_stats(*args, **kwargs)
+
+    monkeypatch.setattr(crud, "get_dashboard_stats", slow_dashboard_stats)
+    assert client.get(LIGHT_PATH, headers=admin_headers).status_code == 200
+
+    statuses: list[int] = []
+    stop = threading.Event()
+
+    def dashboard_client():
+        while not stop.is_set():
+            statuses.append(client.get("/api/dashboard/stats", headers=admin_headers).status_code)
+
+    threads = [threading.Thread(target=dashboard_client) for _ in range(DASHBOARD_CLIENTS)]
+    for thread in threads:
+        thread.start()
+    try:
+        time.sleep(DASHBOARD_SECONDS / 2)
+        latencies = []
+        for _ in range(10):
+            started = time.perf_counter()
+            response = client.get(LIGHT_PATH, headers=admin_headers)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert statuses and set(statuses) == {200}
+    assert max(latencies) < MAX_LIGHT_SECONDS, f"request terlama {max(latencies):.2f} s"
@@ -0,0 +1,163 @@
+"""Outbox email dijalankan worker sungguhan terhadap server SMTP tiruan di dalam proses.
+
+``smtplib.SMTP`` diganti stub yang mencatat login dan pesan, sehingga jalur
+enqueue -> klaim worker -> pool SMTP -> status akhir teruji tanpa jaringan.
+"""
+
+import json
+import smtplib
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app import email_outbox, email_service, models, schemas
+from app.database import SessionLocal
+
+SMTP_USERNAME = "apikey"
+SMTP_SECRET = "smtp-rahasia-uji"
+
+
+@pytest.fixture
+def smtp_stub(client, monkeypatch):
+    """Server SMTP tiruan; ``fail_with`` diisi exception untuk mensimulasikan penolakan server."""
+    stub = SimpleNamespace(logins=[], messages=[], fail_with=None)
+
+    class _StubSMTP:
+        def __init__(self, host, port, timeout=None):
+            pass
+
+        def starttls(self):
+            pass
+
+        def login(self, username, password):
+            stub.logins.append((username, password))
+
+        def send_message(self, message):
+            if stub.fail_with is not None:
+                raise stub.fail_with
+            stub.messages.append(message)
+
+        def noop(self):
+            return 250, b"OK"
+
+        def quit(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(email_service.smtplib, "SMTP", _StubSMTP)
+    monkeypatch.setattr(email_service, "SMTP_USERNAME", SMTP_USERNAME)
+    monkeypatch.setattr(email_service, "SMTP_PASSWORD", SMTP_SECRET)
+    monkeypatch.setattr(email_service, "smtp_pool", email_service.SMTPConnectionPool(1, 60))
+    # Jitter backoff dimatikan agar jadwal percobaan ulang bisa dicek persis
+    monkeypatch.setattr(email_outbox, "random", SimpleNamespace(uniform=lambda low, high: 1.0))
+    return stub
+
+
+def _violation(recipient: str, student_name: str) -> dict:
+    return dict(
+        recipient_email=recipient,
+        student_name=student_name,
+        student_class="X-1",
+        violation_name="Terlambat",
+        incident_date="01 Juli 2026, 07:15",
+        reporter_name="Guru Piket",
+        detail="Datang setelah bel masuk",
+    )
+
+
+def _wait_for_worker(recipients: set[str], timeout: float = 20) -> list[models.EmailOutbox]:
+    """Membangunkan worker outbox sampai semua baris penerima ini sudah dicoba minimal sekali."""
+    deadline = time.monotonic() + timeout
+    while True:
+        email_outbox.notify_worker()
+        with SessionLocal() as db:
+            rows = db.query(models.EmailOutbox).filter(models.EmailOutbox.recipient.in_(recipients)).all()
+            db.expunge_all()
+        if rows and all(
+            row.attempts and row.status != schemas.EmailOutboxStatus.SENDING.value for row in rows
+        ):
+            return rows
+        assert time.monotonic() < deadline, "worker outbox tidak memproses email"
+        time.sleep(0.1)
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """SQLite mengembalikan datetime naive (UTC)."""
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def test_backoff_schedule_doubles_up_to_the_cap(smtp_stub):
+    delays = [email_outbox.backoff_delay(attempts).total_seconds() for attempts in range(1, 9)]
+    assert delays == [30, 60, 120, 240, 480, 960, 1920, 3600]
+
+
+def test_violation_digest_is_sent_once_per_recipient(smtp_stub, monkeypatch):
+    monkeypatch.setattr(email_outbox, "VIOLATION_DIGEST_WINDOW", timedelta(seconds=1))
+    with SessionLocal() as db:
+        for student_name in ("Siswa A", "Siswa B", "Siswa C"):
+            email_outbox.enqueue(db, "violation", **_violation("wali.a@example.com", student_name))
+        email_outbox.enqueue(db, "violation", **_violation("wali.b@example.com", "Siswa D"))
+        db.commit()
+
+    rows = _wait_for_worker({"wali.a@example.com", "wali.b@example.com"})
+
+    assert {row.status for row in rows} == {schemas.EmailOutboxStatus.SENT.value}
+    assert all(row.payload is None for row in rows)
+    sent = {message["To"]: message["Subject"] for message in smtp_stub.messages}
+    assert len(smtp_stub.messages) == 2
+    assert sent["wali.a@example.com"] == "Ringkasan 3 Laporan Pelanggaran Siswa"
+    assert sent["wali.b@example.com"].startswith("Laporan Pelanggaran Siswa - Siswa D")
+    # Kedua email memakai satu koneksi pool yang sama
+    assert smtp_stub.logins == [(SMTP_USERNAME, SMTP_SECRET)]
+
+
+def test_temporary_failure_is_retried_with_backoff(smtp_stub):
+    smtp_stub.fail_with = smtplib.SMTPResponseException(451, b"Coba lagi nanti")
+    with SessionLocal() as db:
+        email_outbox.enqueue(db, "violation", **_violation("wali.c@example.com", "Siswa E"))
+        db.commit()
+    started = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    [row] = _wait_for_worker({"wali.c@example.com"})
+
+    assert row.status == schemas.EmailOutboxStatus.PENDING.value
+    assert row.attempts == 1
+    assert row.last_error.startswith("SMTPResponseException")
+    retry_in = (_naive_utc(row.next_attempt_at) - started).total_seconds()
+    assert 30 - 5 <= retry_in <= 30 + 5
+    assert smtp_stub.messages == []
+
+
+def test_dead_letter_drops_credentials(smtp_stub, client, admin_headers):
+    raw_password = "Awal-Rahasia-123"
+    smtp_stub.fail_with = smtplib.SMTPRecipientsRefused({"guru.baru@example.com": (550, b"Mailbox tidak ada")})
+    with SessionLocal() as db:
+        email_outbox.enqueue(
+            db,
+            "account",
+            recipient_email="guru.baru@example.com",
+            nip="200",
+            login_email="guru.baru@example.com",
+            raw_password=raw_password,
+            full_name="Guru Baru",
+        )
+        db.commit()
+
+    [row] = _wait_for_worker({"guru.baru@example.com"})
+
+    assert row.status == schemas.EmailOutboxStatus.DEAD.value
+    payload = json.loads(row.payload)
+    assert "raw_password" not in payload
+    assert payload["nip"] == "200"
+
+    response = client.get("/api/email-outbox/status", headers=admin_headers)
+    assert response.status_code == 200
+    [dead] = [item for item in response.json()["dead_letters"] if item["id"] == str(row.id)]
+    assert "payload" not in dead
+    assert dead["last_error"].startswith("SMTPRecipientsRefused")
+    assert raw_password not in response.text
+    assert SMTP_SECRET not in response.text
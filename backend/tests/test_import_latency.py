@@ -0,0 +1,84 @@
+"""Endpoint baca tetap responsif selama impor CSV siswa berjalan di latar belakang."""
+
+import threading
+import time
+
+import pytest
+
+KELAS = ["X-1", "X-2", "X-3", "X-4"]
+IMPORT_ROWS = 1000
+READERS = 8
+READ_PATHS = ["/api/master-data/kelas", "/api/siswa/?limit=50", "/api/cms/landing-page"]
+# Satu GET normalnya puluhan milidetik; batas ini jauh di bawah lama impor,
+# sehingga request yang tertahan sampai impor selesai tetap terdeteksi
+MAX_READ_SECONDS = 2.0
+IMPORT_TIMEOUT_SECONDS = 120
+
+
+@pytest.fixture(scope="module")
+def master_kelas(client):
+    """Kelas tujuan roster; impor menolak kelas yang belum ada di master data."""
+    from app import crud, models, schemas
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        db.add(models.TahunAjaran(tahun="2025/2026", semester="1", is_active=True))
+        db.commit()
+        for nama in KELAS:
+            crud.create_kelas(db, schemas.KelasCreate(nama_kelas=nama, tingkat="X"))
+
+
+def _roster_csv(rows: int) -> bytes:
+    lines = ["nis,nama,id_kelas,angkatan,jeniskelamin"]
+    lines += [f"{10000 + i},Siswa {i},{KELAS[i % len(KELAS)]},2025,{'LP'[i % 2]}" for i in range(rows)]
+    return "\n".join(lines).encode()
+
+
+def test_reads_stay_responsive_during_csv_import(client, admin_headers, master_kelas):
+    response = client.post(
+        "/api/siswa/upload-csv",
+        files={"file": ("roster.csv", _roster_csv(IMPORT_ROWS), "text/csv")},
+        headers=admin_headers,
+    )
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    latencies: list[float] = []
+    failures: list[str] = []
+    stop = threading.Event()
+
+    def reader(offset: int):
+        index = offset
+        while not stop.is_set():
+            path = READ_PATHS[index % len(READ_PATHS)]
+            index += 1
+            started = time.perf_counter()
+            result = client.get(path, headers=admin_headers)
+            latencies.append(time.perf_counter() - started)
+            if result.status_code != 200:
+                failures.append(f"{path}: {result.status_code}")
+
+    threads = [threading.Thread(target=reader, args=(offset,)) for offset in range(READERS)]
+    for thread in threads:
+        thread.start()
+
+    reads_while_running = 0
+    deadline = time.monotonic() + IMPORT_TIMEOUT_SECONDS
+    try:
+        while time.monotonic() < deadline:
+            job = client.get(f"/api/siswa/upload-jobs/{job_id}", headers=admin_headers).json()
+            if job["status"] == "running":
+                reads_while_running = len(latencies)
+            if job["status"] in ("completed", "failed"):
+                break
+            time.sleep(0.1)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert job["status"] == "completed", job
+    assert job["created_count"] == IMPORT_ROWS, job["errors"][:5]
+    assert not failures, failures[:5]
+    assert reads_while_running > 0, "tidak ada GET yang selesai selama impor berjalan"
+    assert max(latencies) < MAX_READ_SECONDS, f"GET terlama {max(latencies):.2f} s"
@@ -0,0 +1,46 @@
+"""Job yang query-nya dibatalkan statement_timeout dicatat sebagai timeout, bukan failed."""
+
+from datetime import timedelta
+
+from sqlalchemy.exc import OperationalError
+
+from app import maintenance
+from app.database import SessionLocal
+
+
+class _QueryCanceled(Exception):
+    """Tiruan psycopg2.errors.QueryCanceled (SQLSTATE 57014)."""
+
+    pgcode = "57014"
+
+
+def _canceled_job(ctx):
+    raise OperationalError("SELECT pg_sleep(3)", {}, _QueryCanceled("canceling statement due to statement timeout"))
+
+
+def _broken_job(ctx):
+    raise RuntimeError("boom")
+
+
+def _run(name, func):
+    job = maintenance.register(name, func, "@hourly", max_runtime_seconds=1)
+    job.registered_at -= timedelta(hours=2)
+    maintenance.run_job(job, "test")
+    with SessionLocal() as db:
+        return maintenance.last_run(db, name).status, {
+            metrics["name"]: metrics for metrics in maintenance.get_job_metrics(db)
+        }[name]
+
+
+def test_statement_timeout_is_recorded_as_timeout(client):
+    try:
+        status, metrics = _run("test_canceled_job", _canceled_job)
+        assert status == maintenance.RUN_TIMEOUT
+        assert (metrics["timeout_runs"], metrics["failed_runs"]) == (1, 0)
+
+        status, metrics = _run("test_broken_job", _broken_job)
+        assert status == maintenance.RUN_FAILED
+        assert (metrics["timeout_runs"], metrics["failed_runs"]) == (0, 1)
+    finally:
+        maintenance._jobs.pop("test_canceled_job", None)
+        maintenance._jobs.pop("test_broken_job", None)
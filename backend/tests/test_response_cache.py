@@ -0,0 +1,40 @@
+"""Snapshot cache tetap bisa dipakai dari event loop yang berbeda."""
+
+import asyncio
+
+from pydantic import BaseModel
+
+from app.response_cache import SnapshotCache
+
+
+class _Payload(BaseModel):
+    value: int
+
+
+class _FakeAsyncSession:
+    """Pengganti AsyncSession: ``run_sync`` memberi kesempatan request lain antre di lock."""
+
+    def __init__(self):
+        self.builds = 0
+
+    async def run_sync(self, fn):
+        self.builds += 1
+        await asyncio.sleep(0.05)
+        return fn(None)
+
+
+async def _burst(cache: SnapshotCache, db: _FakeAsyncSession):
+    return await asyncio.gather(*(cache.get("snapshot", db, lambda _s: _Payload(value=1)) for _ in range(5)))
+
+
+def test_snapshot_lock_is_usable_from_a_new_event_loop():
+    cache = SnapshotCache()
+    db = _FakeAsyncSession()
+
+    asyncio.run(_burst(cache, db))
+    cache.invalidate("snapshot")
+    # Loop kedua (mis. TestClient baru) menunggu lock yang sama
+    snapshots = asyncio.run(_burst(cache, db))
+
+    assert db.builds == 2
+    assert {snapshot.body for snapshot in snapshots} == {b'{"value":1}'}
@@ -0,0 +1,81 @@
+"""Pembaca roster (CSV streaming, .xlsx openpyxl read-only) tidak memuat seluruh file ke memori.
+
+Hanya tahap parse yang diukur (``estimate_row_count`` + ``iter_roster``), sama
+seperti tahap yang dipakai worker impor sebelum menulis batch ke database.
+Batas waktu sengaja longgar agar stabil di mesin CI yang lambat; sebagai
+pembanding, ``pandas.read_excel`` + ``iterrows`` untuk sheet yang sama
+memuncak di kisaran 8 MB.
+"""
+
+import time
+import tracemalloc
+from pathlib import Path
+
+from openpyxl import Workbook
+
+from app import siswa_import
+
+HEADER = ["nis", "nama", "id_kelas", "angkatan", "jeniskelamin"]
+MAX_PEAK_BYTES = 4 * 1024 * 1024
+
+
+def _roster_row(index: int) -> list:
+    return [str(100000 + index), f"Siswa Nomor {index % 500}", f"X-{index % 10 + 1}", "2025", "LP"[index % 2]]
+
+
+def _write_csv(path: Path, rows: int) -> Path:
+    with path.open("w", encoding="utf-8", newline="") as handle:
+        handle.write(",".join(HEADER) + "\n")
+        for index in range(rows):
+            handle.write(",".join(_roster_row(index)) + "\n")
+    return path
+
+
+def _write_xlsx(path: Path, rows: int) -> Path:
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADER)
+    for index in range(rows):
+        sheet.append(_roster_row(index))
+    workbook.save(path)
+    return path
+
+
+def _parse(path: Path) -> int:
+    siswa_import.estimate_row_count(path)
+    return sum(1 for _ in siswa_import.iter_roster(path))
+
+
+def _measure(path: Path) -> tuple[int, float, int]:
+    """(jumlah baris, durasi tanpa tracemalloc, puncak alokasi Python)."""
+    started = time.perf_counter()
+    rows = _parse(path)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        _parse(path)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return rows, elapsed, peak
+
+
+def test_large_csv_is_parsed_in_bounded_memory(tmp_path):
+    small_rows, _, small_peak = _measure(_write_csv(tmp_path / "kecil.csv", 20_000))
+    large = _write_csv(tmp_path / "besar.csv", 200_000)
+    rows, elapsed, peak = _measure(large)
+
+    assert (small_rows, rows) == (20_000, 200_000)
+    # Puncak memori tidak ikut naik 10x bersama jumlah baris, dan jauh di bawah ukuran file
+    assert peak < MAX_PEAK_BYTES < large.stat().st_size
+    assert peak < small_peak + 1024 * 1024
+    assert elapsed < 10
+
+
+def test_large_xlsx_is_parsed_in_bounded_memory(tmp_path):
+    rows, elapsed, peak = _measure(_write_xlsx(tmp_path / "besar.xlsx", 5_000))
+
+    assert rows == 5_000
+    assert peak < MAX_PEAK_BYTES
+    assert elapsed < 15
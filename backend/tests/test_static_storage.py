@@ -0,0 +1,47 @@
+"""Penyajian /storage: roster impor tidak bisa diunduh, ETag isi dihitung di luar event loop."""
+
+import asyncio
+import hashlib
+from pathlib import Path
+
+from app import import_jobs, static_storage
+
+
+def test_import_files_are_outside_public_storage():
+    assert Path("storage").resolve() not in import_jobs.IMPORT_DIR.resolve().parents
+
+
+def test_legacy_import_files_are_not_served(client):
+    legacy = Path("storage/imports")
+    legacy.mkdir(parents=True, exist_ok=True)
+    (legacy / "roster.csv").write_text("nis,nama\n1,Siswa\n")
+
+    assert client.get("/storage/imports/roster.csv").status_code == 404
+
+
+def test_content_etag_is_hashed_off_the_event_loop(client, monkeypatch):
+    data = b"template" * 100_000
+    target = Path("storage/templates/template_siswa.xlsx")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(data)
+
+    sha256 = hashlib.sha256
+    hashed_on_loop = []
+
+    def spy(*args):
+        try:
+            asyncio.get_running_loop()
+            hashed_on_loop.append(True)
+        except RuntimeError:
+            hashed_on_loop.append(False)
+        return sha256(*args)
+
+    monkeypatch.setattr(static_storage.hashlib, "sha256", spy)
+    response = client.get("/storage/templates/template_siswa.xlsx")
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"{sha256(data).hexdigest()}"'
+    assert hashed_on_loop == [False]
+
+    cached = client.get("/storage/templates/template_siswa.xlsx", headers={"if-none-match": response.headers["etag"]})
+    assert cached.status_code == 304
+    assert hashed_on_loop == [False]
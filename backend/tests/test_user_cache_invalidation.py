@@ -0,0 +1,41 @@
+"""Update pengguna hanya mengosongkan peta wali kelas bila atribut terkait berubah."""
+
+from app import crud, schemas
+from app.database import SessionLocal
+
+ADMIN_NIP = "100"
+
+
+def _published_events(monkeypatch):
+    events = []
+    monkeypatch.setattr(crud.cache_bus, "publish", lambda db, name, key=None: events.append(name))
+    return events
+
+
+def test_password_only_update_keeps_wali_kelas_cache(client, admin_headers, monkeypatch):
+    events = _published_events(monkeypatch)
+    with SessionLocal() as db:
+        admin = crud.get_user_by_nip(db, ADMIN_NIP)
+        # Form edit mengirim ulang seluruh field walau yang diganti hanya password
+        crud.update_user(
+            db,
+            admin.id,
+            schemas.UserUpdate(
+                email=admin.email,
+                full_name=admin.full_name,
+                role=schemas.UserRole(admin.role),
+                is_active=admin.is_active,
+                password="rahasia-baru",
+            ),
+        )
+    assert "wali_kelas" not in events
+
+
+def test_name_change_invalidates_wali_kelas_cache(client, admin_headers, monkeypatch):
+    events = _published_events(monkeypatch)
+    with SessionLocal() as db:
+        admin = crud.get_user_by_nip(db, ADMIN_NIP)
+        original_name = admin.full_name
+        crud.update_user(db, admin.id, schemas.UserUpdate(full_name="Admin Uji Baru"))
+        crud.update_user(db, admin.id, schemas.UserUpdate(full_name=original_name))
+    assert events.count("wali_kelas") == 2
@@ -27,6 +27,7 @@ import {
 
 import { AuthContext } from "../App";
 import { achievementService, apiClient } from "../services/api";
+import { buildUploadUrl } from "../lib/storage";
 
 // Nilai awal form prestasi agar setiap kali dibuka kembali selalu bersih
 const defaultFormState = {
@@ -656,10 +657,22 @@ const AchievementManagement = () => {
                       </p>
                     </td>
                     <td className="px-4 py-4 align-top">
-                      <p className="text-sm font-semibold text-gray-900 dark:text-slate-100">
-                        {achievement.judul}
-                      </p>
-
+                      <div className="flex items-center gap-3">
+                        {achievement.bukti_thumbnail && (
+                          <img
+                            src={buildUploadUrl(achievement.bukti_thumbnail)}
+                            alt="Bukti Prestasi"
+                            width={40}
+                            height={40}
+                            loading="lazy"
+                            decoding="async"
+                            className="h-10 w-10 shrink-0 rounded-md object-cover"
+                          />
+                        )}
+                        <p className="text-sm font-semibold text-gray-900 dark:text-slate-100">
+                          {achievement.judul}
+                        </p>
+                      </div>
                     </td>
                     <td className="px-4 py-4 align-top text-sm text-gray-700 dark:text-slate-200">
                       {achievement.kategori || "-"}
@@ -1111,16 +1124,8 @@ const AchievementManagement = () => {
                     </p>
                     <div className="mt-2 text-sm text-gray-700 dark:text-slate-300">
                       {(() => {
-                        // Construct URL for image display
-                        const baseURL = apiClient.defaults.baseURL?.replace(/\/api\/?$/, "") || "";
-                        let cleanPath = selectedAchievement.bukti.startsWith("/")
-                          ? selectedAchievement.bukti.slice(1)
-                          : selectedAchievement.bukti;
-
-                        if (!cleanPath.startsWith("storage/uploads/") && !cleanPath.startsWith("http")) {
-                          cleanPath = `storage/uploads/${cleanPath}`;
-                        }
-                        const imageUrl = cleanPath.startsWith("http") ? cleanPath : `${baseURL}/${cleanPath}`;
+                        // Detail memakai foto ukuran penuh; tabel cukup thumbnail
+                        const imageUrl = buildUploadUrl(selectedAchievement.bukti);
 
                         return (
                           <div className="rounded-lg overflow-hidden border border-gray-200 dark:border-slate-700">
@@ -414,11 +414,18 @@ const Dashboard = () => {
     return `/${cleanPath}`;
   };
 
+  const getSrcSet = (variants) => {
+    if (!variants || variants.length === 0) return undefined;
+    return variants.map((variant) => `${getFullImageUrl(variant.url)} ${variant.width}w`).join(", ");
+  };
+
   const heroMedia = useMemo(() => {
     if (carouselItems && carouselItems.length > 0) {
       return carouselItems.map(item => ({
         type: "image",
         src: getFullImageUrl(item.url),
+        srcSet: getSrcSet(item.variants),
+        placeholder: item.placeholder,
         alt: item.alt_text || "Dashboard Slide"
       }));
     }
@@ -1450,7 +1457,10 @@ const Dashboard = () => {
                   {media.type === "image" ? (
                     <img
                       src={media.src}
+                      srcSet={media.srcSet}
+                      sizes="100vw"
                       alt={media.alt || "Hero"}
+                      style={media.placeholder ? { backgroundImage: `url(${media.placeholder})`, backgroundSize: "cover" } : undefined}
                       className="h-full w-full object-cover"
                       loading={isActive ? "eager" : "lazy"}
                     />
@@ -95,6 +95,11 @@ const LandingPage = () => {
     return `/${cleanPath}`;
   };
 
+  const getSrcSet = (variants) => {
+    if (!variants || variants.length === 0) return undefined;
+    return variants.map((variant) => `${getFullImageUrl(variant.url)} ${variant.width}w`).join(", ");
+  };
+
   return (
     // Menggunakan warna latar 'slate-50' yang lebih lembut dari putih murni
     <div className="min-h-screen bg-slate-50 font-sans text-slate-900 dark:bg-slate-950 dark:text-slate-100">
@@ -251,7 +256,11 @@ const LandingPage = () => {
                         {/* Foto Siswa */}
                         <img
                           src={getFullImageUrl(item.image_url)}
+                          srcSet={getSrcSet(item.variants)}
+                          sizes="(min-width: 640px) 208px, 144px"
                           alt={item.title || "Dokumentasi Kegiatan DISPO SMANKA"}
+                          loading="lazy"
+                          style={item.placeholder ? { backgroundImage: `url(${item.placeholder})`, backgroundSize: "cover" } : undefined}
                           className="h-full w-full object-cover transition-transform duration-700 group-hover:scale-110"
                         />
                         {/* Overlay Gradient saat Hover */}
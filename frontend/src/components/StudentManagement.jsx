@@ -285,12 +285,30 @@ const StudentManagement = () => {
         },
       });
 
+      // Impor diproses di latar belakang; pantau job hingga selesai
+      let job = response.data;
+      while (job.status === "queued" || job.status === "running") {
+        await new Promise((resolve) => setTimeout(resolve, 1500));
+        const statusResponse = await apiClient.get(
+          `/siswa/upload-jobs/${job.id}`
+        );
+        job = statusResponse.data;
+      }
+
+      if (job.status === "failed") {
+        toast.error(job.message || "Gagal memproses file");
+        setUploadLoading(false);
+        return;
+      }
+
       const {
         created_count = 0,
         updated_count = 0,
         deactivated_count = 0,
+        deactivated_by_kelas = [],
+        deactivation_skipped_count = 0,
         error_count = 0,
-      } = response.data;
+      } = job;
 
       const summary = [];
       if (created_count > 0) summary.push(`${created_count} siswa baru`);
@@ -303,15 +321,25 @@ const StudentManagement = () => {
       }
 
       if (deactivated_count > 0) {
+        const perKelas = deactivated_by_kelas
+          .map((item) => `${item.kelas}: ${item.jumlah}`)
+          .join(", ");
         toast.info(
-          `${deactivated_count} siswa ditandai tidak aktif karena tidak ada di roster terbaru.`
+          `${deactivated_count} siswa ditandai tidak aktif karena tidak ada di roster terbaru${
+            perKelas ? ` (${perKelas})` : ""
+          }.`
+        );
+      }
+      if (deactivation_skipped_count > 0) {
+        toast.warning(
+          `${deactivation_skipped_count} siswa tidak ada di roster tetapi tetap aktif karena masih memiliki pelanggaran yang belum selesai.`
         );
       }
       if (error_count > 0) {
         toast.warning(
           `${error_count} baris gagal diproses. Periksa log unggahan.`
         );
-        setUploadErrors(response.data.errors || []);
+        setUploadErrors(job.errors || []);
         setShowUploadErrors(true);
       }
 
@@ -320,7 +348,7 @@ const StudentManagement = () => {
       fetchStudents();
     } catch (error) {
       console.error("Upload failed:", error);
-      toast.error("Gagal upload file");
+      toast.error(error.response?.data?.detail || "Gagal upload file");
     }
     setUploadLoading(false);
   };
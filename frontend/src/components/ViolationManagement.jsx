@@ -21,6 +21,7 @@ import {
   X,
 } from "lucide-react";
 import { formatNumericId } from "../lib/formatters";
+import { buildUploadUrl } from "../lib/storage";
 
 // Daftar pelanggaran dengan fitur filter, detail, dan perubahan status
 const ViolationManagement = () => {
@@ -242,20 +243,8 @@ const ViolationManagement = () => {
       return;
     }
 
-    // Construct simplified URL assuming standard setup
-    // Remove /api suffix if present to get root base URL
-    const baseURL = apiClient.defaults.baseURL?.replace(/\/api\/?$/, "") || "";
-    // Clean leading slash from path if double slash risk
-    let cleanPath = violation.bukti_foto.startsWith("/")
-      ? violation.bukti_foto.slice(1)
-      : violation.bukti_foto;
-
-    // Add storage/uploads/ prefix if not present (backend saves only filename)
-    if (!cleanPath.startsWith("storage/uploads/") && !cleanPath.startsWith("http")) {
-      cleanPath = `storage/uploads/${cleanPath}`;
-    }
-
-    setPreviewImageUrl(`${baseURL}/${cleanPath}`);
+    // Lightbox memakai foto ukuran penuh; tabel cukup thumbnail
+    setPreviewImageUrl(buildUploadUrl(violation.bukti_foto));
     setShowPreviewModal(true);
   };
 
@@ -496,7 +485,19 @@ const ViolationManagement = () => {
                             }`}
                           title={violation.bukti_foto ? "Lihat Bukti Foto" : "Tidak ada bukti"}
                         >
-                          <ImageIcon className="h-4 w-4" />
+                          {violation.bukti_foto_thumbnail ? (
+                            <img
+                              src={buildUploadUrl(violation.bukti_foto_thumbnail)}
+                              alt="Bukti Foto"
+                              width={40}
+                              height={40}
+                              loading="lazy"
+                              decoding="async"
+                              className="h-10 w-10 rounded-md object-cover"
+                            />
+                          ) : (
+                            <ImageIcon className="h-4 w-4" />
+                          )}
                         </button>
                       </td>
                       <td className="px-4 py-4">
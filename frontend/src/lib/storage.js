@@ -0,0 +1,19 @@
+// Helper URL file unggahan yang disajikan backend lewat /storage
+import { apiClient } from "../services/api";
+
+// Backend hanya menyimpan nama file; tambahkan prefix storage/uploads/ dan base URL tanpa /api
+export const buildUploadUrl = (path) => {
+  if (!path) {
+    return null;
+  }
+  if (path.startsWith("http")) {
+    return path;
+  }
+
+  const baseURL = apiClient.defaults.baseURL?.replace(/\/api\/?$/, "") || "";
+  let cleanPath = path.startsWith("/") ? path.slice(1) : path;
+  if (!cleanPath.startsWith("storage/uploads/")) {
+    cleanPath = `storage/uploads/${cleanPath}`;
+  }
+  return `${baseURL}/${cleanPath}`;
+};